@@ -1,16 +1,20 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from dotenv import load_dotenv
+from datetime import timedelta
 import os
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env (Lambda gets them from its configuration)
+if not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24).hex())
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', os.urandom(24).hex())
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', '15')))
+app.config['REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('REFRESH_TOKEN_DAYS', '30')))
 
 # Database configuration - support both SQLite (local) and PostgreSQL (Lambda/RDS)
 DATABASE_URL = os.getenv('DATABASE_URL')
@@ -34,10 +38,12 @@ else:
 
 # Lambda-optimized connection pooling
 if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
-    # In Lambda, use connection pooling suitable for serverless
+    # In Lambda, keep one connection across invocations. Instead of
+    # pool_pre_ping on every checkout, lambda_runtime.IdlePing (installed
+    # below) pings only after DB_PING_IDLE_SECONDS of idleness
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
+        'pool_pre_ping': False,
+        'pool_recycle': 3600,
         'pool_size': 1,  # Minimal pool for Lambda
         'max_overflow': 0,  # No overflow for Lambda
         'connect_args': {
@@ -54,6 +60,17 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Assigned workouts: create StudentWorkoutLog rows only on completion (default).
+# Set ASSIGNMENT_PLACEHOLDER_LOGS=true to pre-create a pending log per member.
+app.config['ASSIGNMENT_PLACEHOLDER_LOGS'] = os.getenv('ASSIGNMENT_PLACEHOLDER_LOGS', 'false').lower() == 'true'
+
+# Deliver queued emails from a background thread in each worker. Set
+# EMAIL_OUTBOX_WORKER=false to run `python send_outbox.py --loop` separately.
+# Off on Lambda, where the scheduled `outbox` function sends instead.
+app.config['EMAIL_OUTBOX_WORKER'] = os.getenv(
+    'EMAIL_OUTBOX_WORKER', 'false' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'true'
+).lower() == 'true'
+
 # CORS configuration - allow your mobile app domain
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',') if os.getenv('CORS_ORIGINS') else ['*']
 CORS(app, origins=CORS_ORIGINS)
@@ -65,16 +82,42 @@ jwt = JWTManager(app)
 from models import db
 db.init_app(app)
 
-# Import routes
-from routes import auth, workouts, exercises, profile, classes, macros
+if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    from lambda_runtime import IdlePing
+    with app.app_context():
+        IdlePing.from_env().install(db.engine)
+
+# User.workouts refers to Workout, so both are mapped before any route loads
+import models.workout
+
+# Routes that read user_cache.current_user resolve the JWT's user on first use
+from user_cache import UserNotFound
+
+@app.errorhandler(UserNotFound)
+def user_not_found(e):
+    return {'error': 'User not found'}, 404
+
+# Email outbox sender
+import outbox
+outbox.init_app(app)
+
+# Live class events, relayed between workers through the class_events table
+import class_events
+class_events.init_app(app)
+
+# Hourly deletion of expired tokens and old class events (not on Lambda,
+# where the scheduled `sweeper` function does it)
+import sweeper
+sweeper.init_app(app)
+
+# Per-endpoint latency and SQL metrics, served at GET /metrics
+import metrics
+metrics.init_app(app)
 
-# Register blueprints
-app.register_blueprint(auth.bp)
-app.register_blueprint(workouts.bp)
-app.register_blueprint(exercises.bp)
-app.register_blueprint(profile.bp)
-app.register_blueprint(classes.bp)
-app.register_blueprint(macros.bp)
+# Register blueprints; with LAZY_BLUEPRINTS (default on Lambda) each route
+# module is imported by the first request under its prefix
+from blueprints import register_blueprints, lazy_default
+register_blueprints(app, lazy=lazy_default())
 
 @app.route('/')
 def index():
@@ -0,0 +1,44 @@
+"""Measure bcrypt cost factors on this machine
+
+Usage: python benchmarks/bcrypt_cost.py [--target-ms 250] [--samples 5]
+
+Prints the median hash time for each cost and the highest cost that stays
+within the target, as a starting point for BCRYPT_ROUNDS. Run it on the
+deployment VM size, not a laptop.
+"""
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+def time_cost(rounds, samples):
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'benchmark-password', bcrypt.gensalt(rounds))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--min-rounds', type=int, default=8)
+    parser.add_argument('--max-rounds', type=int, default=14)
+    args = parser.parse_args()
+    
+    best = None
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        median_ms = time_cost(rounds, args.samples)
+        print(f"cost {rounds:2d}: {median_ms:8.1f} ms")
+        if median_ms <= args.target_ms:
+            best = rounds
+    
+    if best is None:
+        print(f"\nNo cost within {args.target_ms:.0f} ms")
+    else:
+        print(f"\nSuggested BCRYPT_ROUNDS={best} (target {args.target_ms:.0f} ms)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Profile Lambda cold start: import time and first request
+
+Usage: python benchmarks/cold_start.py [--runs 5] [--path /api/exercises] [--eager]
+                                       [--top 15] [--json] [--budget-ms N]
+
+Each run starts a fresh interpreter configured like Lambda (lazy blueprints,
+inline password hashing), imports app under `python -X importtime` and serves
+one unauthenticated GET. The database is never touched, so no RDS is needed.
+Prints the median import and first-request times, the slowest imports, and
+any modules that should have been deferred. --eager registers every blueprint
+at import for comparison. With --budget-ms, exits non-zero when the median
+import plus first request takes longer; tests/test_cold_start.py runs it that
+way when COLD_START_BUDGET_MS is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only loaded when a request needs them
+DEFERRED_MODULES = ('bcrypt', 'smtplib', 'email.mime', 'multiprocessing', 'dotenv')
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'request_ms': (served - imported) * 1000,
+    'status': response.status_code,
+    'routes': sorted(m for m in sys.modules if m.startswith('routes.')),
+    'deferred': sorted(m for m in %r if m in sys.modules),
+}))
+''' % (DEFERRED_MODULES,)
+
+
+def parse_importtime(stderr):
+    """(cumulative_us, module) for imports made directly by the app and its routes"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        depth = len(name) - len(name.lstrip(' '))
+        if cumulative.strip().isdigit() and depth <= 3:
+            entries.append((int(cumulative), name.strip()))
+    return entries
+
+
+def cold_start(path='/api/exercises', eager=False):
+    """Run one cold start in a fresh interpreter and return its measurements"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            AWS_LAMBDA_FUNCTION_NAME='cold-start-benchmark',
+            DATABASE_URL=f'sqlite:///{tmp}/cold_start.db',
+            LAZY_BLUEPRINTS='false' if eager else 'true',
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD, path],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        )
+    run = json.loads(result.stdout.strip().splitlines()[-1])
+    run['imports'] = parse_importtime(result.stderr)
+    return run
+
+
+def summarize(runs):
+    last = runs[-1]
+    return {
+        'import_ms': statistics.median(r['import_ms'] for r in runs),
+        'request_ms': statistics.median(r['request_ms'] for r in runs),
+        'total_ms': statistics.median(r['import_ms'] + r['request_ms'] for r in runs),
+        'status': last['status'],
+        'routes': last['routes'],
+        'deferred': last['deferred'],
+        'imports': sorted(last['imports'], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/exercises')
+    parser.add_argument('--eager', action='store_true')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--budget-ms', type=float)
+    args = parser.parse_args()
+
+    summary = summarize([cold_start(args.path, args.eager) for _ in range(args.runs)])
+
+    if args.json:
+        summary['imports'] = summary['imports'][:args.top]
+        print(json.dumps(summary))
+    else:
+        print(f"import         {summary['import_ms']:8.1f} ms")
+        print(f"first request  {summary['request_ms']:8.1f} ms  (GET {args.path} -> {summary['status']})")
+        print(f"total          {summary['total_ms']:8.1f} ms  (median of {args.runs})")
+        print(f"route modules  {', '.join(summary['routes']) or '-'}")
+        print(f"deferred but loaded  {', '.join(summary['deferred']) or '-'}")
+        print("\nslowest imports (cumulative, last run):")
+        for cumulative_us, module in summary['imports'][:args.top]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    if args.budget_ms is not None and summary['total_ms'] > args.budget_ms:
+        print(f"\nOver budget: {summary['total_ms']:.1f} ms > {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
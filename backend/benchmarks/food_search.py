@@ -0,0 +1,97 @@
+"""Time food search against a generated catalog
+
+Usage: python benchmarks/food_search.py [--foods 100000] [--samples 50] [--explain]
+
+Builds a throwaway SQLite database with --foods synthetic names (2-5 words
+drawn from a fixed vocabulary, many of them sharing short prefixes such as
+'ch'), indexes them the way load_foods.py does, and prints median and p95
+times of routes.macros.search_food_ids for short, medium and multi-word
+queries. --explain prints SQLite's plan for each query.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+VOCABULARY = [
+    'chicken', 'cheese', 'cheddar', 'chips', 'chocolate', 'chia', 'chickpea', 'chili',
+    'chard', 'cherry', 'chive', 'chowder', 'chunks', 'chuck', 'beef', 'brown', 'rice',
+    'bread', 'broccoli', 'brisket', 'white', 'whole', 'wheat', 'oat', 'oatmeal', 'milk',
+    'skim', 'greek', 'yogurt', 'plain', 'vanilla', 'strawberry', 'banana', 'apple', 'raw',
+    'cooked', 'grilled', 'roasted', 'fried', 'baked', 'salted', 'unsalted', 'organic',
+    'breast', 'thigh', 'ground', 'lean', 'turkey', 'salmon', 'tuna', 'egg', 'peanut',
+    'butter', 'almond', 'pasta', 'sauce', 'tomato', 'potato', 'sweet', 'soup', 'bar',
+]
+
+QUERIES = ['ch', 'chi', 'chicken', 'br', 'chicken br', 'white rice', 'oat ch']
+
+def generate(db, Food, FoodTerm, normalize_food_name, count, batch_size=1000):
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        batch = []
+        for _ in range(min(batch_size, count - start)):
+            name = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 5))).title()
+            batch.append(Food(name=name, search_name=normalize_food_name(name), source='benchmark'))
+        db.session.add_all(batch)
+        db.session.flush()
+        db.session.execute(db.insert(FoodTerm), [row for food in batch for row in FoodTerm.rows_for(food)])
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--explain', action='store_true')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    try:
+        from app import app
+        from models import db
+        from models.macros import Food, FoodTerm, normalize_food_name
+        from routes.macros import search_food_ids
+
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            generate(db, Food, FoodTerm, normalize_food_name, args.foods)
+            db.session.execute(db.text('ANALYZE'))
+            terms = db.session.query(db.func.count(FoodTerm.id)).scalar()
+            print(f"{args.foods} foods, {terms} terms generated in {time.perf_counter() - start:.1f} s\n")
+
+            print(f"{'query':<14}{'results':>8}{'median ms':>12}{'p95 ms':>10}")
+            for query_text in QUERIES:
+                timings = []
+                for _ in range(args.samples):
+                    started = time.perf_counter()
+                    food_ids = search_food_ids(query_text, args.limit)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{query_text!r:<14}{len(food_ids):>8}{statistics.median(timings):>12.2f}{p95:>10.2f}")
+                if args.explain:
+                    captured = []
+                    listener = lambda conn, cursor, statement, parameters, context, executemany: \
+                        captured.append((statement, parameters))
+                    db.event.listen(db.engine, 'before_cursor_execute', listener)
+                    try:
+                        search_food_ids(query_text, args.limit)
+                    finally:
+                        db.event.remove(db.engine, 'before_cursor_execute', listener)
+                    statement, parameters = captured[-1]
+                    for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+                        print(f"    {row[-1]}")
+    finally:
+        os.unlink(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Login throughput versus latency of other endpoints during a login storm
+
+Usage:
+    python benchmarks/login_storm.py --url http://localhost:8080 \
+        --email student1@fittrack.app --password SamplePass123! \
+        [--login-threads 16] [--probe-threads 2] [--duration 30] [--probe-path /health]
+
+Run against a server started the way production runs it (`gunicorn app:app`,
+which reads gunicorn.conf.py). Login threads post to /api/auth/login in a loop while
+probe threads request a cheap endpoint. The report shows successful logins per
+second, shed (503) logins (which back off before retrying), and p50/p99
+latency of the probe. Compare runs with
+PASSWORD_HASH_WORKERS=0 (inline bcrypt) and the default pool.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, TimeoutError):
+        status = None
+    return status, (time.perf_counter() - start) * 1000
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--probe-threads', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--probe-path', default='/health')
+    parser.add_argument('--retry-after', type=float, default=2)
+    args = parser.parse_args()
+    
+    stop = threading.Event()
+    lock = threading.Lock()
+    login_statuses = []
+    probe_latencies = []
+    
+    def login_loop():
+        payload = {'email': args.email, 'password': args.password}
+        while not stop.is_set():
+            status, _ = request(f"{args.url}/api/auth/login", payload)
+            with lock:
+                login_statuses.append(status)
+            if status == 503:
+                # Well-behaved clients back off as told by Retry-After
+                stop.wait(args.retry_after)
+    
+    def probe_loop():
+        while not stop.is_set():
+            status, elapsed_ms = request(f"{args.url}{args.probe_path}")
+            if status == 200:
+                with lock:
+                    probe_latencies.append(elapsed_ms)
+    
+    # Baseline probe latency without load
+    baseline = [request(f"{args.url}{args.probe_path}")[1] for _ in range(20)]
+    
+    threads = [threading.Thread(target=login_loop) for _ in range(args.login_threads)]
+    threads += [threading.Thread(target=probe_loop) for _ in range(args.probe_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    succeeded = login_statuses.count(200)
+    shed = login_statuses.count(503)
+    print(f"logins:  {succeeded / args.duration:8.1f}/s ok, {shed} shed (503), "
+          f"{len(login_statuses) - succeeded - shed} other")
+    print(f"probe {args.probe_path}: baseline p50 {statistics.median(baseline):.1f} ms")
+    print(f"probe under storm: p50 {percentile(probe_latencies, 50):.1f} ms, "
+          f"p99 {percentile(probe_latencies, 99):.1f} ms ({len(probe_latencies)} requests)")
+
+if __name__ == '__main__':
+    main()
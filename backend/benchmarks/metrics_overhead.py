@@ -0,0 +1,44 @@
+"""Measure the per-request cost of metrics recording
+
+Usage: python benchmarks/metrics_overhead.py [--requests 200000] [--statements 5]
+
+Runs the hooks a request triggers (start, one before/after pair per SQL
+statement, end) in a loop and prints the cost per request and per statement.
+No Flask or database work is included, only what metrics.py adds.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Metrics
+
+ENDPOINTS = ['auth.login', 'workouts.get_workouts', 'classes.get_leaderboard', 'macros.get_dashboard']
+
+def run(m, requests, statements):
+    start = time.perf_counter()
+    for i in range(requests):
+        m.start_request()
+        for _ in range(statements):
+            m.before_statement()
+            m.after_statement()
+        m.end_request(ENDPOINTS[i % len(ENDPOINTS)], 'GET')
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--statements', type=int, default=5)
+    args = parser.parse_args()
+    
+    bare = run(Metrics(), args.requests, 0)
+    with_sql = run(Metrics(), args.requests, args.statements)
+    print(f"per request (no SQL):          {bare:6.2f} us")
+    print(f"per request ({args.statements} statements):  {with_sql:6.2f} us")
+    if args.statements:
+        print(f"per statement:                 {(with_sql - bare) / args.statements:6.2f} us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Blueprint registration, eager or on first use
+
+Each route module owns one URL prefix. Normally app.py imports and registers
+them all at startup. With lazy loading, a route module is only imported when
+the first request under its prefix arrives. A cold Lambda serving /api/auth/login
+then never imports the macros or classes code and their models.
+
+Lazy loading adds routes after the app has served requests, which Flask only
+allows before the first request. Registration is serialised by a lock, but
+werkzeug's URL map is not safe to extend while another thread matches against
+it. Use it where each process handles one request at a time (Lambda), not under
+threaded gunicorn.
+
+Configuration (environment):
+    LAZY_BLUEPRINTS     'true' to load route modules on first use
+                        (default true on Lambda, false elsewhere)
+"""
+import importlib
+import os
+import threading
+
+# URL prefix -> module defining `bp` with that url_prefix
+ROUTE_MODULES = {
+    '/api/auth': 'routes.auth',
+    '/api/workouts': 'routes.workouts',
+    '/api/exercises': 'routes.exercises',
+    '/api/profile': 'routes.profile',
+    '/api/classes': 'routes.classes',
+    '/api/macros': 'routes.macros',
+}
+
+
+def lazy_default():
+    default = 'true' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'false'
+    return os.getenv('LAZY_BLUEPRINTS', default).lower() == 'true'
+
+
+class LazyBlueprints:
+    """WSGI middleware that registers a prefix's blueprint before its first request"""
+
+    def __init__(self, app, modules):
+        self.app = app
+        self.pending = dict(modules)
+        self._lock = threading.Lock()
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+
+    def __call__(self, environ, start_response):
+        if self.pending:
+            path = environ.get('PATH_INFO', '')
+            for prefix in list(self.pending):
+                if path == prefix or path.startswith(prefix + '/'):
+                    self.load(prefix)
+        return self.wsgi_app(environ, start_response)
+
+    def load(self, prefix):
+        with self._lock:
+            module_name = self.pending.pop(prefix, None)
+            if module_name is None:
+                return
+            module = importlib.import_module(module_name)
+            # Flask rejects setup calls once a request has been handled; this
+            # is the one place that adds routes late, so lift the check here.
+            # _got_first_request is private: Flask is pinned in requirements.txt
+            # and test_cold_start.py fails if the attribute changes meaning.
+            got_first_request = self.app._got_first_request
+            self.app._got_first_request = False
+            try:
+                self.app.register_blueprint(module.bp)
+            finally:
+                self.app._got_first_request = got_first_request
+
+    def load_all(self):
+        """Register every remaining blueprint (e.g. before create_all or a warm-up)"""
+        for prefix in list(self.pending):
+            self.load(prefix)
+
+
+def register_blueprints(app, lazy=False):
+    """Register all route modules now, or on first use when lazy"""
+    if lazy:
+        app.extensions['lazy_blueprints'] = LazyBlueprints(app, ROUTE_MODULES)
+        return
+    for module_name in ROUTE_MODULES.values():
+        app.register_blueprint(importlib.import_module(module_name).bp)
+
+
+def load_all_blueprints(app):
+    """Make sure every route module is registered, whichever mode is in use"""
+    loader = app.extensions.get('lazy_blueprints')
+    if loader is not None:
+        loader.load_all()
@@ -0,0 +1,209 @@
+"""
+Live class events, shared across gunicorn workers
+
+complete_workout adds completion and leaderboard events with send_event in
+the transaction that saves the log, and skips them when the endpoint is
+disabled. Events are rows in the class_events table, so they reach
+streams in every worker, not just the one that handled the completion. Each
+process runs one relay thread (EventRelay) that polls the table while the
+process has open streams and fans new rows out to its local subscribers:
+bounded queues read by the SSE endpoint (GET /api/classes/<id>/events). With
+no open streams the relay runs no queries. Old rows are removed by
+sweep_tokens.py.
+
+An open stream occupies its worker for as long as it stays open, so gunicorn
+runs the gevent worker (gunicorn.conf.py), where an idle stream is a parked
+greenlet rather than a thread. Each process still refuses streams beyond
+CLASS_EVENTS_MAX_STREAMS with 503, so streams can never take every thread of
+a threaded worker. API Gateway cannot hold a response open, so the endpoint
+is disabled on Lambda.
+
+Configuration (environment):
+    CLASS_EVENTS_ENABLED        'false' disables the endpoint (default true,
+                                false on Lambda)
+    CLASS_EVENTS_MAX_STREAMS    open streams per worker process (default 100;
+                                keep it below --threads with a threaded worker)
+    CLASS_EVENTS_POLL_SECONDS   relay poll interval (default 1)
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db
+from models.classes import ClassEvent
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single listener's bounded event queue"""
+
+    def __init__(self, class_id, max_queue_size):
+        self.class_id = class_id
+        self._queue = queue.Queue(maxsize=max_queue_size)
+
+    def put(self, message):
+        """Queue a message, dropping it if the listener has fallen behind"""
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """Wait for the next message, or return None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ClassEventBroker:
+    """Fan out class events to this process's subscriptions of each class"""
+
+    def __init__(self, max_queue_size=100, max_subscriptions=None):
+        self.max_queue_size = max_queue_size
+        self.max_subscriptions = max_subscriptions
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+
+    def subscribe(self, class_id):
+        """Add a subscription, or return None when the process is at its cap"""
+        with self._lock:
+            if self.max_subscriptions is not None and self._count >= self.max_subscriptions:
+                return None
+            subscription = Subscription(class_id, self.max_queue_size)
+            self._subscribers.setdefault(class_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.class_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.class_id]
+
+    def has_subscribers(self, class_id):
+        return bool(self._subscribers.get(class_id))
+
+    @property
+    def subscription_count(self):
+        return self._count
+
+    def publish(self, class_id, event, data):
+        """Send an event to every local subscriber of a class"""
+        message = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(class_id, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+
+def format_sse(event, data):
+    """Format an event in the text/event-stream wire format"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventRelay:
+    """Deliver events written by any process to this process's subscribers"""
+
+    def __init__(self, app, broker, poll_seconds=None, batch_size=500):
+        self.app = app
+        self.broker = broker
+        self.poll_seconds = poll_seconds or float(os.getenv('CLASS_EVENTS_POLL_SECONDS', '1'))
+        self.batch_size = batch_size
+        # Highest event id already delivered; None while nobody is listening
+        self.last_id = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, background=True):
+        """Called after a subscribe: deliver events from now on"""
+        with self._lock:
+            if self.last_id is None:
+                self.last_id = db.session.query(func.max(ClassEvent.id)).scalar() or 0
+            if background and (self._thread is None or not self._thread.is_alive()
+                               or self._pid != os.getpid()):
+                self._thread = threading.Thread(target=self._run, name='class-events-relay', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def poll(self):
+        """Publish events newer than the last delivered one; returns how many"""
+        rows = ClassEvent.query.filter(ClassEvent.id > self.last_id).order_by(
+            ClassEvent.id
+        ).limit(self.batch_size).all()
+        for row in rows:
+            self.broker.publish(row.class_id, row.event, json.loads(row.data))
+            self.last_id = row.id
+        return len(rows)
+
+    def stop(self):
+        """Called after an unsubscribe: forget the position once nobody listens"""
+        with self._lock:
+            if not self.broker.subscription_count:
+                # Events sent while nobody listens are never delivered
+                self.last_id = None
+
+    def _run(self):
+        while True:
+            if self.broker.subscription_count and self.last_id is not None:
+                with self.app.app_context():
+                    try:
+                        while self.poll() == self.batch_size:
+                            pass
+                    except Exception:
+                        logger.exception('Class event relay poll failed')
+                    finally:
+                        db.session.remove()
+            time.sleep(self.poll_seconds)
+
+
+broker = ClassEventBroker(max_subscriptions=int(os.getenv('CLASS_EVENTS_MAX_STREAMS', '100')))
+
+
+def init_app(app):
+    app.config.setdefault('CLASS_EVENTS_ENABLED', os.getenv(
+        'CLASS_EVENTS_ENABLED', 'false' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'true'
+    ).lower() == 'true')
+    # Tests turn the thread off and call relay().poll() themselves
+    app.config.setdefault('CLASS_EVENTS_RELAY', True)
+    app.extensions['class_events'] = EventRelay(app, broker)
+
+
+def enabled():
+    """False where nothing can stream events (e.g. Lambda): skip writing them"""
+    return current_app.config['CLASS_EVENTS_ENABLED']
+
+
+def relay():
+    return current_app.extensions['class_events']
+
+
+def send_event(class_id, event, data):
+    """Add an event to the current transaction; streams see it once committed"""
+    db.session.add(ClassEvent(class_id=class_id, event=event, data=json.dumps(data)))
+
+
+def open_stream(class_id):
+    """Subscribe to a class's events, or return None if this process is full"""
+    subscription = broker.subscribe(class_id)
+    if subscription is not None:
+        relay().start(background=current_app.config['CLASS_EVENTS_RELAY'])
+    return subscription
+
+
+def close_stream(subscription, relay):
+    broker.unsubscribe(subscription)
+    relay.stop()
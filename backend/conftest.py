@@ -7,6 +7,7 @@ from models import db
 from models.user import User
 from models.workout import Workout, WorkoutExercise, ExerciseSet, Routine
 from flask_jwt_extended import create_access_token
+from sqlalchemy import event
 
 @pytest.fixture
 def client():
@@ -17,6 +18,19 @@ def client():
     app.config['TESTING'] = True
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
     app.config['SECRET_KEY'] = 'test-secret-key'
+    app.config['EMAIL_OUTBOX_WORKER'] = False
+    app.config['CLASS_EVENTS_RELAY'] = False
+    app.config['SWEEP_WORKER'] = False
+    
+    # In-process caches must not leak between test databases
+    from routes.macros import dashboard_cache
+    from user_cache import user_cache
+    from rate_limit import limiter
+    from metrics import metrics
+    dashboard_cache.clear()
+    user_cache.clear()
+    limiter.reset()
+    metrics.reset()
     
     with app.test_client() as client:
         with app.app_context():
@@ -29,91 +43,121 @@ def client():
     os.unlink(db_path)
 
 @pytest.fixture
-def auth_headers(client):
-    """Create a test user and return auth headers"""
-    with app.app_context():
-        user = User(
-            email='test@example.com',
-            username='testuser',
-            role='student'
-        )
-        user.set_password('testpass123')
-        db.session.add(user)
-        db.session.commit()
-        
-        token = create_access_token(identity=str(user.id))
-        return {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
+def auth_headers(client, test_user):
+    """Return auth headers for the test user"""
+    token = create_access_token(identity=str(test_user.id))
+    return {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
 
 @pytest.fixture
 def test_user(client):
     """Create and return a test user"""
-    with app.app_context():
-        user = User(
-            email='test@example.com',
-            username='testuser',
-            role='student'
-        )
-        user.set_password('testpass123')
-        db.session.add(user)
-        db.session.commit()
-        return user
+    user = User(
+        email='test@example.com',
+        username='testuser',
+        role='student'
+    )
+    user.set_password('testpass123')
+    db.session.add(user)
+    db.session.commit()
+    return user
 
 @pytest.fixture
 def instructor_user(client):
     """Create and return an instructor user"""
-    with app.app_context():
-        user = User(
-            email='instructor@example.com',
-            username='instructor',
-            role='instructor'
-        )
-        user.set_password('testpass123')
-        db.session.add(user)
-        db.session.commit()
-        return user
+    user = User(
+        email='instructor@example.com',
+        username='instructor',
+        role='instructor'
+    )
+    user.set_password('testpass123')
+    db.session.add(user)
+    db.session.commit()
+    return user
 
 @pytest.fixture
 def instructor_headers(client, instructor_user):
     """Return auth headers for instructor"""
-    with app.app_context():
-        token = create_access_token(identity=str(instructor_user.id))
-        return {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
+    token = create_access_token(identity=str(instructor_user.id))
+    return {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
 
 @pytest.fixture
 def sample_workout(client, test_user):
     """Create a sample workout for testing"""
-    with app.app_context():
-        workout = Workout(
-            user_id=test_user.id,
-            name='Test Workout',
-            duration=60,
-            total_volume=1000.0,
-            calories_burned=300,
-            date=datetime.utcnow().date()
-        )
-        db.session.add(workout)
-        db.session.commit()
-        return workout
+    workout = Workout(
+        user_id=test_user.id,
+        name='Test Workout',
+        duration=60,
+        total_volume=1000.0,
+        calories_burned=300,
+        date=datetime.utcnow().date()
+    )
+    db.session.add(workout)
+    db.session.commit()
+    return workout
 
 @pytest.fixture
 def sample_class(client, instructor_user):
     """Create a sample class for testing"""
-    with app.app_context():
-        from models.classes import Class
-        class_obj = Class(
-            name='Test Class',
-            description='Test Description',
-            instructor_id=instructor_user.id
+    from models.classes import Class
+    class_obj = Class(
+        name='Test Class',
+        description='Test Description',
+        instructor_id=instructor_user.id
+    )
+    # Generate join code
+    class_obj.join_code = class_obj.generate_join_code()
+    db.session.add(class_obj)
+    db.session.commit()
+    return class_obj
+
+
+class QueryCounter:
+    """Runs requests through the test client and records their SQL statements"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def request(self, method, path, **kwargs):
+        """Return (response, statements) for one request made as if cold.
+        
+        The session and in-process caches are emptied first, so objects left
+        over from test setup cannot hide lazy loads and every measurement of
+        the same request is comparable.
+        """
+        from routes.macros import dashboard_cache
+        from user_cache import user_cache
+        db.session.remove()
+        dashboard_cache.clear()
+        user_cache.clear()
+        
+        statements = []
+        
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.open(path, method=method, **kwargs)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return response, statements
+    
+    def assert_budget(self, budget, method, path, **kwargs):
+        """Make the request and fail if it runs more than budget statements"""
+        response, statements = self.request(method, path, **kwargs)
+        assert len(statements) <= budget, (
+            f'{method} {path} ran {len(statements)} SQL statements (budget {budget}):\n'
+            + '\n'.join(statements)
         )
-        # Generate join code
-        class_obj.join_code = class_obj.generate_join_code()
-        db.session.add(class_obj)
-        db.session.commit()
-        return class_obj
+        return response, len(statements)
 
+@pytest.fixture
+def query_counter(client):
+    """Count the SQL statements of requests (see QueryCounter)"""
+    return QueryCounter(client)
@@ -0,0 +1,30 @@
+"""
+gunicorn settings, read automatically from the working directory
+
+Requests run on gevent's evented worker, so an open live-event stream
+(GET /api/classes/<id>/events) is a parked greenlet instead of a blocked
+thread, and a worker holds hundreds of idle streams without starving the
+rest of the API. Set GUNICORN_WORKER_CLASS=gthread to fall back to threads;
+CLASS_EVENTS_MAX_STREAMS must then stay below GUNICORN_THREADS.
+
+psycopg2 blocks the gevent hub; run PostgreSQL deployments with gthread or
+install psycogreen.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+threads = int(os.getenv('GUNICORN_THREADS', '2'))
+timeout = 60
+
+
+def on_starting(server):
+    # Workers' metrics files from the previous run would otherwise be summed
+    # into this run's counters (metrics.py, METRICS_DIR)
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(metrics_dir, name))
@@ -1,12 +1,21 @@
 """
 AWS Lambda handler for FitTrack API
 Uses Mangum to adapt Flask app for Lambda/API Gateway
+
+Scheduled warm-up events (serverless.yml) are answered without going through
+Mangum: they load every route module and check the database connection, see
+lambda_runtime.warm_up.
 """
 from mangum import Mangum
 from app import app
+from lambda_runtime import is_warmup_event, warm_up
 
 # Create Lambda handler
 # lifespan="off" disables ASGI lifespan events (not needed for Flask)
-handler = Mangum(app, lifespan="off")
+asgi_handler = Mangum(app, lifespan="off")
 
 
+def handler(event, context):
+    if is_warmup_event(event):
+        return warm_up(app)
+    return asgi_handler(event, context)
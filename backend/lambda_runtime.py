@@ -0,0 +1,95 @@
+"""
+Lambda runtime support: warm database connection and warm-up events
+
+A Lambda container handles one invocation at a time and keeps its single
+pooled connection between invocations. pool_pre_ping would test that
+connection with an extra round trip to RDS on every checkout. IdlePing only
+pings a connection that has sat unused longer than DB_PING_IDLE_SECONDS. A
+connection that fails the ping is discarded and the pool opens a new one
+before handing it out, so the request never sees the dead connection.
+
+A connection that drops while still inside the window fails its first
+statement instead. SQLAlchemy invalidates it, and the next invocation
+reconnects.
+
+Scheduled warm-up events (see serverless.yml) are answered by warm_up. It
+registers every blueprint and checks out the connection, so the next real
+request finds both the import graph and the connection ready.
+
+Configuration (environment):
+    DB_PING_IDLE_SECONDS    idle time before a checkout pings (default 60)
+"""
+import logging
+import os
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DisconnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class IdlePing:
+    """Checkout hook that pings a pooled connection only after it sat idle"""
+
+    def __init__(self, idle_seconds=60, clock=time.time):
+        self.idle_seconds = idle_seconds
+        # Wall clock: a frozen Lambda container must count as idle
+        self.clock = clock
+        self.pings = 0
+        self.reconnects = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(idle_seconds=float(os.getenv('DB_PING_IDLE_SECONDS', '60')))
+
+    def install(self, engine):
+        event.listen(engine, 'connect', self._touch)
+        event.listen(engine, 'checkin', self._touch)
+        event.listen(engine, 'checkout', self._checkout)
+        return self
+
+    def _touch(self, dbapi_connection, connection_record):
+        connection_record.info['last_used'] = self.clock()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        last_used = connection_record.info.get('last_used')
+        if last_used is not None and self.clock() - last_used <= self.idle_seconds:
+            return
+        self.pings += 1
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception as e:
+            # The pool discards this connection and retries with a new one
+            self.reconnects += 1
+            logger.info(f'Idle database connection failed ping, reconnecting: {e}')
+            raise DisconnectionError() from e
+
+
+def is_warmup_event(event):
+    """True for scheduled warm-up invocations rather than HTTP requests"""
+    if not isinstance(event, dict):
+        return False
+    return (
+        event.get('warmup') is True
+        or event.get('source') in ('aws.events', 'serverless-plugin-warmup')
+    )
+
+
+def warm_up(app):
+    """Load every route module and make sure the database connection is live"""
+    from blueprints import load_all_blueprints
+    from models import db
+
+    start = time.perf_counter()
+    load_all_blueprints(app)
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1'))
+        finally:
+            db.session.remove()
+    return {'warm': True, 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
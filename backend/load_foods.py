@@ -0,0 +1,71 @@
+"""Load the offline food catalog into the foods table
+
+Usage: python load_foods.py [path/to/foods.csv]
+
+The CSV needs name and calories/protein/carbs/fats per 100 g columns; brand and
+serving_size_g are optional. Foods already in the catalog (same name and brand)
+are skipped, so the loader can be re-run after the dataset grows.
+"""
+import csv
+import os
+import sys
+from app import app
+from models import db
+from models.macros import Food, FoodTerm, normalize_food_name
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'foods.csv')
+BATCH_SIZE = 1000
+
+def parse_float(value):
+    return float(value) if value not in (None, '') else None
+
+def load_foods(path=DEFAULT_PATH):
+    """Insert foods and their search terms in batches; returns the number added"""
+    existing = {
+        (name, brand or '')
+        for name, brand in db.session.query(Food.name, Food.brand)
+    }
+    added = 0
+    batch = []
+    
+    def flush(batch):
+        db.session.add_all(batch)
+        db.session.flush()  # assigns ids for the term rows
+        db.session.execute(db.insert(FoodTerm), [
+            row for food in batch for row in FoodTerm.rows_for(food)
+        ])
+        db.session.commit()
+    
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            name = (row.get('name') or '').strip()
+            brand = (row.get('brand') or '').strip() or None
+            if not name or (name, brand or '') in existing:
+                continue
+            existing.add((name, brand or ''))
+            batch.append(Food(
+                name=name,
+                brand=brand,
+                search_name=normalize_food_name(name),
+                calories_per_100g=parse_float(row.get('calories_per_100g')) or 0,
+                protein_per_100g=parse_float(row.get('protein_per_100g')) or 0,
+                carbs_per_100g=parse_float(row.get('carbs_per_100g')) or 0,
+                fats_per_100g=parse_float(row.get('fats_per_100g')) or 0,
+                serving_size_g=parse_float(row.get('serving_size_g')),
+                source=row.get('source') or 'bundled'
+            ))
+            if len(batch) >= BATCH_SIZE:
+                flush(batch)
+                added += len(batch)
+                batch = []
+    if batch:
+        flush(batch)
+        added += len(batch)
+    return added
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    with app.app_context():
+        db.create_all()
+        count = load_foods(path)
+        print(f"✓ Loaded {count} foods from {path}")
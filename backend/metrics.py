@@ -0,0 +1,301 @@
+"""
+Per-endpoint request metrics in Prometheus text format
+
+For every request this records, under the Flask endpoint (e.g.
+'classes.get_leaderboard') and HTTP method:
+    fittrack_request_duration_seconds   latency histogram
+    fittrack_db_statements_total        SQL statements executed
+    fittrack_db_duration_seconds_total  time spent in those statements
+
+SQL statements are counted by engine-wide before/after_cursor_execute
+listeners and attributed to the request running on the same thread.
+Statements outside a request (outbox sender, scripts) are not counted.
+
+Each OS thread adds to its own shard, so the request path takes no locks; a
+lock is only taken the first time a thread records anything. Shards are keyed
+by native thread id rather than held in a threading.local: under gevent's
+monkey patching a local is per greenlet, and every connection would leave a
+shard behind. Greenlets of one thread share its shard, which is safe because
+recording never yields. GET /metrics sums the
+shards. benchmarks/metrics_overhead.py measures the per-request cost.
+
+Counts are kept per process. With several gunicorn workers and no METRICS_DIR,
+each scrape sees only the worker that answered it, and alternating workers
+look like counter resets. With METRICS_DIR, every process writes its totals
+to its own file there every METRICS_FLUSH_SECONDS (and just before it answers
+a scrape), and GET /metrics sums all the files, like prometheus_client's
+multiprocess mode. A scrape may then lag other workers by one flush interval.
+Files of exited workers are kept so totals never go down; gunicorn.conf.py
+empties the directory when gunicorn starts.
+
+Configuration (environment):
+    METRICS_ENABLED         'false' turns off recording and /metrics (default true)
+    METRICS_TOKEN           /metrics requires 'Authorization: Bearer <token>';
+                            unset, /metrics answers 404 (it would otherwise
+                            publish per-endpoint traffic to anyone)
+    METRICS_DIR             directory shared by the workers on a host (default
+                            unset: per-process counts)
+    METRICS_FLUSH_SECONDS   how often each worker writes its file (default 5)
+"""
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from flask import request, Response, jsonify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = '<unmatched>'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class Metrics:
+    """Lock-free per-thread accumulators for request and SQL metrics"""
+
+    def __init__(self, enabled=True, token=None, buckets=DEFAULT_BUCKETS, clock=time.perf_counter,
+                 directory=None, flush_seconds=5.0):
+        self.enabled = enabled
+        self.token = token
+        self.buckets = tuple(buckets)
+        self.clock = clock
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._path = None
+        self._path_pid = None
+        self._flushed = None
+        self._flusher_pid = None
+        self._flush_lock = threading.Lock()
+        # In-flight request state, per thread or greenlet
+        self._local = threading.local()
+        # Native thread id -> {(endpoint, method): series}
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        # Series layout: bucket counts (+Inf last), latency sum, statements, DB seconds
+        self._sum = len(self.buckets) + 1
+        self._statements = self._sum + 1
+        self._db_seconds = self._sum + 2
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+            token=os.getenv('METRICS_TOKEN') or None,
+            directory=os.getenv('METRICS_DIR') or None,
+            flush_seconds=float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+        )
+
+    def _shard(self):
+        thread_id = threading.get_native_id()
+        shard = self._shards.get(thread_id)
+        if shard is None:
+            with self._shards_lock:
+                shard = self._shards.setdefault(thread_id, {})
+        return shard
+
+    # Request and statement hooks; in-flight state is per thread or greenlet
+
+    def start_request(self):
+        self._local.request = [self.clock(), 0, 0.0]
+
+    def before_statement(self):
+        if getattr(self._local, 'request', None) is not None:
+            self._local.statement_start = self.clock()
+
+    def after_statement(self):
+        current = getattr(self._local, 'request', None)
+        if current is not None:
+            current[1] += 1
+            current[2] += self.clock() - self._local.statement_start
+
+    def end_request(self, endpoint, method):
+        current = getattr(self._local, 'request', None)
+        if current is None:
+            return
+        self._local.request = None
+        started, statements, db_seconds = current
+        self.observe(endpoint, method, self.clock() - started, statements, db_seconds)
+
+    def observe(self, endpoint, method, seconds, statements=0, db_seconds=0.0):
+        shard = self._shard()
+        series = shard.get((endpoint, method))
+        if series is None:
+            series = shard[(endpoint, method)] = [0] * (len(self.buckets) + 1) + [0.0, 0, 0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[self._sum] += seconds
+        series[self._statements] += statements
+        series[self._db_seconds] += db_seconds
+
+    def snapshot(self):
+        """Series summed across threads: {(endpoint, method): [...]}"""
+        with self._shards_lock:
+            shards = list(self._shards.values())
+        totals = {}
+        for shard in shards:
+            for key, series in shard.copy().items():
+                add_series(totals, key, series)
+        return totals
+
+    # Sharing totals between processes through METRICS_DIR
+
+    def _file(self):
+        # A new name in each process, so a reused pid never overwrites the
+        # totals of the worker that had it before
+        if self._path_pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+            self._path_pid = os.getpid()
+            self._flushed = None
+        return self._path
+
+    def flush(self):
+        """Write this process's totals to its file in the shared directory"""
+        with self._flush_lock:
+            # Snapshot under the lock, so an older snapshot never overwrites a newer one
+            data = json.dumps([[endpoint, method, series]
+                               for (endpoint, method), series in sorted(self.snapshot().items())])
+            path = self._file()
+            if data == self._flushed:
+                return
+            # Readers only ever see a complete file
+            with open(f'{path}.tmp', 'w') as f:
+                f.write(data)
+            os.replace(f'{path}.tmp', path)
+            self._flushed = data
+
+    def start_flusher(self):
+        """Flush every flush_seconds from a daemon thread, once per process"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._shards_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Writing metrics to %s failed', self.directory)
+
+    def collect(self):
+        """Series to expose: this process's, or every process's with a directory"""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        totals = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                # Removed by a restart since listdir
+                continue
+            for endpoint, method, series in rows:
+                add_series(totals, (endpoint, method), series)
+        return totals
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards.values():
+                shard.clear()
+
+    def render(self):
+        """Prometheus text exposition (version 0.0.4)"""
+        totals = sorted(self.collect().items())
+        lines = [
+            '# HELP fittrack_request_duration_seconds Request latency by endpoint',
+            '# TYPE fittrack_request_duration_seconds histogram',
+        ]
+        for (endpoint, method), series in totals:
+            labels = f'endpoint="{escape(endpoint)}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'fittrack_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'fittrack_request_duration_seconds_sum{{{labels}}} {series[self._sum]}')
+            lines.append(f'fittrack_request_duration_seconds_count{{{labels}}} {cumulative}')
+        lines += [
+            '# HELP fittrack_db_statements_total SQL statements executed by endpoint',
+            '# TYPE fittrack_db_statements_total counter',
+        ]
+        for (endpoint, method), series in totals:
+            lines.append(f'fittrack_db_statements_total{{endpoint="{escape(endpoint)}",method="{method}"}} '
+                         f'{series[self._statements]}')
+        lines += [
+            '# HELP fittrack_db_duration_seconds_total Time spent executing SQL by endpoint',
+            '# TYPE fittrack_db_duration_seconds_total counter',
+        ]
+        for (endpoint, method), series in totals:
+            lines.append(f'fittrack_db_duration_seconds_total{{endpoint="{escape(endpoint)}",method="{method}"}} '
+                         f'{series[self._db_seconds]}')
+        return '\n'.join(lines) + '\n'
+
+
+def add_series(totals, key, series):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(series)
+    else:
+        for i, value in enumerate(series):
+            total[i] += value
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics.from_env()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.before_statement()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.after_statement()
+
+
+def metrics_view():
+    if not metrics.token:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied, f'Bearer {metrics.token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Record every request and serve GET /metrics"""
+    if not metrics.enabled:
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        metrics.start_flusher()
+        metrics.start_request()
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        # Unmatched paths and odd methods share series, so scanners cannot
+        # grow the output without bound
+        method = request.method if request.method in METHODS else 'OTHER'
+        metrics.end_request(request.endpoint or UNMATCHED, method)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,33 @@
+"""
+Migration: Add (class_id, due_date) index to assigned_workouts table
+
+The "my assignments" feed joins a student's memberships to assigned_workouts and
+orders by due date. db.create_all() does not add indexes to existing tables, so
+this creates ix_assigned_workouts_class_due_date on databases created earlier.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from sqlalchemy import text, inspect
+
+def migrate():
+    """Create the (class_id, due_date) index on assigned_workouts"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        indexes = inspector.get_indexes('assigned_workouts')
+        
+        if any(i['name'] == 'ix_assigned_workouts_class_due_date' for i in indexes):
+            print("✓ Index 'ix_assigned_workouts_class_due_date' already exists. Migration not needed.")
+            return
+        
+        print("Creating index 'ix_assigned_workouts_class_due_date'...")
+        db.session.execute(text(
+            "CREATE INDEX ix_assigned_workouts_class_due_date ON assigned_workouts (class_id, due_date)"
+        ))
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
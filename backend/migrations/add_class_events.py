@@ -0,0 +1,30 @@
+"""
+Migration: Add class_events table
+
+Live class events are now written to class_events so that event streams in
+every gunicorn worker see them, not only the worker that handled the
+completion. This creates the table on databases created before it existed.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from models.classes import ClassEvent
+from sqlalchemy import inspect
+
+def migrate():
+    """Create the class_events table"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        
+        if 'class_events' in inspector.get_table_names():
+            print("✓ Table 'class_events' already exists. Migration not needed.")
+            return
+        
+        print("Creating table 'class_events'...")
+        ClassEvent.__table__.create(db.engine)
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
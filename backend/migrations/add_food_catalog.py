@@ -0,0 +1,41 @@
+"""
+Migration: Add the food catalog and link meals to catalog foods
+
+Creates the foods and food_terms tables (with the ix_food_terms_term_rank search
+index) and adds the nullable food_id and quantity_g columns to meals. Existing
+meals keep their typed-in macros. Load the bundled dataset afterwards with
+`python load_foods.py`.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from models.macros import Food, FoodTerm
+from sqlalchemy import text, inspect
+
+def migrate():
+    """Create catalog tables and add food columns to meals"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        tables = inspector.get_table_names()
+        
+        if 'foods' in tables and 'food_terms' in tables:
+            print("✓ Tables 'foods' and 'food_terms' already exist.")
+        else:
+            print("Creating tables 'foods' and 'food_terms'...")
+            db.metadata.create_all(db.engine, tables=[Food.__table__, FoodTerm.__table__])
+            print("✓ Catalog tables created")
+        
+        columns = [c['name'] for c in inspector.get_columns('meals')]
+        if 'food_id' not in columns:
+            print("Adding column 'meals.food_id'...")
+            db.session.execute(text("ALTER TABLE meals ADD COLUMN food_id INTEGER REFERENCES foods(id)"))
+        if 'quantity_g' not in columns:
+            print("Adding column 'meals.quantity_g'...")
+            db.session.execute(text("ALTER TABLE meals ADD COLUMN quantity_g FLOAT"))
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,34 @@
+"""
+Migration: Add (food_id, term) index to food_terms table
+
+Food search takes each lead word's best rows from ix_food_terms_term_rank and
+checks the other query words of each candidate food through
+ix_food_terms_food_term. db.create_all() does not add indexes to existing
+tables, so this creates it on databases created earlier.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from sqlalchemy import text, inspect
+
+def migrate():
+    """Create the (food_id, term) index on food_terms"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        indexes = inspector.get_indexes('food_terms')
+        
+        if any(i['name'] == 'ix_food_terms_food_term' for i in indexes):
+            print("✓ Index 'ix_food_terms_food_term' already exists. Migration not needed.")
+            return
+        
+        print("Creating index 'ix_food_terms_food_term'...")
+        db.session.execute(text(
+            "CREATE INDEX ix_food_terms_food_term ON food_terms (food_id, term)"
+        ))
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,50 @@
+"""
+Migration: Allow at most one active macro goal per user
+
+GET /api/macros/goals used to insert a default goal, so concurrent first
+requests could leave a user with several active goals. This keeps the most
+recently updated active goal per user, deactivates the rest, and then creates
+the partial unique index uq_macro_goals_user_active on (user_id) WHERE is_active.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from models.macros import MacroGoal
+from sqlalchemy import text, inspect
+
+def migrate():
+    """Deactivate duplicate active goals and create the partial unique index"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        indexes = inspector.get_indexes('macro_goals')
+        
+        if any(i['name'] == 'uq_macro_goals_user_active' for i in indexes):
+            print("✓ Index 'uq_macro_goals_user_active' already exists. Migration not needed.")
+            return
+        
+        active_goals = MacroGoal.query.filter_by(is_active=True).order_by(
+            MacroGoal.user_id,
+            MacroGoal.updated_at.desc(),
+            MacroGoal.id.desc()
+        ).all()
+        seen_users = set()
+        deactivated = 0
+        for goal in active_goals:
+            if goal.user_id in seen_users:
+                goal.is_active = False
+                deactivated += 1
+            seen_users.add(goal.user_id)
+        db.session.commit()
+        print(f"✓ Deactivated {deactivated} duplicate active goals")
+        
+        print("Creating index 'uq_macro_goals_user_active'...")
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX uq_macro_goals_user_active ON macro_goals (user_id) WHERE is_active"
+        ))
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
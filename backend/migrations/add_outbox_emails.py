@@ -0,0 +1,31 @@
+"""
+Migration: Add outbox_emails table
+
+Password reset emails are now queued in outbox_emails by the request and sent
+by a background sender. This creates the table (with the
+ix_outbox_emails_status_next_attempt index the sender polls) on databases
+created before it existed.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from models.outbox import OutboxEmail
+from sqlalchemy import inspect
+
+def migrate():
+    """Create the outbox_emails table"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        
+        if 'outbox_emails' in inspector.get_table_names():
+            print("✓ Table 'outbox_emails' already exists. Migration not needed.")
+            return
+        
+        print("Creating table 'outbox_emails'...")
+        OutboxEmail.__table__.create(db.engine)
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
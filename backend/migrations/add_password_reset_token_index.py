@@ -0,0 +1,36 @@
+"""
+Migration: Add (user_id, used, expires_at) index to password_reset_tokens table
+
+forgot-password now only inserts a token. reset-password checks for a newer
+token and marks the user's unused tokens as used, and sweep_tokens.py deletes
+expired and used rows, all through ix_password_reset_tokens_user_used_expires.
+db.create_all() does not add indexes to existing tables, so this creates it on
+databases created earlier.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from sqlalchemy import text, inspect
+
+def migrate():
+    """Create the (user_id, used, expires_at) index on password_reset_tokens"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        indexes = inspector.get_indexes('password_reset_tokens')
+        
+        if any(i['name'] == 'ix_password_reset_tokens_user_used_expires' for i in indexes):
+            print("✓ Index 'ix_password_reset_tokens_user_used_expires' already exists. Migration not needed.")
+            return
+        
+        print("Creating index 'ix_password_reset_tokens_user_used_expires'...")
+        db.session.execute(text(
+            "CREATE INDEX ix_password_reset_tokens_user_used_expires "
+            "ON password_reset_tokens (user_id, used, expires_at)"
+        ))
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,30 @@
+"""
+Migration: Add refresh_tokens table
+
+Login and register now return a rotating refresh token, stored as an HMAC in
+refresh_tokens (unique index on token_hash, plus indexes on family_id and
+user_id). This creates the table on databases created before it existed.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from models.user import RefreshToken
+from sqlalchemy import inspect
+
+def migrate():
+    """Create the refresh_tokens table"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        
+        if 'refresh_tokens' in inspector.get_table_names():
+            print("✓ Table 'refresh_tokens' already exists. Migration not needed.")
+            return
+        
+        print("Creating table 'refresh_tokens'...")
+        RefreshToken.__table__.create(db.engine)
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,47 @@
+"""
+Migration: Prune placeholder rows from student_workout_logs table
+
+Assigning a workout used to create an empty StudentWorkoutLog (completed=False)
+for every class member. Logs are now created on completion and pending state is
+derived from class membership, so the placeholders only cost storage and index
+space. A placeholder is a log that is not completed and has no completion data.
+
+Works on both SQLite and PostgreSQL.
+"""
+
+from app import app
+from models import db
+from sqlalchemy import text
+
+def migrate():
+    """Delete empty, never-completed student workout logs"""
+    with app.app_context():
+        placeholder_filter = """
+            (completed = :false OR completed IS NULL)
+            AND completed_at IS NULL
+            AND workout_id IS NULL
+            AND duration IS NULL
+            AND total_volume IS NULL
+            AND calories_burned IS NULL
+            AND (notes IS NULL OR notes = '')
+        """
+        
+        count = db.session.execute(
+            text(f"SELECT COUNT(*) FROM student_workout_logs WHERE {placeholder_filter}"),
+            {'false': False}
+        ).scalar()
+        
+        if not count:
+            print("✓ No placeholder student logs found. Migration not needed.")
+            return
+        
+        print(f"Deleting {count} placeholder student logs...")
+        db.session.execute(
+            text(f"DELETE FROM student_workout_logs WHERE {placeholder_filter}"),
+            {'false': False}
+        )
+        db.session.commit()
+        print("✓ Migration completed successfully")
+
+if __name__ == '__main__':
+    migrate()
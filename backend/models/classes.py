@@ -1,5 +1,5 @@
 from models import db
-from datetime import datetime
+from datetime import datetime, timedelta
 import secrets
 import string
 
@@ -39,21 +39,29 @@ class Class(db.Model):
         """Get count of members in this class"""
         return len(self.memberships)
     
-    def to_dict(self, include_members=False):
+    def to_dict(self, include_members=False, member_count=None, users=None):
+        """Serialize the class; with a UserMap, users are referenced by id only"""
         result = {
             'id': self.id,
             'instructor_id': self.instructor_id,
-            'instructor': self.instructor.to_dict() if self.instructor else None,
             'name': self.name,
             'description': self.description,
             'join_code': self.join_code,
-            'member_count': self.get_member_count(),
+            'member_count': member_count if member_count is not None else self.get_member_count(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
+        if users is not None:
+            users.ref(self.instructor_id)
+        else:
+            result['instructor'] = self.instructor.to_dict() if self.instructor else None
+        
         if include_members:
-            result['members'] = [m.to_dict() for m in self.get_members()]
+            if users is not None:
+                result['member_ids'] = [users.ref(m.student_id) for m in self.memberships]
+            else:
+                result['members'] = [m.to_dict() for m in self.get_members()]
         
         return result
 
@@ -74,16 +82,22 @@ class ClassJoinRequest(db.Model):
     # Unique constraint: a student can only have one pending request per class
     __table_args__ = (db.UniqueConstraint('class_id', 'student_id', name='unique_class_join_request'),)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, users=None):
+        result = {
             'id': self.id,
             'class_id': self.class_id,
             'student_id': self.student_id,
-            'student': self.student.to_dict() if self.student else None,
             'status': self.status,
             'requested_at': self.requested_at.isoformat() if self.requested_at else None,
             'responded_at': self.responded_at.isoformat() if self.responded_at else None
         }
+        
+        if users is not None:
+            users.ref(self.student_id)
+        else:
+            result['student'] = self.student.to_dict() if self.student else None
+        
+        return result
 
 
 class ClassMembership(db.Model):
@@ -100,14 +114,20 @@ class ClassMembership(db.Model):
     # Unique constraint: a student can only join a class once
     __table_args__ = (db.UniqueConstraint('class_id', 'student_id', name='unique_class_membership'),)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, users=None):
+        result = {
             'id': self.id,
             'class_id': self.class_id,
             'student_id': self.student_id,
-            'student': self.student.to_dict() if self.student else None,
             'joined_at': self.joined_at.isoformat() if self.joined_at else None
         }
+        
+        if users is not None:
+            users.ref(self.student_id)
+        else:
+            result['student'] = self.student.to_dict() if self.student else None
+        
+        return result
 
 
 class AssignedWorkout(db.Model):
@@ -127,35 +147,113 @@ class AssignedWorkout(db.Model):
     instructor = db.relationship('User', backref='assigned_workouts', foreign_keys=[instructor_id])
     student_logs = db.relationship('StudentWorkoutLog', backref='assigned_workout', lazy=True, cascade='all, delete-orphan')
     
-    def get_completion_stats(self):
-        """Get completion statistics for this assignment"""
-        class_obj = Class.query.get(self.class_id)
-        total_students = class_obj.get_member_count() if class_obj else 0
-        completed_count = len([log for log in self.student_logs if log.completed])
-        
+    # Nested log relations that to_dict(include_logs=True) can expand
+    LOG_EXPANSIONS = ('student', 'workout')
+    
+    # Serves per-class listings and the cross-class "my assignments" feed ordered by due date
+    __table_args__ = (db.Index('ix_assigned_workouts_class_due_date', 'class_id', 'due_date'),)
+    
+    @staticmethod
+    def completion_stats(total_students, completed_count):
         return {
             'total_students': total_students,
             'completed_count': completed_count,
+            'pending_count': total_students - completed_count,
             'completion_rate': (completed_count / total_students * 100) if total_students > 0 else 0
         }
     
-    def to_dict(self, include_logs=False):
+    def get_completion_stats(self):
+        """Get completion statistics for this assignment.
+
+        Pending is derived as class members minus completed logs, so the
+        numbers are the same whether or not placeholder logs exist.
+        """
+        return AssignedWorkout.completion_stats_for(self.class_id, [self])[self.id]
+    
+    @classmethod
+    def completion_stats_for(cls, class_id, assignments):
+        """get_completion_stats for several assignments of one class in two queries"""
+        total_students = ClassMembership.query.filter_by(class_id=class_id).count()
+        completed = {}
+        if assignments:
+            completed = dict(db.session.query(
+                StudentWorkoutLog.assigned_workout_id,
+                db.func.count(StudentWorkoutLog.id)
+            ).join(
+                ClassMembership,
+                db.and_(
+                    ClassMembership.class_id == class_id,
+                    ClassMembership.student_id == StudentWorkoutLog.student_id
+                )
+            ).filter(
+                StudentWorkoutLog.assigned_workout_id.in_([a.id for a in assignments]),
+                StudentWorkoutLog.completed == True
+            ).group_by(StudentWorkoutLog.assigned_workout_id).all())
+        return {
+            a.id: cls.completion_stats(total_students, completed.get(a.id, 0))
+            for a in assignments
+        }
+    
+    def get_pending_students(self):
+        """Get class members who have not completed this assignment"""
+        from models.user import User
+        completed_ids = db.session.query(StudentWorkoutLog.student_id).filter(
+            StudentWorkoutLog.assigned_workout_id == self.id,
+            StudentWorkoutLog.completed == True
+        )
+        return User.query.join(ClassMembership, ClassMembership.student_id == User.id).filter(
+            ClassMembership.class_id == self.class_id,
+            ~User.id.in_(completed_ids)
+        ).all()
+    
+    def get_student_logs(self, expand=()):
+        """Get this assignment's logs, bulk-loading the expanded relations"""
+        return StudentWorkoutLog.query.filter_by(assigned_workout_id=self.id).options(
+            *StudentWorkoutLog.load_options(expand)
+        ).order_by(StudentWorkoutLog.id).all()
+    
+    def to_dict(self, include_logs=False, expand=(), users=None, completion_stats=None):
+        """Serialize the assignment; expand ('student', 'workout') adds nested log relations.
+
+        Listings pass completion_stats from completion_stats_for() so the
+        statistics are not queried per assignment.
+        """
         result = {
             'id': self.id,
             'class_id': self.class_id,
             'instructor_id': self.instructor_id,
-            'instructor': self.instructor.to_dict() if self.instructor else None,
             'name': self.name,
             'description': self.description,
             'workout_template': self.workout_template,
             'assigned_date': self.assigned_date.isoformat() if self.assigned_date else None,
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'completion_stats': self.get_completion_stats()
+            'completion_stats': completion_stats if completion_stats is not None else self.get_completion_stats()
         }
         
+        if users is not None:
+            users.ref(self.instructor_id)
+        else:
+            result['instructor'] = self.instructor.to_dict() if self.instructor else None
+        
         if include_logs:
-            result['student_logs'] = [log.to_dict() for log in self.student_logs]
+            # Side-loaded students come from the user map, so they are never bulk-loaded here
+            log_expand = set(expand) - {'student'} if users is not None else expand
+            result['student_logs'] = [
+                log.to_dict(
+                    include_student='student' in expand,
+                    include_workout='workout' in expand,
+                    users=users
+                )
+                for log in self.get_student_logs(log_expand)
+            ]
+            pending_students = self.get_pending_students()
+            if 'student' in expand and users is None:
+                result['pending_students'] = [u.to_dict() for u in pending_students]
+            elif users is not None:
+                result['pending_student_ids'] = [users.ref(u.id) for u in pending_students]
+            else:
+                result['pending_student_ids'] = [u.id for u in pending_students]
         
         return result
 
@@ -183,14 +281,25 @@ class StudentWorkoutLog(db.Model):
     # Unique constraint: a student can only have one log per assigned workout
     __table_args__ = (db.UniqueConstraint('assigned_workout_id', 'student_id', name='unique_student_workout_log'),)
     
-    def to_dict(self):
-        return {
+    @staticmethod
+    def load_options(expand=()):
+        """Loader options that bulk-load the relations to_dict() will include"""
+        from sqlalchemy.orm import selectinload
+        from models.workout import Workout
+        
+        options = []
+        if 'student' in expand:
+            options.append(selectinload(StudentWorkoutLog.student))
+        if 'workout' in expand:
+            options.append(selectinload(StudentWorkoutLog.workout).options(Workout.detail_options()))
+        return options
+    
+    def to_dict(self, include_student=True, include_workout=True, users=None):
+        result = {
             'id': self.id,
             'assigned_workout_id': self.assigned_workout_id,
             'student_id': self.student_id,
-            'student': self.student.to_dict() if self.student else None,
             'workout_id': self.workout_id,
-            'workout': self.workout.to_dict() if self.workout else None,
             'completed': self.completed,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'duration': self.duration,
@@ -198,3 +307,29 @@ class StudentWorkoutLog(db.Model):
             'calories_burned': self.calories_burned,
             'notes': self.notes
         }
+        
+        if users is not None:
+            users.ref(self.student_id)
+        elif include_student:
+            result['student'] = self.student.to_dict() if self.student else None
+        if include_workout:
+            result['workout'] = self.workout.to_dict() if self.workout else None
+        
+        return result
+
+
+class ClassEvent(db.Model):
+    """Live class event, shared by every worker's event streams (see class_events.py)"""
+    __tablename__ = 'class_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON payload
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    @classmethod
+    def sweep(cls, batch_size=1000, max_age=timedelta(hours=1)):
+        """Delete events older than max_age; streams only ever read new rows"""
+        from models.user import sweep_batches
+        return sweep_batches(cls, cls.created_at < datetime.utcnow() - max_age, batch_size)
@@ -1,5 +1,12 @@
 from models import db
 from datetime import datetime, date
+import re
+import unicodedata
+
+def normalize_food_name(name):
+    """Lowercase, strip accents and punctuation for food search"""
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower()).split())
 
 class MacroGoal(db.Model):
     """User's macro goals/plan"""
@@ -16,6 +23,15 @@ class MacroGoal(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # At most one active goal per user
+    __table_args__ = (
+        db.Index(
+            'uq_macro_goals_user_active', 'user_id', unique=True,
+            sqlite_where=db.text('is_active'),
+            postgresql_where=db.text('is_active')
+        ),
+    )
+    
     # Relationship
     user = db.relationship('User', backref='macro_goals')
     
@@ -28,9 +44,81 @@ class MacroGoal(db.Model):
             'carbs': self.carbs,
             'fats': self.fats,
             'is_active': self.is_active,
+            'is_default': False,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Food(db.Model):
+    """Catalog food with nutrients per 100 g, loaded from the bundled dataset"""
+    __tablename__ = 'foods'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    brand = db.Column(db.String(120))
+    search_name = db.Column(db.String(200), nullable=False)  # normalize_food_name(name)
+    calories_per_100g = db.Column(db.Float, nullable=False, default=0)
+    protein_per_100g = db.Column(db.Float, nullable=False, default=0)  # in grams
+    carbs_per_100g = db.Column(db.Float, nullable=False, default=0)  # in grams
+    fats_per_100g = db.Column(db.Float, nullable=False, default=0)  # in grams
+    serving_size_g = db.Column(db.Float)  # typical serving, if known
+    source = db.Column(db.String(50))
+    
+    def nutrients_for(self, quantity_g):
+        """Macros for a quantity in grams"""
+        factor = quantity_g / 100.0
+        return {
+            'calories': round(self.calories_per_100g * factor, 1),
+            'protein': round(self.protein_per_100g * factor, 1),
+            'carbs': round(self.carbs_per_100g * factor, 1),
+            'fats': round(self.fats_per_100g * factor, 1)
+        }
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'brand': self.brand,
+            'calories_per_100g': self.calories_per_100g,
+            'protein_per_100g': self.protein_per_100g,
+            'carbs_per_100g': self.carbs_per_100g,
+            'fats_per_100g': self.fats_per_100g,
+            'serving_size_g': self.serving_size_g
+        }
+
+class FoodTerm(db.Model):
+    """Word index for food search: one row per distinct word of a food's name.
+    
+    position and name_length are copied from the food so search can rank and
+    limit matches from the covering index alone, without reading foods rows.
+    The (food_id, term) index checks a candidate's other query words.
+    """
+    __tablename__ = 'food_terms'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), nullable=False)
+    food_id = db.Column(db.Integer, db.ForeignKey('foods.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # index of the word in the name
+    name_length = db.Column(db.Integer, nullable=False)  # len(food.search_name)
+    
+    __table_args__ = (
+        db.Index('ix_food_terms_term_rank', 'term', 'position', 'name_length', 'food_id'),
+        db.Index('ix_food_terms_food_term', 'food_id', 'term'),
+    )
+    
+    @staticmethod
+    def rows_for(food):
+        """Term rows for a flushed food, keeping each word's first position"""
+        words = food.search_name.split()
+        rows = {}
+        for position, word in enumerate(words):
+            rows.setdefault(word[:64], {
+                'term': word[:64],
+                'food_id': food.id,
+                'position': position,
+                'name_length': len(food.search_name)
+            })
+        return list(rows.values())
+
 class Meal(db.Model):
     """Individual meal entry"""
     __tablename__ = 'meals'
@@ -45,11 +133,14 @@ class Meal(db.Model):
     protein = db.Column(db.Float, nullable=False, default=0)  # in grams
     carbs = db.Column(db.Float, nullable=False, default=0)  # in grams
     fats = db.Column(db.Float, nullable=False, default=0)  # in grams
+    food_id = db.Column(db.Integer, db.ForeignKey('foods.id'))  # catalog food, if logged from search
+    quantity_g = db.Column(db.Float)  # grams of the catalog food
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
     user = db.relationship('User', backref='meals')
+    food = db.relationship('Food')
     
     def to_dict(self):
         return {
@@ -58,6 +149,8 @@ class Meal(db.Model):
             'meal_type': self.meal_type,
             'name': self.name,
             'description': self.description,
+            'food_id': self.food_id,
+            'quantity_g': self.quantity_g,
             'calories': self.calories,
             'protein': self.protein,
             'carbs': self.carbs,
@@ -0,0 +1,23 @@
+from models import db
+from datetime import datetime
+
+class OutboxEmail(db.Model):
+    """Email queued by a request and delivered by the outbox sender"""
+    __tablename__ = 'outbox_emails'
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_address = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    text_body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    # The sender polls for due rows: status IN (...) AND next_attempt_at <= now
+    __table_args__ = (
+        db.Index('ix_outbox_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
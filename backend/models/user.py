@@ -1,6 +1,28 @@
 from models import db
 from datetime import datetime, timedelta
-import bcrypt
+from flask import current_app
+from passwords import hasher
+import hashlib
+import hmac
+import secrets
+
+def sweep_batches(model, condition, batch_size):
+    """Delete rows matching condition, batch_size at a time, committing each batch.
+    
+    DELETE ... LIMIT is not portable, so each batch deletes by primary key from
+    a limited subquery. Short transactions keep locks brief while requests keep
+    writing to the table.
+    """
+    total = 0
+    while True:
+        batch = db.select(model.id).where(condition).limit(batch_size).scalar_subquery()
+        deleted = db.session.execute(
+            db.delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
 
 class PasswordResetToken(db.Model):
     """Password reset token model for persistent storage"""
@@ -16,17 +38,110 @@ class PasswordResetToken(db.Model):
     # Relationship
     user = db.relationship('User', backref='password_reset_tokens')
     
+    # forgot-password inserts without touching older tokens; reset-password
+    # looks up a user's newer and unused tokens through this index
+    __table_args__ = (
+        db.Index('ix_password_reset_tokens_user_used_expires', 'user_id', 'used', 'expires_at'),
+    )
+    
     def is_valid(self):
         """Check if token is valid (not expired and not used)"""
         return not self.used and datetime.utcnow() < self.expires_at
     
+    def is_superseded(self):
+        """Check if the user requested another reset after this token"""
+        return db.session.query(
+            PasswordResetToken.query.filter(
+                PasswordResetToken.user_id == self.user_id,
+                PasswordResetToken.id > self.id
+            ).exists()
+        ).scalar()
+    
     @classmethod
-    def cleanup_expired(cls):
-        """Delete expired tokens"""
-        expired = cls.query.filter(cls.expires_at < datetime.utcnow()).all()
-        for token in expired:
-            db.session.delete(token)
-        db.session.commit()
+    def invalidate_user(cls, user_id):
+        """Mark every unused token of a user as used"""
+        cls.query.filter(
+            cls.user_id == user_id,
+            cls.used == False
+        ).update({'used': True}, synchronize_session=False)
+    
+    @classmethod
+    def sweep(cls, batch_size=1000):
+        """Delete expired and used tokens in batches; returns rows deleted"""
+        return sweep_batches(cls, db.or_(cls.expires_at < datetime.utcnow(), cls.used == True), batch_size)
+
+class RefreshToken(db.Model):
+    """Rotating refresh token, stored as an HMAC of the token value.
+    
+    Each refresh revokes the presented token and issues a successor in the
+    same family. Presenting a revoked token means it was replayed, so the whole
+    family is revoked.
+    """
+    __tablename__ = 'refresh_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    family_id = db.Column(db.String(32), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime)  # set when rotated, logged out or revoked
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def hash_token(token):
+        """HMAC-SHA256 of a token value, keyed with the JWT secret"""
+        key = current_app.config['JWT_SECRET_KEY'].encode('utf-8')
+        return hmac.new(key, token.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    @classmethod
+    def issue(cls, user_id, family_id=None):
+        """Create a token (in the session) and return its raw value"""
+        token = secrets.token_urlsafe(32)
+        lifetime = current_app.config['REFRESH_TOKEN_EXPIRES']
+        db.session.add(cls(
+            token_hash=cls.hash_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            user_id=user_id,
+            expires_at=datetime.utcnow() + lifetime
+        ))
+        return token
+    
+    @classmethod
+    def find(cls, token):
+        return cls.query.filter_by(token_hash=cls.hash_token(token)).first()
+    
+    def revoke(self):
+        """Atomically revoke this token; False if it was already revoked"""
+        return db.session.execute(
+            db.update(RefreshToken)
+            .where(RefreshToken.id == self.id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+    
+    @classmethod
+    def revoke_family(cls, family_id):
+        cls.query.filter(
+            cls.family_id == family_id,
+            cls.revoked_at.is_(None)
+        ).update({'revoked_at': datetime.utcnow()}, synchronize_session=False)
+    
+    @classmethod
+    def revoke_user(cls, user_id):
+        """Revoke every active token of a user (e.g. after a password change)"""
+        cls.query.filter(
+            cls.user_id == user_id,
+            cls.revoked_at.is_(None)
+        ).update({'revoked_at': datetime.utcnow()}, synchronize_session=False)
+    
+    @classmethod
+    def sweep(cls, batch_size=1000):
+        """Delete expired tokens in batches; returns rows deleted.
+        
+        Revoked tokens are kept until they expire so that a replay is still
+        recognised as reuse of the family.
+        """
+        return sweep_batches(cls, cls.expires_at < datetime.utcnow(), batch_size)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -46,11 +161,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
         """Check if the provided password matches the hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return hasher.verify(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses a different bcrypt cost than configured"""
+        return hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -63,3 +182,25 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class UserMap:
+    """Side-loaded users for a response.
+
+    Serializers record user ids here instead of embedding User.to_dict() per
+    row, and to_dict() then loads every referenced user in one query.
+    """
+    
+    def __init__(self):
+        self.user_ids = set()
+    
+    def ref(self, user_id):
+        """Record a referenced user and return its id"""
+        if user_id is not None:
+            self.user_ids.add(user_id)
+        return user_id
+    
+    def to_dict(self):
+        if not self.user_ids:
+            return {}
+        users = User.query.filter(User.id.in_(self.user_ids)).all()
+        return {str(user.id): user.to_dict() for user in users}
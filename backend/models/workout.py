@@ -1,5 +1,6 @@
 from models import db
 from datetime import datetime
+from sqlalchemy.orm import selectinload
 
 class Workout(db.Model):
     __tablename__ = 'workouts'
@@ -17,6 +18,18 @@ class Workout(db.Model):
     # Relationships
     exercises = db.relationship('WorkoutExercise', backref='workout', lazy=True, cascade='all, delete-orphan')
     
+    @staticmethod
+    def detail_options():
+        """Loader options for everything to_dict() serializes.
+        
+        Adds three queries however many workouts are loaded, instead of
+        lazy-loading exercises and their sets per workout.
+        """
+        return selectinload(Workout.exercises).options(
+            selectinload(WorkoutExercise.exercise),
+            selectinload(WorkoutExercise.sets)
+        )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -115,17 +128,26 @@ class Routine(db.Model):
     
     user = db.relationship('User', backref='routines')
     
-    def get_exercises(self):
+    def exercise_id_list(self):
+        return [int(id) for id in self.exercise_ids.split(',')] if self.exercise_ids else []
+    
+    @staticmethod
+    def load_exercises(routines):
+        """Exercises referenced by any of the routines, by id, in one query"""
+        exercise_ids = {id for routine in routines for id in routine.exercise_id_list()}
+        if not exercise_ids:
+            return {}
+        return {ex.id: ex for ex in Exercise.query.filter(Exercise.id.in_(exercise_ids))}
+    
+    def get_exercises(self, exercises_by_id=None):
         """Get list of exercises in this routine"""
-        if not self.exercise_ids:
-            return []
-        exercise_ids = [int(id) for id in self.exercise_ids.split(',')]
-        exercises = Exercise.query.filter(Exercise.id.in_(exercise_ids)).all()
+        if exercises_by_id is None:
+            exercises_by_id = Routine.load_exercises([self])
         # Maintain order from exercise_ids
-        exercise_dict = {ex.id: ex for ex in exercises}
-        return [exercise_dict[id] for id in exercise_ids if id in exercise_dict]
+        return [exercises_by_id[id] for id in self.exercise_id_list() if id in exercises_by_id]
     
-    def to_dict(self):
+    def to_dict(self, exercises_by_id=None):
+        """Serialize the routine; pass load_exercises() when serializing several"""
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -133,8 +155,8 @@ class Routine(db.Model):
             'description': self.description,
             'icon': self.icon,
             'exercise_count': self.exercise_count,
-            'exercise_ids': [int(id) for id in self.exercise_ids.split(',')] if self.exercise_ids else [],
-            'exercises': [ex.to_dict() for ex in self.get_exercises()],
+            'exercise_ids': self.exercise_id_list(),
+            'exercises': [ex.to_dict() for ex in self.get_exercises(exercises_by_id)],
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
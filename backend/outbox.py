@@ -0,0 +1,295 @@
+"""
+Email outbox: queue in the request, deliver in the background
+
+Requests add an OutboxEmail row in their own transaction (enqueue_email) and
+return. A background thread per worker (OutboxWorker) claims due rows in
+batches, sends them over one reused SMTP connection, and retries failures
+with exponential backoff. Claims are conditional UPDATEs with a lease, so
+several gunicorn workers, or `python send_outbox.py`, can drain the same
+table without sending anything twice. A sender that dies mid-batch leaves rows
+that become claimable again when the lease expires.
+
+Configuration (environment):
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM
+    SMTP_STARTTLS            'false' for relays without TLS (default true)
+    SMTP_TIMEOUT             socket timeout in seconds (default 10)
+    EMAIL_BATCH_SIZE         rows claimed per pass (default 20)
+    EMAIL_MAX_ATTEMPTS       attempts before a row is marked failed (default 5)
+    EMAIL_POLL_INTERVAL      seconds between passes when idle (default 5)
+    EMAIL_OUTBOX_WORKER      'false' to leave delivery to `python send_outbox.py`
+                             (default true, false on Lambda)
+Without SMTP_HOST, emails are written to the log instead of sent.
+
+Each worker starts its sender on its first request, so rows still waiting on a
+retry after a restart are sent without a new email to wake it. Lambda freezes
+the container between invocations, which would leave a background send hanging
+mid-conversation, so there the `outbox` function in serverless.yml runs
+send_outbox.handler on a schedule instead.
+
+smtplib and the email package are imported by the sender on first use, so
+processes that only enqueue (e.g. a cold Lambda) never load them.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db
+from models.outbox import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+SMTP_IDLE_SECONDS = 60
+
+
+def enqueue_email(to_address, subject, text_body, html_body=None):
+    """Add an email to the outbox in the current transaction"""
+    email = OutboxEmail(
+        to_address=to_address,
+        subject=subject,
+        text_body=text_body,
+        html_body=html_body,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(email)
+    return email
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+class SMTPSender:
+    """One SMTP connection, opened on demand and reused across sends"""
+
+    def __init__(self, host=None, port=587, username=None, password=None,
+                 from_address=None, starttls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.from_address = from_address or username
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+        self._last_used = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv('SMTP_HOST'),
+            port=int(os.getenv('SMTP_PORT', '587')),
+            username=os.getenv('SMTP_USER'),
+            password=os.getenv('SMTP_PASSWORD'),
+            from_address=os.getenv('SMTP_FROM'),
+            starttls=os.getenv('SMTP_STARTTLS', 'true').lower() == 'true',
+            timeout=int(os.getenv('SMTP_TIMEOUT', '10'))
+        )
+
+    @property
+    def configured(self):
+        return bool(self.host)
+
+    def _connect(self):
+        import smtplib
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    def _connection(self):
+        import smtplib
+        # Relays drop idle connections; check one that has sat unused a while
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            try:
+                self._server.noop()
+            except smtplib.SMTPException:
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def build_message(self, email):
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = email.subject
+        msg['From'] = self.from_address
+        msg['To'] = email.to_address
+        msg.attach(MIMEText(email.text_body, 'plain'))
+        if email.html_body:
+            msg.attach(MIMEText(email.html_body, 'html'))
+        return msg
+
+    def send(self, email):
+        """Send an OutboxEmail, reconnecting once if the connection went away"""
+        if not self.configured:
+            logger.warning(f"SMTP not configured. Email to {email.to_address}: "
+                           f"{email.subject}\n{email.text_body}")
+            return
+        import smtplib
+        msg = self.build_message(email)
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._connection().send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            import smtplib
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            self.close()
+
+
+def claim_batch(batch_size):
+    """Claim up to batch_size due emails for this sender"""
+    now = datetime.utcnow()
+    candidates = [row.id for row in db.session.query(OutboxEmail.id).filter(
+        OutboxEmail.status.in_(('pending', 'sending')),
+        OutboxEmail.next_attempt_at <= now
+    ).order_by(OutboxEmail.next_attempt_at).limit(batch_size)]
+
+    claimed = []
+    for email_id in candidates:
+        # Only one sender wins each row; the lease lets a crashed claim expire
+        won = db.session.execute(
+            db.update(OutboxEmail)
+            .where(
+                OutboxEmail.id == email_id,
+                OutboxEmail.status.in_(('pending', 'sending')),
+                OutboxEmail.next_attempt_at <= now
+            )
+            .values(
+                status='sending',
+                attempts=OutboxEmail.attempts + 1,
+                next_attempt_at=now + CLAIM_LEASE
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if won:
+            claimed.append(email_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return OutboxEmail.query.filter(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id).all()
+
+
+def process_outbox(sender, batch_size=20, max_attempts=5):
+    """Send one batch of due emails; returns how many were sent"""
+    sent = 0
+    for email in claim_batch(batch_size):
+        try:
+            sender.send(email)
+        except Exception as e:
+            sender.close()
+            email.last_error = str(e)
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+                logger.error(f"Giving up on email {email.id} to {email.to_address}: {e}")
+            else:
+                email.status = 'pending'
+                email.next_attempt_at = datetime.utcnow() + retry_delay(email.attempts)
+        else:
+            email.status = 'sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+            # Bodies may carry reset links; keep only the delivery record
+            email.text_body = ''
+            email.html_body = None
+            sent += 1
+        # Record each result at once so a crash cannot resend delivered mail
+        db.session.commit()
+    return sent
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox for one process"""
+
+    def __init__(self, app, sender=None, batch_size=None, max_attempts=None, poll_interval=None):
+        self.app = app
+        self.sender = sender or SMTPSender.from_env()
+        self.batch_size = batch_size or int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+        self.max_attempts = max_attempts or int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+        self.poll_interval = poll_interval or float(os.getenv('EMAIL_POLL_INTERVAL', '5'))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def start(self):
+        """Start this process's sender thread unless it is already running"""
+        if self.running():
+            return
+        with self._lock:
+            if not self.running():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='outbox-sender', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def notify(self):
+        """Wake the sender after an email was committed, starting it if needed"""
+        self.start()
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    while process_outbox(self.sender, self.batch_size, self.max_attempts) == self.batch_size:
+                        pass
+                except Exception:
+                    logger.exception('Outbox pass failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            self.sender.close_if_idle()
+            self._wake.wait(self.poll_interval)
+        self.sender.close()
+
+
+def init_app(app):
+    app.extensions['outbox'] = OutboxWorker(app)
+
+    @app.before_request
+    def start_outbox_worker():
+        # On the first request rather than at import, so the thread starts in
+        # each gunicorn worker rather than in a master that forks it away
+        if app.config.get('EMAIL_OUTBOX_WORKER'):
+            app.extensions['outbox'].start()
+
+
+def notify_outbox():
+    """Wake this process's sender, unless EMAIL_OUTBOX_WORKER is off"""
+    if current_app.config.get('EMAIL_OUTBOX_WORKER'):
+        current_app.extensions['outbox'].notify()
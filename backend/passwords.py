@@ -0,0 +1,157 @@
+"""
+Password hashing off the request thread
+
+bcrypt is deliberately slow and CPU-bound. Run inline, a burst of logins pins
+every gunicorn thread on bcrypt and stalls unrelated endpoints. Hashes and
+checks are instead sent to a small process pool, so request threads stay
+responsive while logins queue.
+
+The pool has a small bounded queue: up to PASSWORD_HASH_MAX_PENDING calls
+may be running or queued. A call beyond that waits up to
+PASSWORD_HASH_QUEUE_TIMEOUT for a slot, then fails with PasswordHasherBusy
+and the API answers 503 instead of queueing without bound. Under gunicorn's
+gevent worker (gunicorn.conf.py) a waiting login is a parked greenlet. Under
+gthread a waiting login holds a thread, so there the default cap is one below
+the thread count and calls beyond it fail at once, leaving a thread free for
+other requests.
+
+Configuration (environment):
+    BCRYPT_ROUNDS                 bcrypt cost factor for new hashes (default 12)
+    PASSWORD_HASH_WORKERS         pool processes; 0 hashes inline (default 1,
+                                  0 on Lambda, which has no /dev/shm for a pool)
+    PASSWORD_HASH_MAX_PENDING     calls running or queued (default 4 per pool
+                                  process; GUNICORN_THREADS - 1 under gthread)
+    PASSWORD_HASH_QUEUE_TIMEOUT   seconds a call waits for a slot (default 1;
+                                  0 under gthread)
+    PASSWORD_HASH_NICE            CPU niceness added to pool workers (default 0)
+
+Niceness only matters when the CPU is saturated. There it trades login
+throughput for other endpoints' latency: on one CPU with /health hammered in
+a loop, nice 5 gave bcrypt about a third of the CPU and halved logins/s.
+
+benchmarks/bcrypt_cost.py times each cost on the current machine, and
+benchmarks/login_storm.py measures login throughput against other endpoints'
+latency under load.
+"""
+import os
+import threading
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+def _init_worker(nice):
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+
+
+# bcrypt and the process pool are imported where they are used, so processes
+# that never hash (e.g. a cold Lambda serving reads) skip loading them
+
+def _hash(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(password, password_hash):
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    """Cost factor stored in a bcrypt hash ($2b$12$...), or None if unreadable"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def threaded():
+    """True when gunicorn serves each request on its own thread"""
+    return os.getenv('GUNICORN_WORKER_CLASS', 'gevent') == 'gthread'
+
+
+def default_max_pending(workers):
+    """A queue of a few calls per pool process, capped under threaded gunicorn"""
+    pending = max(workers, 1) * 4
+    if threaded():
+        pending = min(pending, int(os.getenv('GUNICORN_THREADS', '2')) - 1)
+    return max(pending, 1)
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt hashing and verification"""
+
+    def __init__(self, rounds=12, workers=1, max_pending=4, queue_timeout=1.0, nice=0):
+        self.rounds = rounds
+        self.workers = workers
+        self.nice = nice
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls):
+        default_workers = '0' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else '1'
+        workers = int(os.getenv('PASSWORD_HASH_WORKERS', default_workers))
+        max_pending = os.getenv('PASSWORD_HASH_MAX_PENDING')
+        return cls(
+            rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+            workers=workers,
+            max_pending=int(max_pending) if max_pending else default_max_pending(workers),
+            queue_timeout=float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '0' if threaded() else '1')),
+            nice=int(os.getenv('PASSWORD_HASH_NICE', '0'))
+        )
+
+    def _get_executor(self):
+        # Created lazily and per process, so each gunicorn worker forked from
+        # the master gets its own pool rather than an inherited broken one
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.nice,)
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy('Too many password operations in progress')
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password at the configured cost"""
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        """Check a password against a stored hash"""
+        return self._run(_verify, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with a different cost"""
+        return hash_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hasher = PasswordHasher.from_env()
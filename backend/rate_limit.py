@@ -0,0 +1,213 @@
+"""
+Token-bucket rate limiting for auth and expensive endpoints
+
+Routes declare limits with the rate_limit decorator, e.g.
+
+    @rate_limit(('20/minute', by_ip), ('10/minute', by_email))
+
+Each rule is a bucket of `count` tokens that refills continuously over the
+period. A request takes one token from every matching bucket and gets 429 with
+Retry-After when any bucket is empty.
+
+Buckets live in a storage backend:
+    memory (default)    per-process dict, bounded LRU; each gunicorn worker
+                        counts separately
+    sqlite:///path.db   shared by every worker on the host
+
+Configuration (environment):
+    RATE_LIMIT_ENABLED        'false' disables all limits (default true)
+    RATE_LIMIT_STORAGE        'memory' or 'sqlite:///path.db' (default memory)
+    RATE_LIMIT_IP_HEADER      header the edge proxy sets to the client IP,
+                              e.g. Fly-Client-IP on Fly (default unset)
+    RATE_LIMIT_PROXY_HOPS     proxies that append to X-Forwarded-For; the
+                              client IP is that many entries from the right,
+                              e.g. 1 behind an ALB (default 0: use the peer)
+
+Only values written by a trusted proxy are read. The leftmost
+X-Forwarded-For entries come from the client, who could send a fresh address
+with every request to get a fresh bucket.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify
+from flask_jwt_extended import get_jwt_identity
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'10/minute' -> (capacity, refill tokens per second)"""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()]
+
+
+def refill(tokens, updated_at, capacity, rate, now):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryStorage:
+    """Buckets in a bounded in-process LRU map: key -> (tokens, updated_at)"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, rate, now):
+        """Take a token; return seconds until one is available (0 if taken)"""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated_at, capacity, rate, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Evicted buckets are the least recently used, i.e. nearly full
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStorage:
+    """Buckets in a SQLite file shared by every process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, rate, now):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens = refill(*row, capacity, rate, now) if row else capacity
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                'INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def reset(self):
+        self._connect().execute('DELETE FROM rate_limit_buckets')
+
+
+def storage_from_uri(uri):
+    if uri.startswith('sqlite:///'):
+        return SQLiteStorage(uri[len('sqlite:///'):])
+    if uri == 'memory':
+        return MemoryStorage()
+    raise ValueError(f'Unknown RATE_LIMIT_STORAGE: {uri}')
+
+
+class RateLimiter:
+    """Checks requests against token buckets in a storage backend"""
+
+    def __init__(self, storage, enabled=True, ip_header=None, proxy_hops=0, clock=time.time):
+        self.storage = storage
+        self.enabled = enabled
+        self.ip_header = ip_header
+        self.proxy_hops = proxy_hops
+        self.clock = clock
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            storage_from_uri(os.getenv('RATE_LIMIT_STORAGE', 'memory')),
+            enabled=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+            ip_header=os.getenv('RATE_LIMIT_IP_HEADER') or None,
+            proxy_hops=int(os.getenv('RATE_LIMIT_PROXY_HOPS', '0'))
+        )
+
+    def hit(self, key, rate):
+        """Consume one token for key; return seconds to wait (0 if allowed)"""
+        capacity, per_second = parse_rate(rate)
+        return self.storage.consume(key, capacity, per_second, self.clock())
+
+    def reset(self):
+        self.storage.reset()
+
+
+limiter = RateLimiter.from_env()
+
+
+def by_ip():
+    """Client IP as seen by the nearest trusted proxy"""
+    if limiter.ip_header:
+        client_ip = request.headers.get(limiter.ip_header, '').strip()
+        if client_ip:
+            return client_ip
+    if limiter.proxy_hops:
+        # Like werkzeug's ProxyFix(x_for=hops): ignore the header unless every
+        # trusted proxy appended to it
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',')]
+        if len(forwarded) >= limiter.proxy_hops and forwarded[-limiter.proxy_hops]:
+            return forwarded[-limiter.proxy_hops]
+    return request.remote_addr
+
+
+def by_email():
+    """Account key for unauthenticated auth routes (None skips the rule)"""
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def by_user():
+    """Account key for JWT-protected routes; use below @jwt_required()"""
+    return get_jwt_identity()
+
+
+def rate_limit(*rules):
+    """Limit a view by (rate, key_func) rules, e.g. ('10/minute', by_ip)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if limiter.enabled:
+                wait = 0
+                for rate, key_func in rules:
+                    key = key_func()
+                    if key is None:
+                        continue
+                    bucket = f'{view.__module__}.{view.__name__}:{key_func.__name__}:{key}'
+                    wait = max(wait, limiter.hit(bucket, rate))
+                if wait:
+                    response = jsonify({'error': 'Too many requests, please try again later'})
+                    response.headers['Retry-After'] = str(int(wait) + 1)
+                    return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+"""Recompute DailyIntake totals that no longer match the day's meals
+
+Usage: python repair_daily_intake.py [--user ID] [--since YYYY-MM-DD] [--dry-run]
+
+Meal writes keep DailyIntake current with deltas, so a total that drifted
+(e.g. after a manual edit of the meals table or a failed deploy) stays wrong.
+This compares every day's stored totals with the SUM of its meals in one
+grouped query, then rebuilds each drifted day from its meals with
+calculate_daily_intake. Days with meals but no DailyIntake row are created.
+"""
+import sys
+from datetime import date
+from sqlalchemy import func
+from app import app
+from models import db
+from models.macros import DailyIntake, Meal
+from routes.macros import calculate_daily_intake
+
+TOTALS = ('total_calories', 'total_protein', 'total_carbs', 'total_fats')
+
+def find_drifted_days(user_id=None, since=None):
+    """(user_id, date) pairs whose stored totals differ from their meals"""
+    meal_filters = []
+    intake_filters = []
+    if user_id is not None:
+        meal_filters.append(Meal.user_id == user_id)
+        intake_filters.append(DailyIntake.user_id == user_id)
+    if since is not None:
+        meal_filters.append(Meal.date >= since)
+        intake_filters.append(DailyIntake.date >= since)
+
+    expected = {
+        (row.user_id, row.date): (row.calories, row.protein, row.carbs, row.fats)
+        for row in db.session.query(
+            Meal.user_id, Meal.date,
+            func.sum(Meal.calories).label('calories'),
+            func.sum(Meal.protein).label('protein'),
+            func.sum(Meal.carbs).label('carbs'),
+            func.sum(Meal.fats).label('fats')
+        ).filter(*meal_filters).group_by(Meal.user_id, Meal.date)
+    }
+    stored = {
+        (row.user_id, row.date): tuple(getattr(row, total) for total in TOTALS)
+        for row in db.session.query(DailyIntake.user_id, DailyIntake.date,
+                                    *[getattr(DailyIntake, total) for total in TOTALS]
+                                    ).filter(*intake_filters)
+    }
+
+    drifted = []
+    for day in sorted(expected.keys() | stored.keys()):
+        want = expected.get(day, (0, 0, 0, 0))
+        have = stored.get(day)
+        # Float sums may differ in the last bits depending on addition order
+        if have is None or any(abs((h or 0) - w) > 1e-6 for h, w in zip(have, want)):
+            drifted.append(day)
+    return drifted
+
+def repair(user_id=None, since=None, dry_run=False):
+    with app.app_context():
+        drifted = find_drifted_days(user_id, since)
+        if not dry_run:
+            for day_user_id, day in drifted:
+                calculate_daily_intake(day_user_id, day)
+        return drifted
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    user_id = int(args[args.index('--user') + 1]) if '--user' in args else None
+    since = date.fromisoformat(args[args.index('--since') + 1]) if '--since' in args else None
+    dry_run = '--dry-run' in args
+    drifted = repair(user_id, since, dry_run)
+    for day_user_id, day in drifted:
+        print(f"  user {day_user_id} {day.isoformat()}")
+    verb = 'Found' if dry_run else 'Repaired'
+    print(f"✓ {verb} {len(drifted)} drifted days")
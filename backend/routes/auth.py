@@ -1,43 +1,34 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import db
-from models.user import User, PasswordResetToken
+from models.user import User, PasswordResetToken, RefreshToken
+from passwords import PasswordHasherBusy
+from user_cache import invalidate_user
+from rate_limit import rate_limit, by_ip, by_email, by_user
+from outbox import enqueue_email, notify_outbox
 import secrets
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
-def send_password_reset_email(email, reset_token):
-    """Send password reset email to user"""
-    # Get email configuration from environment
-    smtp_host = os.getenv('SMTP_HOST')
-    smtp_port = int(os.getenv('SMTP_PORT', '587'))
-    smtp_user = os.getenv('SMTP_USER')
-    smtp_password = os.getenv('SMTP_PASSWORD')
-    smtp_from = os.getenv('SMTP_FROM', smtp_user)
+# Seconds clients should wait before retrying when password hashing is saturated
+PASSWORD_BUSY_RETRY_AFTER = 2
+
+@bp.app_errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    """Shed load when too many logins are waiting on bcrypt"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = str(PASSWORD_BUSY_RETRY_AFTER)
+    return response, 503
+
+def queue_password_reset_email(email, reset_token):
+    """Add the password reset email to the outbox (sent after the request)"""
     app_url = os.getenv('APP_URL', 'https://fittrack-api.fly.dev')
     
-    # If SMTP is not configured, log the token for development
-    if not smtp_host or not smtp_user or not smtp_password:
-        current_app.logger.warning(
-            f"SMTP not configured. Password reset token for {email}: {reset_token}\n"
-            f"Reset link: {app_url}/reset-password?token={reset_token}"
-        )
-        return
-    
     # Create reset link
     reset_link = f"{app_url}/reset-password?token={reset_token}"
     
-    # Create email message
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = 'FitTrack - Password Reset Request'
-    msg['From'] = smtp_from
-    msg['To'] = email
-    
     # Email body
     text = f"""Hello,
 
@@ -66,25 +57,10 @@ FitTrack Team"""
   </body>
 </html>"""
     
-    # Attach parts
-    part1 = MIMEText(text, 'plain')
-    part2 = MIMEText(html, 'html')
-    msg.attach(part1)
-    msg.attach(part2)
-    
-    # Send email
-    try:
-        server = smtplib.SMTP(smtp_host, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        current_app.logger.info(f"Password reset email sent to {email}")
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
-        raise
+    enqueue_email(email, 'FitTrack - Password Reset Request', text, html)
 
 @bp.route('/register', methods=['POST'])
+@rate_limit(('20/hour', by_ip))
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -110,6 +86,8 @@ def register():
     user.set_password(data['password'])
     
     db.session.add(user)
+    db.session.flush()
+    refresh_token = RefreshToken.issue(user.id)
     db.session.commit()
     
     # Generate access token (convert user.id to string for JWT)
@@ -118,10 +96,12 @@ def register():
     return jsonify({
         'message': 'User registered successfully',
         'user': user.to_dict(),
-        'access_token': access_token
+        'access_token': access_token,
+        'refresh_token': refresh_token
     }), 201
 
 @bp.route('/login', methods=['POST'])
+@rate_limit(('20/minute', by_ip), ('10/minute', by_email))
 def login():
     """Login user"""
     data = request.get_json()
@@ -135,15 +115,69 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    # Upgrade the stored hash when the configured bcrypt cost has changed
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+    
+    refresh_token = RefreshToken.issue(user.id)
+    db.session.commit()
+    
     # Generate access token (convert user.id to string for JWT)
     access_token = create_access_token(identity=str(user.id))
     
     return jsonify({
         'message': 'Login successful',
         'user': user.to_dict(),
-        'access_token': access_token
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }), 200
+
+@bp.route('/refresh', methods=['POST'])
+@rate_limit(('60/minute', by_ip))
+def refresh():
+    """Exchange a refresh token for a new access token and refresh token"""
+    data = request.get_json() or {}
+    
+    if not data.get('refresh_token'):
+        return jsonify({'error': 'Refresh token is required'}), 400
+    
+    token = RefreshToken.find(data['refresh_token'])
+    if not token:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    
+    if token.revoked_at is not None or not token.revoke():
+        # A rotated token was presented again: assume it leaked and end the session
+        RefreshToken.revoke_family(token.family_id)
+        db.session.commit()
+        return jsonify({'error': 'Refresh token has been revoked'}), 401
+    
+    if token.expires_at < datetime.utcnow():
+        db.session.commit()
+        return jsonify({'error': 'Refresh token has expired'}), 401
+    
+    refresh_token = RefreshToken.issue(token.user_id, family_id=token.family_id)
+    db.session.commit()
+    
+    return jsonify({
+        'access_token': create_access_token(identity=str(token.user_id)),
+        'refresh_token': refresh_token
     }), 200
 
+@bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke a refresh token and every token rotated from the same login"""
+    data = request.get_json() or {}
+    
+    if not data.get('refresh_token'):
+        return jsonify({'error': 'Refresh token is required'}), 400
+    
+    token = RefreshToken.find(data['refresh_token'])
+    if token:
+        RefreshToken.revoke_family(token.family_id)
+        db.session.commit()
+    
+    return jsonify({'message': 'Logged out successfully'}), 200
+
 @bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
@@ -158,6 +192,7 @@ def get_current_user():
 
 @bp.route('/change-password', methods=['POST'])
 @jwt_required()
+@rate_limit(('10/hour', by_user))
 def change_password():
     """Change user password"""
     user_id = int(get_jwt_identity())
@@ -175,11 +210,14 @@ def change_password():
         return jsonify({'error': 'Current password is incorrect'}), 401
     
     user.set_password(data['new_password'])
+    RefreshToken.revoke_user(user_id)
     db.session.commit()
+    invalidate_user(user_id)
     
     return jsonify({'message': 'Password changed successfully'}), 200
 
 @bp.route('/forgot-password', methods=['POST'])
+@rate_limit(('10/hour', by_ip), ('3/hour', by_email))
 def forgot_password():
     """Request password reset"""
     data = request.get_json()
@@ -193,17 +231,8 @@ def forgot_password():
     # For security, always return success even if user doesn't exist
     # This prevents email enumeration attacks
     if user:
-        # Clean up expired tokens for this user
-        PasswordResetToken.query.filter(
-            PasswordResetToken.user_id == user.id,
-            PasswordResetToken.expires_at < datetime.utcnow()
-        ).delete()
-        
-        # Invalidate any existing unused tokens for this user
-        PasswordResetToken.query.filter(
-            PasswordResetToken.user_id == user.id,
-            PasswordResetToken.used == False
-        ).update({'used': True})
+        # Older tokens are not touched here: reset-password rejects any token
+        # with a newer one, and sweep_tokens.py deletes expired and used rows
         
         # Generate reset token
         reset_token = secrets.token_urlsafe(32)
@@ -215,19 +244,14 @@ def forgot_password():
             expires_at=datetime.utcnow() + timedelta(hours=1)
         )
         db.session.add(reset_token_obj)
-        db.session.commit()
         
-        # Send password reset email
-        email_sent = False
-        try:
-            send_password_reset_email(user.email, reset_token)
-            email_sent = True
-        except Exception as e:
-            # Log error but don't fail the request (security: don't reveal if email exists)
-            current_app.logger.error(f"Failed to send password reset email: {str(e)}")
+        # Queue the email in the same transaction; the outbox sender delivers it
+        queue_password_reset_email(user.email, reset_token)
+        db.session.commit()
+        notify_outbox()
         
         # In development, log the token so it can be retrieved from logs
-        if os.getenv('FLASK_ENV') == 'development' or not email_sent:
+        if os.getenv('FLASK_ENV') == 'development':
             current_app.logger.info(
                 f"Password reset token for {user.email}: {reset_token}\n"
                 f"Reset URL: {os.getenv('APP_URL', 'https://fittrack-api.fly.dev')}/reset-password?token={reset_token}"
@@ -245,6 +269,7 @@ def forgot_password():
     return jsonify(response), 200
 
 @bp.route('/reset-password', methods=['POST'])
+@rate_limit(('20/hour', by_ip))
 def reset_password():
     """Reset password using token"""
     data = request.get_json()
@@ -267,6 +292,10 @@ def reset_password():
         else:
             return jsonify({'error': 'Reset token has expired'}), 400
     
+    # Only the most recently requested token is honoured
+    if reset_token_obj.is_superseded():
+        return jsonify({'error': 'This reset token has been replaced by a newer one'}), 400
+    
     # Find user
     user = User.query.get(reset_token_obj.user_id)
     if not user:
@@ -281,9 +310,12 @@ def reset_password():
     # Set new password
     user.set_password(data['new_password'])
     
-    # Mark token as used
+    # Mark the user's tokens as used and sign out existing sessions
     reset_token_obj.used = True
+    PasswordResetToken.invalidate_user(user.id)
+    RefreshToken.revoke_user(user.id)
     db.session.commit()
+    invalidate_user(user.id)
     
     return jsonify({'message': 'Password reset successfully'}), 200
 
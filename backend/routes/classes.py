@@ -1,15 +1,55 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
-from models.user import User
+from models.user import User, UserMap
 from models.classes import Class, ClassMembership, ClassJoinRequest, AssignedWorkout, StudentWorkoutLog
 from models.workout import Workout
 from datetime import datetime
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+import class_events
+from user_cache import current_user
+from rate_limit import rate_limit, by_ip, by_user
+import base64
+import binascii
+import json
 
 bp = Blueprint('classes', __name__, url_prefix='/api/classes')
 
 
+def encode_cursor(*values):
+    """Encode the sort key of the last returned row as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, UnicodeError, binascii.Error, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def user_map_from_request():
+    """Return a UserMap when the client asked for ?users=sideload, otherwise None"""
+    return UserMap() if request.args.get('users') == 'sideload' else None
+
+
+def with_users(payload, users):
+    """Attach the side-loaded users map to a response payload"""
+    if users is not None:
+        payload['users'] = users.to_dict()
+    return payload
+
+
 # ==================== CLASS MANAGEMENT ====================
 
 @bp.route('', methods=['POST'])
@@ -17,9 +57,7 @@ bp = Blueprint('classes', __name__, url_prefix='/api/classes')
 def create_class():
     """Create a new class (instructor only)"""
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    if not user or user.role != 'instructor':
+    if current_user.role != 'instructor':
         return jsonify({'error': 'Only instructors can create classes'}), 403
     
     data = request.get_json()
@@ -48,12 +86,8 @@ def create_class():
 def get_classes():
     """Get all classes for the current user (instructor sees taught classes, student sees enrolled classes)"""
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
     
-    if user.role == 'instructor':
+    if current_user.role == 'instructor':
         # Get classes taught by this instructor
         classes = Class.query.filter_by(instructor_id=user_id).all()
     else:
@@ -62,8 +96,209 @@ def get_classes():
         class_ids = [m.class_id for m in memberships]
         classes = Class.query.filter(Class.id.in_(class_ids)).all() if class_ids else []
     
+    users = user_map_from_request()
+    
+    return jsonify(with_users({
+        'classes': [c.to_dict(users=users) for c in classes]
+    }, users)), 200
+
+
+@bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+def get_instructor_dashboard():
+    """Get all taught classes with request counts, completion rates and recent completions (instructor only)"""
+    user_id = int(get_jwt_identity())
+    if current_user.role != 'instructor':
+        return jsonify({'error': 'Only instructors can view the class dashboard'}), 403
+    
+    recent_limit = max(1, min(request.args.get('recent_limit', 10, type=int), 50))
+    
+    classes = Class.query.filter_by(instructor_id=user_id).order_by(Class.created_at.desc()).all()
+    class_ids = [c.id for c in classes]
+    
+    if not class_ids:
+        return jsonify({'classes': [], 'recent_completions': []}), 200
+    
+    # Per-class counts, one grouped query each
+    member_counts = dict(db.session.query(
+        ClassMembership.class_id, func.count(ClassMembership.id)
+    ).filter(ClassMembership.class_id.in_(class_ids)).group_by(ClassMembership.class_id).all())
+    
+    pending_counts = dict(db.session.query(
+        ClassJoinRequest.class_id, func.count(ClassJoinRequest.id)
+    ).filter(
+        ClassJoinRequest.class_id.in_(class_ids),
+        ClassJoinRequest.status == 'pending'
+    ).group_by(ClassJoinRequest.class_id).all())
+    
+    assigned_counts = dict(db.session.query(
+        AssignedWorkout.class_id, func.count(AssignedWorkout.id)
+    ).filter(AssignedWorkout.class_id.in_(class_ids)).group_by(AssignedWorkout.class_id).all())
+    
+    # Completions by current members only
+    completion_counts = dict(db.session.query(
+        AssignedWorkout.class_id, func.count(StudentWorkoutLog.id)
+    ).join(
+        StudentWorkoutLog, StudentWorkoutLog.assigned_workout_id == AssignedWorkout.id
+    ).join(
+        ClassMembership,
+        db.and_(
+            ClassMembership.class_id == AssignedWorkout.class_id,
+            ClassMembership.student_id == StudentWorkoutLog.student_id
+        )
+    ).filter(
+        AssignedWorkout.class_id.in_(class_ids),
+        StudentWorkoutLog.completed == True
+    ).group_by(AssignedWorkout.class_id).all())
+    
+    users = user_map_from_request()
+    classes_data = []
+    for class_obj in classes:
+        member_count = member_counts.get(class_obj.id, 0)
+        assigned_count = assigned_counts.get(class_obj.id, 0)
+        completion_count = completion_counts.get(class_obj.id, 0)
+        possible = member_count * assigned_count
+        
+        class_dict = class_obj.to_dict(member_count=member_count, users=users)
+        class_dict['pending_request_count'] = pending_counts.get(class_obj.id, 0)
+        class_dict['assigned_workout_count'] = assigned_count
+        class_dict['completion_count'] = completion_count
+        class_dict['completion_rate'] = round(completion_count / possible * 100, 1) if possible > 0 else 0
+        classes_data.append(class_dict)
+    
+    # Most recent completions across all taught classes
+    recent_rows = db.session.query(StudentWorkoutLog, AssignedWorkout, User).join(
+        AssignedWorkout, AssignedWorkout.id == StudentWorkoutLog.assigned_workout_id
+    ).join(
+        User, User.id == StudentWorkoutLog.student_id
+    ).filter(
+        AssignedWorkout.class_id.in_(class_ids),
+        StudentWorkoutLog.completed == True
+    ).order_by(StudentWorkoutLog.completed_at.desc()).limit(recent_limit).all()
+    
+    recent_completions = []
+    for log, assigned_workout, student in recent_rows:
+        completion = {
+            'id': log.id,
+            'class_id': assigned_workout.class_id,
+            'assigned_workout_id': assigned_workout.id,
+            'assigned_workout_name': assigned_workout.name,
+            'student_id': student.id,
+            'completed_at': log.completed_at.isoformat() if log.completed_at else None,
+            'duration': log.duration,
+            'total_volume': log.total_volume,
+            'calories_burned': log.calories_burned
+        }
+        if users is not None:
+            users.ref(student.id)
+        else:
+            completion['student'] = {
+                'id': student.id,
+                'username': student.username,
+                'full_name': student.full_name,
+                'avatar_url': student.avatar_url
+            }
+        recent_completions.append(completion)
+    
+    return jsonify(with_users({
+        'classes': classes_data,
+        'recent_completions': recent_completions
+    }, users)), 200
+
+
+@bp.route('/my-assignments', methods=['GET'])
+@jwt_required()
+def get_my_assignments():
+    """Get assigned workouts across all of the student's classes, ordered by due date"""
+    user_id = int(get_jwt_identity())
+    
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    cursor = request.args.get('cursor')
+    status = request.args.get('status', 'all')
+    
+    if status not in ('all', 'pending', 'completed'):
+        return jsonify({'error': "Status must be 'all', 'pending' or 'completed'"}), 400
+    
+    no_due_date = db.case((AssignedWorkout.due_date.is_(None), 1), else_=0)
+    
+    query = db.session.query(AssignedWorkout, Class.name, StudentWorkoutLog).join(
+        ClassMembership,
+        db.and_(
+            ClassMembership.class_id == AssignedWorkout.class_id,
+            ClassMembership.student_id == user_id
+        )
+    ).join(
+        Class, Class.id == AssignedWorkout.class_id
+    ).outerjoin(
+        StudentWorkoutLog,
+        db.and_(
+            StudentWorkoutLog.assigned_workout_id == AssignedWorkout.id,
+            StudentWorkoutLog.student_id == user_id
+        )
+    )
+    
+    if status == 'completed':
+        query = query.filter(StudentWorkoutLog.completed == True)
+    elif status == 'pending':
+        query = query.filter(db.or_(StudentWorkoutLog.id.is_(None), StudentWorkoutLog.completed != True))
+    
+    # Keyset on (no due date last, due_date, id)
+    if cursor:
+        try:
+            after_no_due, after_due, after_id = decode_cursor(cursor)
+            after_id = int(after_id)
+            after_due = datetime.fromisoformat(after_due) if after_due else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        if after_no_due:
+            query = query.filter(AssignedWorkout.due_date.is_(None), AssignedWorkout.id > after_id)
+        else:
+            query = query.filter(db.or_(
+                AssignedWorkout.due_date.is_(None),
+                AssignedWorkout.due_date > after_due,
+                db.and_(AssignedWorkout.due_date == after_due, AssignedWorkout.id > after_id)
+            ))
+    
+    rows = query.order_by(no_due_date, AssignedWorkout.due_date, AssignedWorkout.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    assignments = []
+    for aw, class_name, log in rows:
+        assignments.append({
+            'id': aw.id,
+            'class_id': aw.class_id,
+            'class_name': class_name,
+            'name': aw.name,
+            'description': aw.description,
+            'workout_template': aw.workout_template,
+            'assigned_date': aw.assigned_date.isoformat() if aw.assigned_date else None,
+            'due_date': aw.due_date.isoformat() if aw.due_date else None,
+            'completed': bool(log and log.completed),
+            'my_log': {
+                'id': log.id,
+                'completed': log.completed,
+                'completed_at': log.completed_at.isoformat() if log.completed_at else None,
+                'duration': log.duration,
+                'total_volume': log.total_volume,
+                'calories_burned': log.calories_burned,
+                'notes': log.notes
+            } if log else None
+        })
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(
+            1 if last.due_date is None else 0,
+            last.due_date.isoformat() if last.due_date else None,
+            last.id
+        )
+    
     return jsonify({
-        'classes': [c.to_dict() for c in classes]
+        'assignments': assignments,
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -72,7 +307,6 @@ def get_classes():
 def get_class(class_id):
     """Get details of a specific class"""
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
     class_obj = Class.query.get(class_id)
     
     if not class_obj:
@@ -85,10 +319,12 @@ def get_class(class_id):
     if not (is_instructor or is_member):
         return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify({
-        'class': class_obj.to_dict(include_members=True),
+    users = user_map_from_request()
+    
+    return jsonify(with_users({
+        'class': class_obj.to_dict(include_members=True, users=users),
         'is_instructor': is_instructor
-    }), 200
+    }, users)), 200
 
 
 @bp.route('/<int:class_id>', methods=['PUT'])
@@ -146,10 +382,6 @@ def delete_class(class_id):
 def join_class():
     """Request to join a class using join code (student only)"""
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
     join_code = data.get('join_code', '').strip().upper()
@@ -224,11 +456,60 @@ def get_class_members(class_id):
     if not (is_instructor or is_member):
         return jsonify({'error': 'Access denied'}), 403
     
-    memberships = ClassMembership.query.filter_by(class_id=class_id).all()
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    cursor = request.args.get('cursor')
+    name_prefix = request.args.get('q', '').strip()
+    
+    query = db.session.query(
+        ClassMembership.id,
+        ClassMembership.student_id,
+        ClassMembership.joined_at,
+        User.username,
+        User.full_name,
+        User.email,
+        User.avatar_url
+    ).join(User, User.id == ClassMembership.student_id).filter(
+        ClassMembership.class_id == class_id
+    )
+    
+    if name_prefix:
+        pattern = escape_like(name_prefix) + '%'
+        query = query.filter(db.or_(
+            User.username.ilike(pattern, escape='\\'),
+            User.full_name.ilike(pattern, escape='\\')
+        ))
+    
+    total_count = query.order_by(None).count()
+    
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor)
+            after_id = int(after_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(ClassMembership.id > after_id)
+    
+    rows = query.order_by(ClassMembership.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    members = [{
+        'id': row.id,
+        'student_id': row.student_id,
+        'joined_at': row.joined_at.isoformat() if row.joined_at else None,
+        'student': {
+            'id': row.student_id,
+            'username': row.username,
+            'full_name': row.full_name,
+            'email': row.email,
+            'avatar_url': row.avatar_url
+        }
+    } for row in rows]
     
     return jsonify({
-        'members': [m.to_dict() for m in memberships],
-        'total_count': len(memberships)
+        'members': members,
+        'total_count': total_count,
+        'next_cursor': encode_cursor(rows[-1].id) if has_more else None
     }), 200
 
 
@@ -280,9 +561,97 @@ def get_join_requests(class_id):
         status='pending'
     ).order_by(ClassJoinRequest.requested_at.desc()).all()
     
-    return jsonify({
-        'requests': [r.to_dict() for r in requests],
+    users = user_map_from_request()
+    
+    return jsonify(with_users({
+        'requests': [r.to_dict(users=users) for r in requests],
         'total_count': len(requests)
+    }, users)), 200
+
+
+@bp.route('/<int:class_id>/join-requests/bulk', methods=['POST'])
+@jwt_required()
+def bulk_respond_join_requests(class_id):
+    """Accept or reject many join requests in one transaction (instructor only)"""
+    user_id = int(get_jwt_identity())
+    class_obj = Class.query.get(class_id)
+    
+    if not class_obj:
+        return jsonify({'error': 'Class not found'}), 404
+    
+    if class_obj.instructor_id != user_id:
+        return jsonify({'error': 'Only the instructor can respond to join requests'}), 403
+    
+    data = request.get_json() or {}
+    action = data.get('action')
+    request_ids = data.get('request_ids')
+    
+    if action not in ('accept', 'reject'):
+        return jsonify({'error': "Action must be 'accept' or 'reject'"}), 400
+    
+    if not isinstance(request_ids, list) or not request_ids:
+        return jsonify({'error': 'request_ids must be a non-empty list'}), 400
+    
+    try:
+        request_ids = list(dict.fromkeys(int(rid) for rid in request_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'request_ids must be integers'}), 400
+    
+    join_requests = ClassJoinRequest.query.filter(
+        ClassJoinRequest.id.in_(request_ids),
+        ClassJoinRequest.class_id == class_id
+    ).all()
+    found = {r.id: r for r in join_requests}
+    
+    skipped = []
+    pending = []
+    for rid in request_ids:
+        join_request = found.get(rid)
+        if not join_request:
+            skipped.append({'id': rid, 'reason': 'Join request not found'})
+        elif join_request.status != 'pending':
+            skipped.append({'id': rid, 'reason': 'This request has already been processed'})
+        else:
+            pending.append(join_request)
+    
+    processed_ids = [r.id for r in pending]
+    
+    if action == 'accept' and pending:
+        student_ids = {r.student_id for r in pending}
+        existing_member_ids = {row[0] for row in db.session.query(ClassMembership.student_id).filter(
+            ClassMembership.class_id == class_id,
+            ClassMembership.student_id.in_(student_ids)
+        ).all()}
+        
+        # Requests from students who are already members are dropped, as in the single accept
+        stale_ids = [r.id for r in pending if r.student_id in existing_member_ids]
+        if stale_ids:
+            ClassJoinRequest.query.filter(ClassJoinRequest.id.in_(stale_ids)).delete(synchronize_session=False)
+            skipped.extend({'id': rid, 'reason': 'Student is already a member of this class'} for rid in stale_ids)
+            processed_ids = [rid for rid in processed_ids if rid not in stale_ids]
+        
+        new_member_ids = sorted(student_ids - existing_member_ids)
+        if new_member_ids:
+            db.session.execute(
+                db.insert(ClassMembership),
+                [{'class_id': class_id, 'student_id': sid} for sid in new_member_ids]
+            )
+    
+    if processed_ids:
+        ClassJoinRequest.query.filter(ClassJoinRequest.id.in_(processed_ids)).update(
+            {
+                'status': 'accepted' if action == 'accept' else 'rejected',
+                'responded_at': datetime.utcnow()
+            },
+            synchronize_session=False
+        )
+    
+    db.session.commit()
+    
+    return jsonify({
+        'message': f'{len(processed_ids)} join request(s) {action}ed',
+        'processed_ids': processed_ids,
+        'skipped': skipped
     }), 200
 
 
@@ -409,17 +778,19 @@ def assign_workout(class_id):
     )
     
     db.session.add(assigned_workout)
-    db.session.commit()
-    
-    # Create logs for all students in the class
-    memberships = ClassMembership.query.filter_by(class_id=class_id).all()
-    for membership in memberships:
-        student_log = StudentWorkoutLog(
-            assigned_workout_id=assigned_workout.id,
-            student_id=membership.student_id,
-            completed=False
-        )
-        db.session.add(student_log)
+    db.session.flush()  # Get assigned workout ID
+    
+    # Logs are normally created on completion and pending state is derived
+    # from membership. Legacy deployments can keep the per-student placeholders.
+    if current_app.config.get('ASSIGNMENT_PLACEHOLDER_LOGS'):
+        memberships = ClassMembership.query.filter_by(class_id=class_id).all()
+        for membership in memberships:
+            student_log = StudentWorkoutLog(
+                assigned_workout_id=assigned_workout.id,
+                student_id=membership.student_id,
+                completed=False
+            )
+            db.session.add(student_log)
     
     db.session.commit()
     
@@ -446,27 +817,38 @@ def get_assigned_workouts(class_id):
     if not (is_instructor or is_member):
         return jsonify({'error': 'Access denied'}), 403
     
-    assigned_workouts = AssignedWorkout.query.filter_by(class_id=class_id).order_by(
+    users = user_map_from_request()
+    
+    query = AssignedWorkout.query.filter_by(class_id=class_id).order_by(
         AssignedWorkout.assigned_date.desc()
-    ).all()
+    )
+    if users is None:
+        query = query.options(selectinload(AssignedWorkout.instructor))
+    assigned_workouts = query.all()
+    stats = AssignedWorkout.completion_stats_for(class_id, assigned_workouts)
     
     # If student, include their completion status for each workout
+    my_logs = {}
+    if not is_instructor and assigned_workouts:
+        log_expand = ('workout',) if users is not None else ('student', 'workout')
+        my_logs = {log.assigned_workout_id: log for log in StudentWorkoutLog.query.filter(
+            StudentWorkoutLog.assigned_workout_id.in_([aw.id for aw in assigned_workouts]),
+            StudentWorkoutLog.student_id == user_id
+        ).options(*StudentWorkoutLog.load_options(log_expand))}
+    
     workouts_data = []
     for aw in assigned_workouts:
-        workout_dict = aw.to_dict()
+        workout_dict = aw.to_dict(users=users, completion_stats=stats[aw.id])
         if not is_instructor:
             # Add student's personal log info
-            student_log = StudentWorkoutLog.query.filter_by(
-                assigned_workout_id=aw.id,
-                student_id=user_id
-            ).first()
-            workout_dict['my_log'] = student_log.to_dict() if student_log else None
+            student_log = my_logs.get(aw.id)
+            workout_dict['my_log'] = student_log.to_dict(users=users) if student_log else None
         workouts_data.append(workout_dict)
     
-    return jsonify({
+    return jsonify(with_users({
         'assigned_workouts': workouts_data,
         'is_instructor': is_instructor
-    }), 200
+    }, users)), 200
 
 
 @bp.route('/<int:class_id>/assigned-workouts/<int:workout_id>', methods=['GET'])
@@ -486,12 +868,19 @@ def get_assigned_workout(class_id, workout_id):
     if not (is_instructor or is_member):
         return jsonify({'error': 'Access denied'}), 403
     
+    # Nested log relations are opt-in: ?expand=student,workout
+    expand = {e.strip() for e in request.args.get('expand', '').split(',') if e.strip()}
+    unknown = expand - set(AssignedWorkout.LOG_EXPANSIONS)
+    if unknown:
+        return jsonify({'error': f"Unknown expand value(s): {', '.join(sorted(unknown))}"}), 400
+    
     assigned_workout = AssignedWorkout.query.filter_by(id=workout_id, class_id=class_id).first()
     
     if not assigned_workout:
         return jsonify({'error': 'Assigned workout not found'}), 404
     
-    workout_dict = assigned_workout.to_dict(include_logs=is_instructor)
+    users = user_map_from_request()
+    workout_dict = assigned_workout.to_dict(include_logs=is_instructor, expand=expand, users=users)
     
     # If student, add their personal log
     if not is_instructor:
@@ -499,12 +888,12 @@ def get_assigned_workout(class_id, workout_id):
             assigned_workout_id=workout_id,
             student_id=user_id
         ).first()
-        workout_dict['my_log'] = student_log.to_dict() if student_log else None
+        workout_dict['my_log'] = student_log.to_dict(users=users) if student_log else None
     
-    return jsonify({
+    return jsonify(with_users({
         'assigned_workout': workout_dict,
         'is_instructor': is_instructor
-    }), 200
+    }, users)), 200
 
 
 @bp.route('/<int:class_id>/assigned-workouts/<int:workout_id>', methods=['PUT'])
@@ -660,6 +1049,11 @@ def complete_workout(class_id, workout_id):
     student_log.notes = data.get('notes', '')
     student_log.workout_id = workout_id_ref
     
+    # Events for anyone watching the class live, on any worker, committed
+    # with the log so a saved completion never fails on them
+    if class_events.enabled():
+        add_completion_events(class_id, student_log)
+    
     db.session.commit()
     
     return jsonify({
@@ -684,18 +1078,83 @@ def get_my_workout_log(class_id, workout_id):
         student_id=user_id
     ).first()
     
-    if not student_log:
-        return jsonify({'error': 'Log not found'}), 404
+    if student_log:
+        return jsonify({
+            'log': student_log.to_dict()
+        }), 200
+    
+    # Pending assignments have no row until completion; answer as the
+    # placeholder logs used to
+    assigned_workout = AssignedWorkout.query.filter_by(id=workout_id, class_id=class_id).first()
+    if not assigned_workout:
+        return jsonify({'error': 'Assigned workout not found'}), 404
+    
+    pending_log = StudentWorkoutLog(assigned_workout_id=workout_id, student_id=user_id, completed=False)
+    log_dict = pending_log.to_dict(include_student=False, include_workout=False)
+    log_dict['student'] = membership.student.to_dict() if membership.student else None
+    log_dict['workout'] = None
     
     return jsonify({
-        'log': student_log.to_dict()
+        'log': log_dict
     }), 200
 
 
+def add_completion_events(class_id, student_log):
+    """Add a completion and the student's updated leaderboard stats as class events.
+    
+    Joins the caller's transaction, so the log is flushed first and counted.
+    """
+    db.session.flush()
+    student = student_log.student
+    student_summary = {
+        'id': student.id,
+        'username': student.username,
+        'full_name': student.full_name,
+        'avatar_url': student.avatar_url
+    }
+    
+    class_events.send_event(class_id, 'completion', {
+        'class_id': class_id,
+        'assigned_workout_id': student_log.assigned_workout_id,
+        'student': student_summary,
+        'completed_at': student_log.completed_at.isoformat() if student_log.completed_at else None,
+        'duration': student_log.duration,
+        'total_volume': student_log.total_volume,
+        'calories_burned': student_log.calories_burned
+    })
+    
+    total_workouts, total_duration, total_volume, total_calories = db.session.query(
+        func.count(StudentWorkoutLog.id),
+        func.coalesce(func.sum(StudentWorkoutLog.duration), 0),
+        func.coalesce(func.sum(StudentWorkoutLog.total_volume), 0),
+        func.coalesce(func.sum(StudentWorkoutLog.calories_burned), 0)
+    ).join(AssignedWorkout).filter(
+        AssignedWorkout.class_id == class_id,
+        StudentWorkoutLog.student_id == student.id,
+        StudentWorkoutLog.completed == True
+    ).one()
+    total_assigned = AssignedWorkout.query.filter_by(class_id=class_id).count()
+    completion_rate = (total_workouts / total_assigned * 100) if total_assigned > 0 else 0
+    
+    class_events.send_event(class_id, 'leaderboard', {
+        'class_id': class_id,
+        'student': student_summary,
+        'stats': {
+            'total_workouts': total_workouts,
+            'pending_workouts': max(total_assigned - total_workouts, 0),
+            'total_duration': total_duration,
+            'total_volume': total_volume,
+            'total_calories': total_calories,
+            'completion_rate': round(completion_rate, 1)
+        }
+    })
+
+
 # ==================== LEADERBOARD & STATS ====================
 
 @bp.route('/<int:class_id>/leaderboard', methods=['GET'])
 @jwt_required()
+@rate_limit(('30/minute', by_user), ('120/minute', by_ip))
 def get_leaderboard(class_id):
     """Get leaderboard stats for all members of the class"""
     user_id = int(get_jwt_identity())
@@ -711,40 +1170,53 @@ def get_leaderboard(class_id):
     if not (is_instructor or is_member):
         return jsonify({'error': 'Access denied'}), 403
     
+    users = user_map_from_request()
+    
     # Get all members
-    memberships = ClassMembership.query.filter_by(class_id=class_id).all()
+    memberships = ClassMembership.query.filter_by(class_id=class_id)
+    if users is None:
+        memberships = memberships.options(selectinload(ClassMembership.student))
+    memberships = memberships.all()
+    
+    # Completed-log totals for every member in one grouped query
+    totals = {
+        student_id: stats for student_id, *stats in db.session.query(
+            StudentWorkoutLog.student_id,
+            func.count(StudentWorkoutLog.id),
+            func.coalesce(func.sum(StudentWorkoutLog.duration), 0),
+            func.coalesce(func.sum(StudentWorkoutLog.total_volume), 0),
+            func.coalesce(func.sum(StudentWorkoutLog.calories_burned), 0)
+        ).join(AssignedWorkout).filter(
+            AssignedWorkout.class_id == class_id,
+            StudentWorkoutLog.completed == True
+        ).group_by(StudentWorkoutLog.student_id)
+    }
+    total_assigned = AssignedWorkout.query.filter_by(class_id=class_id).count()
     
     leaderboard = []
     for membership in memberships:
-        student = membership.student
+        student_id = membership.student_id
+        total_workouts, total_duration, total_volume, total_calories = totals.get(student_id, (0, 0, 0, 0))
         
-        # Get student's logs for this class
-        logs = StudentWorkoutLog.query.join(AssignedWorkout).filter(
-            AssignedWorkout.class_id == class_id,
-            StudentWorkoutLog.student_id == student.id,
-            StudentWorkoutLog.completed == True
-        ).all()
-        
-        # Calculate stats
-        total_workouts = len(logs)
-        total_duration = sum(log.duration or 0 for log in logs)
-        total_volume = sum(log.total_volume or 0 for log in logs)
-        total_calories = sum(log.calories_burned or 0 for log in logs)
-        
-        # Get completion rate
-        total_assigned = AssignedWorkout.query.filter_by(class_id=class_id).count()
+        # Get completion rate (pending = assigned minus completed)
         completion_rate = (total_workouts / total_assigned * 100) if total_assigned > 0 else 0
         
-        leaderboard.append({
-            'student': student.to_dict(),
+        entry = {
+            'student_id': student_id,
             'stats': {
                 'total_workouts': total_workouts,
+                'pending_workouts': max(total_assigned - total_workouts, 0),
                 'total_duration': total_duration,
                 'total_volume': total_volume,
                 'total_calories': total_calories,
                 'completion_rate': round(completion_rate, 1)
             }
-        })
+        }
+        if users is not None:
+            users.ref(student_id)
+        else:
+            entry['student'] = membership.student.to_dict()
+        leaderboard.append(entry)
     
     # Sort by total workouts completed (descending)
     leaderboard.sort(key=lambda x: x['stats']['total_workouts'], reverse=True)
@@ -753,15 +1225,61 @@ def get_leaderboard(class_id):
     for i, entry in enumerate(leaderboard):
         entry['rank'] = i + 1
     
-    return jsonify({
+    return jsonify(with_users({
         'leaderboard': leaderboard,
         'total_members': len(leaderboard),
         'is_instructor': is_instructor
-    }), 200
+    }, users)), 200
+
+
+@bp.route('/<int:class_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_class_events(class_id):
+    """Stream live completion and leaderboard events for a class (Server-Sent Events)"""
+    if not class_events.enabled():
+        return jsonify({'error': 'Live class events are not available on this deployment'}), 501
+    
+    user_id = int(get_jwt_identity())
+    class_obj = Class.query.get(class_id)
+    
+    if not class_obj:
+        return jsonify({'error': 'Class not found'}), 404
+    
+    # Check if user has access to this class
+    is_instructor = class_obj.instructor_id == user_id
+    is_member = ClassMembership.query.filter_by(class_id=class_id, student_id=user_id).first() is not None
+    
+    if not (is_instructor or is_member):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    heartbeat = current_app.config.get('CLASS_EVENTS_HEARTBEAT_SECONDS', 15)
+    
+    subscription = class_events.open_stream(class_id)
+    if subscription is None:
+        response = jsonify({'error': 'Too many live event streams. Please try again later.'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    # No request context or DB session is held while the stream is open
+    def generate():
+        yield 'retry: 5000\n\n'
+        while True:
+            message = subscription.get(timeout=heartbeat)
+            yield message if message is not None else ': keep-alive\n\n'
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs even if the client goes away before the first chunk
+    relay = class_events.relay()
+    response.call_on_close(lambda: class_events.close_stream(subscription, relay))
+    return response
 
 
 @bp.route('/<int:class_id>/stats', methods=['GET'])
 @jwt_required()
+@rate_limit(('30/minute', by_user), ('120/minute', by_ip))
 def get_class_stats(class_id):
     """Get overall statistics for the class (instructor only)"""
     user_id = int(get_jwt_identity())
@@ -773,42 +1291,84 @@ def get_class_stats(class_id):
     if class_obj.instructor_id != user_id:
         return jsonify({'error': 'Only the instructor can view class stats'}), 403
     
-    # Get all assigned workouts
-    assigned_workouts = AssignedWorkout.query.filter_by(class_id=class_id).all()
+    total_members = db.session.query(func.count(ClassMembership.id)).filter(
+        ClassMembership.class_id == class_id
+    ).scalar()
     
-    # Get all completed logs
-    completed_logs = StudentWorkoutLog.query.join(AssignedWorkout).filter(
-        AssignedWorkout.class_id == class_id,
-        StudentWorkoutLog.completed == True
-    ).all()
+    # Only completions by current members count towards the stats
+    member_ids = db.session.query(ClassMembership.student_id).filter(
+        ClassMembership.class_id == class_id
+    )
     
-    # Calculate stats
-    total_assigned = len(assigned_workouts)
-    total_completions = len(completed_logs)
-    total_members = class_obj.get_member_count()
+    # Per-assignment completions and averages in one grouped query
+    completion_count = func.count(StudentWorkoutLog.id)
+    assignment_rows = db.session.query(
+        AssignedWorkout.id,
+        AssignedWorkout.name,
+        AssignedWorkout.due_date,
+        completion_count,
+        func.avg(StudentWorkoutLog.total_volume),
+        # PostgreSQL averages an integer column as numeric (Decimal), which
+        # Flask would serialise as a string
+        func.avg(db.cast(StudentWorkoutLog.duration, db.Float))
+    ).outerjoin(
+        StudentWorkoutLog,
+        db.and_(
+            StudentWorkoutLog.assigned_workout_id == AssignedWorkout.id,
+            StudentWorkoutLog.completed == True,
+            StudentWorkoutLog.student_id.in_(member_ids)
+        )
+    ).filter(
+        AssignedWorkout.class_id == class_id
+    ).group_by(
+        AssignedWorkout.id, AssignedWorkout.name, AssignedWorkout.due_date
+    ).order_by(AssignedWorkout.id.desc()).all()
+    
+    assignments = []
+    for aw_id, name, due_date, completed, avg_volume, avg_duration in assignment_rows:
+        assignments.append({
+            'assigned_workout_id': aw_id,
+            'name': name,
+            'due_date': due_date.isoformat() if due_date else None,
+            'completed_count': completed,
+            'completion_rate': round(completed / total_members * 100, 1) if total_members > 0 else 0,
+            'average_volume': round(avg_volume, 1) if avg_volume is not None else None,
+            'average_duration': round(avg_duration, 1) if avg_duration is not None else None
+        })
+    
+    # Calculate stats; pending is derived from membership minus completions
+    total_assigned = len(assignments)
+    total_completions = sum(a['completed_count'] for a in assignments)
+    total_pending = total_assigned * total_members - total_completions
     
     avg_completion_rate = 0
     if total_assigned > 0 and total_members > 0:
         avg_completion_rate = (total_completions / (total_assigned * total_members)) * 100
     
-    # Get most active student
-    student_completion_counts = {}
-    for log in completed_logs:
-        student_completion_counts[log.student_id] = student_completion_counts.get(log.student_id, 0) + 1
+    # Get most active student with their completion count in one statement
+    student_completions = func.count(StudentWorkoutLog.id).label('completions')
+    most_active = db.session.query(User, student_completions).join(
+        StudentWorkoutLog, StudentWorkoutLog.student_id == User.id
+    ).join(
+        AssignedWorkout, AssignedWorkout.id == StudentWorkoutLog.assigned_workout_id
+    ).filter(
+        AssignedWorkout.class_id == class_id,
+        StudentWorkoutLog.completed == True,
+        StudentWorkoutLog.student_id.in_(member_ids)
+    ).group_by(User.id).order_by(student_completions.desc(), User.id).limit(1).first()
     
-    most_active_student = None
-    if student_completion_counts:
-        most_active_student_id = max(student_completion_counts, key=student_completion_counts.get)
-        most_active_student = User.query.get(most_active_student_id)
+    most_active_student, most_active_completions = most_active if most_active else (None, 0)
     
     return jsonify({
         'stats': {
             'total_members': total_members,
             'total_assigned_workouts': total_assigned,
             'total_completions': total_completions,
+            'total_pending': total_pending,
             'average_completion_rate': round(avg_completion_rate, 1),
             'most_active_student': most_active_student.to_dict() if most_active_student else None,
-            'most_active_student_completions': max(student_completion_counts.values()) if student_completion_counts else 0
+            'most_active_student_completions': most_active_completions,
+            'assignments': assignments
         }
     }), 200
 
@@ -1,13 +1,97 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
-from models.macros import MacroGoal, Meal, DailyIntake
+from models.macros import MacroGoal, Meal, DailyIntake, Food, FoodTerm, normalize_food_name
 from datetime import datetime, date, timedelta
+from sqlalchemy import func, select, bindparam, exists, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from cache import TTLCache
+from functools import lru_cache
+import os
 
 bp = Blueprint('macros', __name__, url_prefix='/api/macros')
 
+# Adherence rules: a day is 'met' when protein, carbs and fats reach these
+# fractions of the goal, otherwise 'over' when calories exceed the goal by 10%
+PROTEIN_MET_RATIO = 0.9
+CARBS_MET_RATIO = 0.8
+FATS_MET_RATIO = 0.9
+CALORIES_OVER_RATIO = 1.1
+
+# Plan used when a user has not saved any goals
+DEFAULT_GOAL = {
+    'plan_name': 'High Protein',
+    'calories': 2450,
+    'protein': 245,
+    'carbs': 215,
+    'fats': 68
+}
+
+# Served in place of a MacroGoal row until the user saves goals with PUT
+DEFAULT_GOAL_PAYLOAD = {
+    'id': None,
+    **DEFAULT_GOAL,
+    'is_active': True,
+    'is_default': True,
+    'created_at': None
+}
+
+HISTORY_BUCKETS = ('day', 'week', 'month')
+HISTORY_MAX_DAYS = 366 * 5
+
+FOOD_SEARCH_MIN_LENGTH = 2
+FOOD_SEARCH_DEFAULT_LIMIT = 20
+FOOD_SEARCH_MAX_LIMIT = 50
+# Prefixes matching more distinct words than this rank with one grouped scan
+FOOD_SEARCH_MAX_TERMS = 200
+
+MEAL_BATCH_MAX = 100
+
+# Rendered dashboard payloads keyed by (user_id, date)
+dashboard_cache = TTLCache(
+    maxsize=int(os.getenv('MACRO_DASHBOARD_CACHE_SIZE', '2048')),
+    ttl=int(os.getenv('MACRO_DASHBOARD_CACHE_TTL', '300'))
+)
+
+def invalidate_dashboards(user_id, dates):
+    """Evict cached dashboards showing any of the dates, including the 6 following days whose trends cover them"""
+    for changed_date in set(dates):
+        for offset in range(7):
+            dashboard_cache.delete((user_id, changed_date + timedelta(days=offset)))
+
+def invalidate_user_dashboards(user_id):
+    """Evict every cached dashboard for a user (e.g. after a goal change)"""
+    dashboard_cache.delete_where(lambda key: key[0] == user_id)
+
+def dashboard_version(user_id, target_date):
+    """Freshness stamp for a cached dashboard, read in one query.
+    
+    Every meal write touches DailyIntake.updated_at for its date and goal
+    updates touch MacroGoal.updated_at, so this changes whenever the rendered
+    dashboard would. It keeps cache hits correct across gunicorn workers, where
+    in-process invalidation does not reach.
+    """
+    intake_window = (
+        DailyIntake.user_id == user_id,
+        DailyIntake.date >= target_date - timedelta(days=6),
+        DailyIntake.date <= target_date
+    )
+    return tuple(db.session.query(
+        db.session.query(func.max(DailyIntake.updated_at)).filter(*intake_window).scalar_subquery(),
+        db.session.query(func.count(DailyIntake.id)).filter(*intake_window).scalar_subquery(),
+        db.session.query(func.max(MacroGoal.updated_at)).filter(
+            MacroGoal.user_id == user_id,
+            MacroGoal.is_active == True
+        ).scalar_subquery()
+    ).one())
+
 def calculate_daily_intake(user_id, target_date):
-    """Calculate and update daily intake for a given date"""
+    """Recalculate daily intake for a given date from all of its meals.
+    
+    Meal writes keep DailyIntake current with apply_intake_delta; this full
+    recompute is used by repair_daily_intake.py to fix days that drifted.
+    """
     meals = Meal.query.filter_by(user_id=user_id, date=target_date).all()
     
     total_calories = sum(meal.calories for meal in meals)
@@ -37,39 +121,69 @@ def calculate_daily_intake(user_id, target_date):
     db.session.commit()
     return daily_intake
 
+def apply_intake_delta(user_id, target_date, calories=0, protein=0, carbs=0, fats=0):
+    """Add macro deltas to the day's DailyIntake in the current transaction.
+    
+    Uses an atomic UPDATE ... SET total = total + delta. If the day has no row
+    yet, one is seeded from the SUM of that day's meals (which already includes
+    the pending change, thanks to autoflush).
+    """
+    update_stmt = db.update(DailyIntake).where(
+        DailyIntake.user_id == user_id,
+        DailyIntake.date == target_date
+    ).values(
+        total_calories=func.coalesce(DailyIntake.total_calories, 0) + calories,
+        total_protein=func.coalesce(DailyIntake.total_protein, 0) + protein,
+        total_carbs=func.coalesce(DailyIntake.total_carbs, 0) + carbs,
+        total_fats=func.coalesce(DailyIntake.total_fats, 0) + fats,
+        updated_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False)
+    
+    if db.session.execute(update_stmt).rowcount:
+        return
+    
+    totals = db.session.query(
+        func.coalesce(func.sum(Meal.calories), 0),
+        func.coalesce(func.sum(Meal.protein), 0),
+        func.coalesce(func.sum(Meal.carbs), 0),
+        func.coalesce(func.sum(Meal.fats), 0)
+    ).filter(Meal.user_id == user_id, Meal.date == target_date).one()
+    
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailyIntake(
+                user_id=user_id,
+                date=target_date,
+                total_calories=totals[0],
+                total_protein=totals[1],
+                total_carbs=totals[2],
+                total_fats=totals[3]
+            ))
+    except IntegrityError:
+        # A concurrent write created the row first; add our delta to it
+        db.session.execute(update_stmt)
+
+def active_goal(user_id):
+    """The user's active goal as a dict, or the default plan if none is saved.
+    
+    Never writes: the default is only persisted when the user saves goals.
+    """
+    goal = MacroGoal.query.filter_by(user_id=user_id, is_active=True).first()
+    return goal.to_dict() if goal else dict(DEFAULT_GOAL_PAYLOAD)
+
 @bp.route('/goals', methods=['GET'])
 @jwt_required()
 def get_goals():
     """Get user's active macro goals"""
     user_id = int(get_jwt_identity())
-    goal = MacroGoal.query.filter_by(user_id=user_id, is_active=True).first()
-    
-    if not goal:
-        # Create default goal
-        goal = MacroGoal(
-            user_id=user_id,
-            plan_name='High Protein',
-            calories=2450,
-            protein=245,
-            carbs=215,
-            fats=68
-        )
-        db.session.add(goal)
-        db.session.commit()
-    
-    return jsonify({'goal': goal.to_dict()}), 200
+    return jsonify({'goal': active_goal(user_id)}), 200
 
-@bp.route('/goals', methods=['PUT'])
-@jwt_required()
-def update_goals():
-    """Update user's macro goals"""
-    user_id = int(get_jwt_identity())
-    data = request.get_json()
-    
+def apply_goal_update(user_id, data):
+    """Update the active goal, creating it from the default plan if needed"""
     goal = MacroGoal.query.filter_by(user_id=user_id, is_active=True).first()
     
     if not goal:
-        goal = MacroGoal(user_id=user_id)
+        goal = MacroGoal(user_id=user_id, is_active=True, **DEFAULT_GOAL)
         db.session.add(goal)
     
     goal.plan_name = data.get('plan_name', goal.plan_name)
@@ -78,8 +192,25 @@ def update_goals():
     goal.carbs = data.get('carbs', goal.carbs)
     goal.fats = data.get('fats', goal.fats)
     goal.updated_at = datetime.utcnow()
+    return goal
+
+@bp.route('/goals', methods=['PUT'])
+@jwt_required()
+def update_goals():
+    """Update user's macro goals"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    goal = apply_goal_update(user_id, data)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent first save created the active goal; update that one
+        db.session.rollback()
+        goal = apply_goal_update(user_id, data)
+        db.session.commit()
+    invalidate_user_dashboards(user_id)
     
-    db.session.commit()
     return jsonify({'goal': goal.to_dict()}), 200
 
 @bp.route('/dashboard', methods=['GET'])
@@ -97,30 +228,33 @@ def get_dashboard():
     else:
         target_date = date.today()
     
-    # Get active goal
-    goal = MacroGoal.query.filter_by(user_id=user_id, is_active=True).first()
-    if not goal:
-        goal = MacroGoal(
+    cache_key = (user_id, target_date)
+    version = dashboard_version(user_id, target_date)
+    cached = dashboard_cache.get(cache_key)
+    if cached and cached[0] == version:
+        return jsonify(cached[1]), 200
+    
+    goal = active_goal(user_id)
+    
+    # Get daily intake (maintained by meal writes; a day without meals reads as zero)
+    daily_intake = DailyIntake.query.filter_by(user_id=user_id, date=target_date).first()
+    if not daily_intake:
+        daily_intake = DailyIntake(
             user_id=user_id,
-            plan_name='High Protein',
-            calories=2450,
-            protein=245,
-            carbs=215,
-            fats=68
+            date=target_date,
+            total_calories=0,
+            total_protein=0,
+            total_carbs=0,
+            total_fats=0
         )
-        db.session.add(goal)
-        db.session.commit()
-    
-    # Get daily intake
-    daily_intake = calculate_daily_intake(user_id, target_date)
     
     # Get meals for the date
     meals = Meal.query.filter_by(user_id=user_id, date=target_date).order_by(Meal.created_at).all()
     
     # Calculate adherence
-    protein_met = daily_intake.total_protein >= goal.protein * 0.9
-    carbs_met = daily_intake.total_carbs >= goal.carbs * 0.8
-    fats_met = daily_intake.total_fats >= goal.fats * 0.9
+    protein_met = daily_intake.total_protein >= goal['protein'] * PROTEIN_MET_RATIO
+    carbs_met = daily_intake.total_carbs >= goal['carbs'] * CARBS_MET_RATIO
+    fats_met = daily_intake.total_fats >= goal['fats'] * FATS_MET_RATIO
     
     adherence_status = 'On Track' if (protein_met and carbs_met and fats_met) else 'Needs Attention'
     
@@ -132,17 +266,18 @@ def get_dashboard():
         DailyIntake.date <= target_date
     ).order_by(DailyIntake.date).all()
     
+    intakes_by_date = {d.date: d for d in trend_intakes}
     trends = []
     for i in range(7):
         check_date = seven_days_ago + timedelta(days=i)
-        intake = next((d for d in trend_intakes if d.date == check_date), None)
-        if intake and goal:
-            protein_met_day = intake.total_protein >= goal.protein * 0.9
-            carbs_met_day = intake.total_carbs >= goal.carbs * 0.8
-            fats_met_day = intake.total_fats >= goal.fats * 0.9
+        intake = intakes_by_date.get(check_date)
+        if intake:
+            protein_met_day = intake.total_protein >= goal['protein'] * PROTEIN_MET_RATIO
+            carbs_met_day = intake.total_carbs >= goal['carbs'] * CARBS_MET_RATIO
+            fats_met_day = intake.total_fats >= goal['fats'] * FATS_MET_RATIO
             if protein_met_day and carbs_met_day and fats_met_day:
                 status = 'met'
-            elif intake.total_calories > goal.calories * 1.1:
+            elif intake.total_calories > goal['calories'] * CALORIES_OVER_RATIO:
                 status = 'over'
             else:
                 status = 'under'
@@ -153,9 +288,9 @@ def get_dashboard():
             'status': status
         })
     
-    return jsonify({
+    payload = {
         'date': target_date.isoformat(),
-        'goal': goal.to_dict(),
+        'goal': goal,
         'daily_intake': daily_intake.to_dict(),
         'meals': [meal.to_dict() for meal in meals],
         'adherence': {
@@ -165,8 +300,270 @@ def get_dashboard():
             'fats': {'met': fats_met, 'status': 'Met Goal' if fats_met else 'Low Intake'}
         },
         'trends': trends
+    }
+    dashboard_cache.set(cache_key, (version, payload))
+    
+    return jsonify(payload), 200
+
+def history_bucket_expression(bucket):
+    """SQL expression mapping DailyIntake.date to the start of its bucket"""
+    if bucket == 'day':
+        return DailyIntake.date
+    if db.session.get_bind().dialect.name == 'sqlite':
+        if bucket == 'week':
+            # Monday of the week: next Sunday (or today), minus 6 days
+            return func.date(DailyIntake.date, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m-01', DailyIntake.date)
+    return db.cast(func.date_trunc(bucket, DailyIntake.date), db.Date)
+
+@bp.route('/history', methods=['GET'])
+@jwt_required()
+def get_history():
+    """Get intake totals and adherence aggregated by day, week or month"""
+    user_id = int(get_jwt_identity())
+    bucket = request.args.get('bucket', 'day')
+    
+    if bucket not in HISTORY_BUCKETS:
+        return jsonify({'error': "Bucket must be 'day', 'week' or 'month'"}), 400
+    
+    try:
+        to_date = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else date.today()
+        from_date = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else to_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    if from_date > to_date:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+    if (to_date - from_date).days >= HISTORY_MAX_DAYS:
+        return jsonify({'error': f'Range cannot exceed {HISTORY_MAX_DAYS} days'}), 400
+    
+    goal_values = active_goal(user_id)
+    
+    # Per-day adherence as SQL expressions, summed per bucket in the same pass
+    met = db.and_(
+        DailyIntake.total_protein >= goal_values['protein'] * PROTEIN_MET_RATIO,
+        DailyIntake.total_carbs >= goal_values['carbs'] * CARBS_MET_RATIO,
+        DailyIntake.total_fats >= goal_values['fats'] * FATS_MET_RATIO
+    )
+    over = db.and_(db.not_(met), DailyIntake.total_calories > goal_values['calories'] * CALORIES_OVER_RATIO)
+    
+    bucket_start = history_bucket_expression(bucket).label('bucket_start')
+    rows = db.session.query(
+        bucket_start,
+        func.count(DailyIntake.id),
+        func.sum(DailyIntake.total_calories),
+        func.sum(DailyIntake.total_protein),
+        func.sum(DailyIntake.total_carbs),
+        func.sum(DailyIntake.total_fats),
+        func.sum(db.case((met, 1), else_=0)),
+        func.sum(db.case((over, 1), else_=0))
+    ).filter(
+        DailyIntake.user_id == user_id,
+        DailyIntake.date >= from_date,
+        DailyIntake.date <= to_date
+    ).group_by(bucket_start).order_by(bucket_start).all()
+    
+    buckets = []
+    for start, days, calories, protein, carbs, fats, met_days, over_days in rows:
+        buckets.append({
+            'start': str(start)[:10],
+            'days_logged': days,
+            'total_calories': calories,
+            'total_protein': protein,
+            'total_carbs': carbs,
+            'total_fats': fats,
+            'average_calories': round(calories / days, 1),
+            'average_protein': round(protein / days, 1),
+            'average_carbs': round(carbs / days, 1),
+            'average_fats': round(fats / days, 1),
+            'days_met': met_days,
+            'days_over': over_days,
+            'days_under': days - met_days - over_days,
+            'adherence_rate': round(met_days / days * 100, 1)
+        })
+    
+    days_logged = sum(b['days_logged'] for b in buckets)
+    days_met = sum(b['days_met'] for b in buckets)
+    
+    return jsonify({
+        'from': from_date.isoformat(),
+        'to': to_date.isoformat(),
+        'bucket': bucket,
+        'goal': goal_values,
+        'buckets': buckets,
+        'summary': {
+            'days_logged': days_logged,
+            'days_met': days_met,
+            'days_over': sum(b['days_over'] for b in buckets),
+            'adherence_rate': round(days_met / days_logged * 100, 1) if days_logged else 0
+        }
     }), 200
 
+def apply_food(meal, food_id, quantity_g):
+    """Link a meal to a catalog food and compute its macros server-side.
+    
+    Returns an error message, or None on success. The meal keeps a typed name
+    if one was given, otherwise it takes the food's name.
+    """
+    try:
+        quantity_g = float(quantity_g)
+    except (TypeError, ValueError):
+        return 'quantity_g is required when logging a catalog food'
+    if quantity_g <= 0:
+        return 'quantity_g must be positive'
+    
+    try:
+        food = db.session.get(Food, int(food_id))
+    except (TypeError, ValueError):
+        food = None
+    if not food:
+        return 'Food not found'
+    
+    meal.food_id = food.id
+    meal.quantity_g = quantity_g
+    if not meal.name:
+        meal.name = food.name
+    nutrients = food.nutrients_for(quantity_g)
+    meal.calories = nutrients['calories']
+    meal.protein = nutrients['protein']
+    meal.carbs = nutrients['carbs']
+    meal.fats = nutrients['fats']
+    return None
+
+def next_prefix(prefix):
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def prefix_terms(prefix):
+    """Distinct indexed words starting with prefix, in order.
+    
+    A recursive query steps from each word to the next with one index seek,
+    instead of reading every term row in the prefix's range.
+    """
+    terms = FoodTerm.__table__
+    lower, upper = bindparam('lower'), bindparam('upper')
+    found = select(func.min(terms.c.term).label('term')).where(
+        terms.c.term >= lower, terms.c.term < upper
+    ).cte('prefix_terms', recursive=True)
+    found = found.union_all(
+        select(
+            select(func.min(terms.c.term)).where(
+                terms.c.term > found.c.term, terms.c.term < upper
+            ).scalar_subquery()
+        ).where(found.c.term.isnot(None))
+    )
+    statement = select(found.c.term).where(found.c.term.isnot(None))
+    return [term for (term,) in db.session.execute(
+        statement, {'lower': prefix, 'upper': next_prefix(prefix)}
+    )]
+
+@lru_cache(maxsize=256)
+def _merged_search_statement(term_count, word_count):
+    """Top foods for term_count lead words, each also matching word_count prefixes.
+    
+    Each lead word takes its best `limit` rows straight from the
+    (term, position, name_length, food_id) index; only those rows are grouped
+    and ranked. Statements are built once per shape, since building the
+    per-word subqueries costs more than running them.
+    """
+    terms = FoodTerm.__table__
+    filters = []
+    for j in range(word_count):
+        other = terms.alias()
+        filters.append(exists().where(
+            other.c.food_id == terms.c.food_id,
+            other.c.term >= bindparam(f'lower_{j}'),
+            other.c.term < bindparam(f'upper_{j}')
+        ))
+    best_per_term = [
+        select(terms.c.food_id, terms.c.position, terms.c.name_length)
+        .where(terms.c.term == bindparam(f'term_{i}'), *filters)
+        .order_by(terms.c.position, terms.c.name_length, terms.c.food_id)
+        .limit(bindparam('limit')).subquery().select()
+        for i in range(term_count)
+    ]
+    candidates = (union_all(*best_per_term) if term_count > 1 else best_per_term[0]).subquery()
+    return select(candidates.c.food_id).group_by(candidates.c.food_id).order_by(
+        func.min(candidates.c.position), func.min(candidates.c.name_length), candidates.c.food_id
+    ).limit(bindparam('limit'))
+
+def _grouped_search_food_ids(words, limit):
+    """Rank every term row in the lead word's range; for very broad prefixes"""
+    lead = words[0]
+    query = db.session.query(FoodTerm.food_id).filter(
+        FoodTerm.term >= lead,
+        FoodTerm.term < next_prefix(lead)
+    )
+    for word in words[1:]:
+        other = aliased(FoodTerm)
+        query = query.filter(FoodTerm.food_id.in_(
+            select(other.food_id).where(other.term >= word, other.term < next_prefix(word))
+        ))
+    rows = query.group_by(FoodTerm.food_id).order_by(
+        func.min(FoodTerm.position), func.min(FoodTerm.name_length), FoodTerm.food_id
+    ).limit(limit).all()
+    return [food_id for (food_id,) in rows]
+
+def search_food_ids(query_text, limit):
+    """Ids of the best foods for a normalized query, best first.
+    
+    Every query word must prefix-match a word of the food's name. Names whose
+    first word matches the first query word come first, then shorter names (so
+    an exact name always leads). A food's rank is that of its best matching
+    word, so the best `limit` rows of each word matching the first query word
+    always contain the best `limit` foods: those rows are read from the
+    food_terms index and merged, and the rest of the range is never read.
+    benchmarks/food_search.py times this against a generated catalog.
+    """
+    words = list(dict.fromkeys(query_text.split()))
+    for word in words[1:]:
+        # Otherwise every row of the first word would be checked and rejected
+        if db.session.query(FoodTerm.id).filter(
+            FoodTerm.term >= word, FoodTerm.term < next_prefix(word)
+        ).first() is None:
+            return []
+    
+    terms = prefix_terms(words[0])
+    if not terms:
+        return []
+    if len(terms) > FOOD_SEARCH_MAX_TERMS:
+        return _grouped_search_food_ids(words, limit)
+    
+    params = {'limit': limit}
+    params.update({f'term_{i}': term for i, term in enumerate(terms)})
+    for j, word in enumerate(words[1:]):
+        params[f'lower_{j}'] = word
+        params[f'upper_{j}'] = next_prefix(word)
+    statement = _merged_search_statement(len(terms), len(words) - 1)
+    return [food_id for (food_id,) in db.session.execute(statement, params)]
+
+@bp.route('/foods/search', methods=['GET'])
+@jwt_required()
+def search_foods():
+    """Search the food catalog by word prefixes, best matches first.
+    
+    Only the returned foods are read from the foods table.
+    """
+    query_text = normalize_food_name(request.args.get('q', ''))
+    if len(query_text) < FOOD_SEARCH_MIN_LENGTH:
+        return jsonify({'error': f'q must be at least {FOOD_SEARCH_MIN_LENGTH} characters'}), 400
+    
+    limit = request.args.get('limit', FOOD_SEARCH_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, FOOD_SEARCH_MAX_LIMIT))
+    
+    food_ids = search_food_ids(query_text, limit)
+    foods = {food.id: food for food in Food.query.filter(Food.id.in_(food_ids))} if food_ids else {}
+    return jsonify({'foods': [foods[food_id].to_dict() for food_id in food_ids]}), 200
+
+@bp.route('/foods/<int:food_id>', methods=['GET'])
+@jwt_required()
+def get_food(food_id):
+    """Get a catalog food"""
+    food = db.session.get(Food, food_id)
+    if not food:
+        return jsonify({'error': 'Food not found'}), 404
+    return jsonify({'food': food.to_dict()}), 200
+
 @bp.route('/meals', methods=['GET'])
 @jwt_required()
 def get_meals():
@@ -188,25 +585,23 @@ def get_meals():
         'meals': [meal.to_dict() for meal in meals]
     }), 200
 
-@bp.route('/meals', methods=['POST'])
-@jwt_required()
-def create_meal():
-    """Create a new meal entry"""
-    user_id = int(get_jwt_identity())
-    data = request.get_json()
-    
-    date_str = data.get('date')
+def parse_meal_date(date_str):
+    """Meal date from YYYY-MM-DD, falling back to today"""
     if date_str:
         try:
-            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            return datetime.strptime(date_str, '%Y-%m-%d').date()
         except ValueError:
-            target_date = date.today()
-    else:
-        target_date = date.today()
+            pass
+    return date.today()
+
+def build_meal(user_id, data):
+    """Build an unsaved meal from request data; returns (meal, error)"""
+    if not isinstance(data, dict):
+        return None, 'Meal must be an object'
     
     meal = Meal(
         user_id=user_id,
-        date=target_date,
+        date=parse_meal_date(data.get('date')),
         meal_type=data.get('meal_type', 'snack'),
         name=data.get('name', ''),
         description=data.get('description'),
@@ -216,13 +611,119 @@ def create_meal():
         fats=data.get('fats', 0)
     )
     
-    db.session.add(meal)
+    if data.get('food_id') is not None:
+        error = apply_food(meal, data.get('food_id'), data.get('quantity_g'))
+        if error:
+            return None, error
+    return meal, None
+
+def save_meals(user_id, meals):
+    """Insert meals in one transaction with one intake update per date.
+    
+    Returns the serialized meals, rendered after the flush so the commit does
+    not force a reload of every row.
+    """
+    deltas = {}
+    for meal in meals:
+        totals = deltas.setdefault(meal.date, [0, 0, 0, 0])
+        totals[0] += meal.calories or 0
+        totals[1] += meal.protein or 0
+        totals[2] += meal.carbs or 0
+        totals[3] += meal.fats or 0
+    
+    db.session.add_all(meals)
+    db.session.flush()
+    for target_date, (calories, protein, carbs, fats) in deltas.items():
+        apply_intake_delta(
+            user_id, target_date,
+            calories=calories,
+            protein=protein,
+            carbs=carbs,
+            fats=fats
+        )
+    payload = [meal.to_dict() for meal in meals]
     db.session.commit()
+    invalidate_dashboards(user_id, deltas.keys())
+    return payload
+
+@bp.route('/meals', methods=['POST'])
+@jwt_required()
+def create_meal():
+    """Create a new meal entry"""
+    user_id = int(get_jwt_identity())
+    meal, error = build_meal(user_id, request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
     
-    # Recalculate daily intake
-    calculate_daily_intake(user_id, target_date)
-    
-    return jsonify({'meal': meal.to_dict()}), 201
+    meals = save_meals(user_id, [meal])
+    return jsonify({'meal': meals[0]}), 201
+
+@bp.route('/meals/batch', methods=['POST'])
+@jwt_required()
+def create_meals_batch():
+    """Create several meal entries in one transaction"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    items = data.get('meals')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'meals must be a non-empty list'}), 400
+    if len(items) > MEAL_BATCH_MAX:
+        return jsonify({'error': f'At most {MEAL_BATCH_MAX} meals per batch'}), 400
+    
+    meals = []
+    for index, item in enumerate(items):
+        meal, error = build_meal(user_id, item)
+        if error:
+            return jsonify({'error': f'meals[{index}]: {error}'}), 400
+        meals.append(meal)
+    
+    return jsonify({'meals': save_meals(user_id, meals)}), 201
+
+@bp.route('/meals/copy', methods=['POST'])
+@jwt_required()
+def copy_meals():
+    """Copy a day's meals (optionally only some meal types) to another day"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    try:
+        from_date = datetime.strptime(data.get('from_date') or '', '%Y-%m-%d').date()
+        to_date = datetime.strptime(data.get('to_date') or '', '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'from_date and to_date must be YYYY-MM-DD'}), 400
+    
+    meal_types = data.get('meal_types')
+    if meal_types is not None and (
+        not isinstance(meal_types, list) or not all(isinstance(t, str) for t in meal_types)
+    ):
+        return jsonify({'error': 'meal_types must be a list of strings'}), 400
+    
+    query = Meal.query.filter_by(user_id=user_id, date=from_date)
+    if meal_types:
+        query = query.filter(Meal.meal_type.in_(meal_types))
+    sources = query.order_by(Meal.created_at).all()
+    
+    if not sources:
+        return jsonify({'error': 'No meals found to copy'}), 404
+    
+    meals = [
+        Meal(
+            user_id=user_id,
+            date=to_date,
+            meal_type=source.meal_type,
+            name=source.name,
+            description=source.description,
+            calories=source.calories,
+            protein=source.protein,
+            carbs=source.carbs,
+            fats=source.fats,
+            food_id=source.food_id,
+            quantity_g=source.quantity_g
+        )
+        for source in sources
+    ]
+    return jsonify({'meals': save_meals(user_id, meals)}), 201
 
 @bp.route('/meals/<int:meal_id>', methods=['PUT'])
 @jwt_required()
@@ -235,6 +736,8 @@ def update_meal(meal_id):
         return jsonify({'error': 'Meal not found'}), 404
     
     data = request.get_json()
+    old_macros = (meal.calories, meal.protein, meal.carbs, meal.fats)
+    
     meal.meal_type = data.get('meal_type', meal.meal_type)
     meal.name = data.get('name', meal.name)
     meal.description = data.get('description', meal.description)
@@ -242,12 +745,28 @@ def update_meal(meal_id):
     meal.protein = data.get('protein', meal.protein)
     meal.carbs = data.get('carbs', meal.carbs)
     meal.fats = data.get('fats', meal.fats)
+    
+    if 'food_id' in data or ('quantity_g' in data and meal.food_id):
+        food_id = data.get('food_id', meal.food_id)
+        if food_id is None:
+            meal.food_id = None
+            meal.quantity_g = None
+        else:
+            error = apply_food(meal, food_id, data.get('quantity_g', meal.quantity_g))
+            if error:
+                db.session.rollback()
+                return jsonify({'error': error}), 400
     meal.updated_at = datetime.utcnow()
     
+    apply_intake_delta(
+        user_id, meal.date,
+        calories=meal.calories - old_macros[0],
+        protein=meal.protein - old_macros[1],
+        carbs=meal.carbs - old_macros[2],
+        fats=meal.fats - old_macros[3]
+    )
     db.session.commit()
-    
-    # Recalculate daily intake
-    calculate_daily_intake(user_id, meal.date)
+    invalidate_dashboards(user_id, [meal.date])
     
     return jsonify({'meal': meal.to_dict()}), 200
 
@@ -263,10 +782,15 @@ def delete_meal(meal_id):
     
     meal_date = meal.date
     db.session.delete(meal)
+    apply_intake_delta(
+        user_id, meal_date,
+        calories=-meal.calories,
+        protein=-meal.protein,
+        carbs=-meal.carbs,
+        fats=-meal.fats
+    )
     db.session.commit()
-    
-    # Recalculate daily intake
-    calculate_daily_intake(user_id, meal_date)
+    invalidate_dashboards(user_id, [meal_date])
     
     return jsonify({'message': 'Meal deleted successfully'}), 200
 
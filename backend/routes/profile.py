@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
 from models.user import User
 from models.workout import Workout
+from user_cache import invalidate_user
 from datetime import datetime, timedelta
 
 bp = Blueprint('profile', __name__, url_prefix='/api/profile')
@@ -75,6 +76,7 @@ def update_profile():
         user.avatar_url = data['avatar_url']
     
     db.session.commit()
+    invalidate_user(user_id)
     
     return jsonify({
         'message': 'Profile updated successfully',
@@ -25,7 +25,7 @@ def get_workouts():
         query = query.filter(Workout.date <= datetime.fromisoformat(end_date))
     
     # Order by created_at (most recent first), then by date
-    workouts = query.order_by(Workout.created_at.desc()).all()
+    workouts = query.options(Workout.detail_options()).order_by(Workout.created_at.desc()).all()
     
     return jsonify({
         'workouts': [w.to_dict() for w in workouts]
@@ -36,7 +36,7 @@ def get_workouts():
 def get_workout(workout_id):
     """Get specific workout"""
     user_id = int(get_jwt_identity())
-    workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
+    workout = Workout.query.filter_by(id=workout_id, user_id=user_id).options(Workout.detail_options()).first()
     
     if not workout:
         return jsonify({'error': 'Workout not found'}), 404
@@ -171,7 +171,9 @@ def get_workout_stats():
     total_volume = sum(w.total_volume or 0 for w in recent_workouts)
     
     # Get last workout
-    last_workout = Workout.query.filter_by(user_id=user_id).order_by(Workout.date.desc()).first()
+    last_workout = Workout.query.filter_by(user_id=user_id).options(
+        Workout.detail_options()
+    ).order_by(Workout.date.desc()).first()
     
     return jsonify({
         'stats': {
@@ -189,9 +191,10 @@ def get_routines():
     """Get all routines for current user"""
     user_id = int(get_jwt_identity())
     routines = Routine.query.filter_by(user_id=user_id).order_by(Routine.created_at.desc()).all()
+    exercises_by_id = Routine.load_exercises(routines)
     
     return jsonify({
-        'routines': [r.to_dict() for r in routines]
+        'routines': [r.to_dict(exercises_by_id) for r in routines]
     }), 200
 
 @bp.route('/routines', methods=['POST'])
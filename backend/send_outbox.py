@@ -0,0 +1,45 @@
+"""Deliver queued emails from the outbox
+
+Usage: python send_outbox.py [--loop]
+
+Sends every due email once and exits, or keeps polling with --loop. Use it
+where the in-process sender is disabled (EMAIL_OUTBOX_WORKER=false), e.g. from a
+scheduled job or a separate process. On Lambda, the `outbox` function in
+serverless.yml calls handler() every minute.
+"""
+import sys
+import time
+from app import app
+from outbox import SMTPSender, process_outbox
+
+def drain(sender):
+    total = 0
+    while True:
+        sent = process_outbox(sender)
+        total += sent
+        if not sent:
+            return total
+
+def handler(event, context):
+    """Lambda entry point for the scheduled send"""
+    sender = SMTPSender.from_env()
+    with app.app_context():
+        try:
+            return {'sent': drain(sender)}
+        finally:
+            sender.close()
+
+if __name__ == '__main__':
+    loop = '--loop' in sys.argv[1:]
+    sender = SMTPSender.from_env()
+    with app.app_context():
+        try:
+            while True:
+                sent = drain(sender)
+                if not loop:
+                    print(f"✓ Sent {sent} emails")
+                    break
+                sender.close_if_idle()
+                time.sleep(5)
+        finally:
+            sender.close()
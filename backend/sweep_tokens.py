@@ -0,0 +1,27 @@
+"""Delete expired and used auth tokens, and delivered class events
+
+Usage: python sweep_tokens.py [--batch-size N]
+
+Removes expired or used password reset tokens, expired refresh tokens and
+class events older than an hour in batches of N rows (default 1000), one
+short transaction per batch. The app's workers already run it hourly
+(sweeper.py); on Lambda the `sweeper` function in serverless.yml calls
+handler() hourly instead. Run it by hand to sweep at once.
+"""
+import sys
+from app import app
+import sweeper
+
+def sweep(batch_size=1000):
+    with app.app_context():
+        return sweeper.sweep(batch_size)
+
+def handler(event, context):
+    """Lambda entry point for the scheduled sweep"""
+    return sweep()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    batch_size = int(args[args.index('--batch-size') + 1]) if '--batch-size' in args else 1000
+    for table, deleted in sweep(batch_size).items():
+        print(f"✓ Deleted {deleted} rows from {table}")
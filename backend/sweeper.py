@@ -0,0 +1,102 @@
+"""
+Scheduled deletion of expired rows, from the app's own workers
+
+Reset tokens, refresh tokens and class events are written on request paths
+that never delete, so something must remove old rows on a schedule. On Lambda
+the `sweeper` function in serverless.yml runs sweep_tokens.handler hourly.
+Elsewhere (Fly, gunicorn) there is no scheduler, and a separate machine could
+not reach the SQLite volume, so each worker runs a SweepWorker thread: it
+sweeps about a minute after the worker's first request, so machines that
+stop when idle still sweep, then every SWEEP_INTERVAL_SECONDS. Workers sweep
+independently; a pass right after another finds little to delete, and every
+batch is its own short transaction.
+
+Configuration (environment):
+    SWEEP_WORKER             'false' to leave sweeping to `python sweep_tokens.py`
+                             (default true, false on Lambda)
+    SWEEP_INTERVAL_SECONDS   seconds between sweeps in each worker (default 3600)
+"""
+import logging
+import os
+import random
+import threading
+
+from models import db
+from models.classes import ClassEvent
+from models.user import PasswordResetToken, RefreshToken
+
+logger = logging.getLogger(__name__)
+
+FIRST_SWEEP_SECONDS = 60
+
+
+def sweep(batch_size=1000):
+    """Delete expired rows in batches; call inside an app context"""
+    return {
+        'password_reset_tokens': PasswordResetToken.sweep(batch_size),
+        'refresh_tokens': RefreshToken.sweep(batch_size),
+        'class_events': ClassEvent.sweep(batch_size)
+    }
+
+
+class SweepWorker:
+    """Background thread that sweeps periodically for one process"""
+
+    def __init__(self, app, interval=None, first_delay=None, batch_size=1000):
+        self.app = app
+        self.interval = interval or float(os.getenv('SWEEP_INTERVAL_SECONDS', '3600'))
+        # Spread workers out so they rarely sweep at the same moment
+        self.first_delay = FIRST_SWEEP_SECONDS * random.uniform(1, 2) if first_delay is None else first_delay
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def start(self):
+        """Start this process's sweep thread unless it is already running"""
+        if self.running():
+            return
+        with self._lock:
+            if not self.running():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='sweeper', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = self.first_delay
+        while not self._stop.wait(delay):
+            with self.app.app_context():
+                try:
+                    deleted = sweep(self.batch_size)
+                    logger.info('Swept %s', deleted)
+                except Exception:
+                    logger.exception('Sweep failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            delay = self.interval
+
+
+def init_app(app):
+    app.config.setdefault('SWEEP_WORKER', os.getenv(
+        'SWEEP_WORKER', 'false' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'true'
+    ).lower() == 'true')
+    app.extensions['sweeper'] = SweepWorker(app)
+
+    @app.before_request
+    def start_sweep_worker():
+        # On the first request, like the outbox sender, so the thread runs in
+        # each gunicorn worker rather than in the master
+        if app.config['SWEEP_WORKER']:
+            app.extensions['sweeper'].start()
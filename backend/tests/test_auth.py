@@ -1,8 +1,14 @@
 import pytest
 import json
 from models import db
-from models.user import User, PasswordResetToken
+from models.user import User, PasswordResetToken, RefreshToken
 from datetime import datetime, timedelta
+from passwords import PasswordHasher, hasher, hash_rounds
+from user_cache import user_cache
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+import threading
+import time
 
 class TestRegister:
     """Test user registration"""
@@ -400,3 +406,268 @@ class TestResetPassword:
         data = json.loads(response.data)
         assert 'error' in data
 
+
+
+class TestTokenSweep:
+    """Test the reset-token lifecycle and the batched sweeper"""
+    
+    def _add_token(self, user_id, hours=1, used=False):
+        import secrets
+        token = PasswordResetToken(
+            token=secrets.token_urlsafe(32),
+            user_id=user_id,
+            expires_at=datetime.utcnow() + timedelta(hours=hours),
+            used=used
+        )
+        db.session.add(token)
+        db.session.commit()
+        return token
+    
+    def test_forgot_password_only_inserts(self, client, test_user):
+        """Test the forgot-password path writes one token and cleans up nothing"""
+        self._add_token(test_user.id, hours=-2)
+        statements = []
+        
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.post('/api/auth/forgot-password', json={'email': 'test@example.com'})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert response.status_code == 200
+        token_writes = [s for s in statements if 'password_reset_tokens' in s and not s.startswith('SELECT')]
+        assert len(token_writes) == 1
+        assert token_writes[0].startswith('INSERT')
+    
+    def test_newer_request_supersedes_token(self, client, test_user):
+        """Test only the most recently requested token resets the password"""
+        old = self._add_token(test_user.id)
+        new = self._add_token(test_user.id)
+        
+        response = client.post('/api/auth/reset-password',
+            json={'token': old.token, 'new_password': 'newpassword123'})
+        assert response.status_code == 400
+        assert 'newer' in json.loads(response.data)['error']
+        
+        response = client.post('/api/auth/reset-password',
+            json={'token': new.token, 'new_password': 'newpassword123'})
+        assert response.status_code == 200
+        db.session.refresh(old)
+        assert old.used
+    
+    def test_sweep_deletes_expired_and_used(self, test_user):
+        """Test the sweeper removes expired and used tokens across several batches"""
+        PasswordResetToken.query.delete()
+        db.session.commit()
+        for _ in range(5):
+            self._add_token(test_user.id, hours=-1)
+        for _ in range(2):
+            self._add_token(test_user.id, used=True)
+        valid = self._add_token(test_user.id)
+        
+        assert PasswordResetToken.sweep(batch_size=2) == 7
+        assert [t.id for t in PasswordResetToken.query.all()] == [valid.id]
+    
+    def test_sweep_keeps_unexpired_refresh_tokens(self, test_user):
+        """Test revoked refresh tokens survive until they expire"""
+        RefreshToken.query.delete()
+        RefreshToken.issue(test_user.id)
+        RefreshToken.issue(test_user.id)
+        db.session.commit()
+        revoked, expired = RefreshToken.query.order_by(RefreshToken.id).all()
+        revoked.revoke()
+        expired.expires_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        
+        assert RefreshToken.sweep() == 1
+        assert [t.id for t in RefreshToken.query.all()] == [revoked.id]
+    
+    def test_sweep_worker_started_by_request(self, client, test_user, monkeypatch):
+        """Test workers outside Lambda sweep on their own after a first request"""
+        from app import app
+        from sweeper import SweepWorker
+        worker = SweepWorker(app, interval=0.05, first_delay=0)
+        monkeypatch.setitem(app.extensions, 'sweeper', worker)
+        monkeypatch.setitem(app.config, 'SWEEP_WORKER', True)
+        self._add_token(test_user.id, hours=-1)
+        try:
+            client.get('/health')
+            assert worker.running()
+            deadline = time.monotonic() + 5
+            while PasswordResetToken.query.count() and time.monotonic() < deadline:
+                db.session.remove()
+                time.sleep(0.05)
+        finally:
+            worker.stop()
+        assert PasswordResetToken.query.count() == 0
+
+
+class TestPasswordHashing:
+    """Test the bcrypt hashing pool"""
+    
+    def test_pool_hash_and_verify(self):
+        """Test hashing and verification through a worker process"""
+        pool = PasswordHasher(rounds=4, workers=1)
+        try:
+            password_hash = pool.hash('secret123')
+            assert hash_rounds(password_hash) == 4
+            assert pool.verify('secret123', password_hash)
+            assert not pool.verify('wrong', password_hash)
+            assert not pool.needs_rehash(password_hash)
+        finally:
+            pool.shutdown()
+    
+    def test_queued_call_waits_for_slot(self):
+        """Test a call beyond the cap waits for a slot instead of failing at once"""
+        inline = PasswordHasher(rounds=4, workers=0, max_pending=1, queue_timeout=5)
+        inline._slots.acquire()
+        threading.Timer(0.1, inline._slots.release).start()
+        assert hash_rounds(inline.hash('secret123')) == 4
+    
+    def test_rehash_on_login(self, client, test_user):
+        """Test a hash made with another cost is upgraded on successful login"""
+        test_user.password_hash = PasswordHasher(rounds=4, workers=0).hash('testpass123')
+        db.session.commit()
+        
+        response = client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        assert response.status_code == 200
+        db.session.refresh(test_user)
+        assert hash_rounds(test_user.password_hash) == hasher.rounds
+        assert test_user.check_password('testpass123')
+    
+    def test_busy_returns_503(self, client, test_user, monkeypatch):
+        """Test logins are shed with 503 when the hashing queue is full"""
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        monkeypatch.setattr(hasher, '_slots', full)
+        monkeypatch.setattr(hasher, 'queue_timeout', 0.05)
+        
+        response = client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+
+
+class TestCurrentUser:
+    """Test cached current-user resolution"""
+    
+    def _user_queries(self, client, headers, path):
+        statements = []
+        
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get(path, headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return response, [s for s in statements if 'FROM users' in s]
+    
+    def test_user_cached_across_requests(self, client, auth_headers, test_user):
+        """Test the user row is loaded once and then served from the cache"""
+        response, queries = self._user_queries(client, auth_headers, '/api/classes')
+        assert response.status_code == 200
+        assert len(queries) == 1
+        
+        response, queries = self._user_queries(client, auth_headers, '/api/classes')
+        assert response.status_code == 200
+        assert queries == []
+        assert user_cache.get(test_user.id).username == 'testuser'
+    
+    def test_routes_without_role_checks_skip_lookup(self, client, auth_headers, test_user):
+        """Test routes that only use the token's id never resolve the user"""
+        for path in ('/api/workouts', '/api/macros/meals', '/api/workouts/routines'):
+            response, queries = self._user_queries(client, auth_headers, path)
+            assert response.status_code == 200
+            assert queries == []
+        assert user_cache.get(test_user.id) is None
+    
+    def test_profile_update_invalidates(self, client, auth_headers, test_user):
+        """Test a profile update drops the cached snapshot"""
+        client.get('/api/classes', headers=auth_headers)
+        client.put('/api/profile', headers=auth_headers, json={'username': 'renamed'})
+        assert user_cache.get(test_user.id) is None
+        
+        client.get('/api/classes', headers=auth_headers)
+        assert user_cache.get(test_user.id).username == 'renamed'
+    
+    def test_unknown_user_token(self, client):
+        """Test a token for a user that no longer exists"""
+        token = create_access_token(identity='424242')
+        response = client.get('/api/classes', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 404
+        assert json.loads(response.data)['error'] == 'User not found'
+
+
+class TestRefreshToken:
+    """Test rotating refresh tokens"""
+    
+    def _login(self, client):
+        response = client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        return json.loads(response.data)['refresh_token']
+    
+    def _refresh(self, client, refresh_token):
+        return client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+    
+    def test_login_issues_hashed_token(self, client, test_user):
+        """Test login returns a refresh token that is stored only as a hash"""
+        refresh_token = self._login(client)
+        stored = RefreshToken.query.one()
+        assert stored.user_id == test_user.id
+        assert stored.token_hash != refresh_token
+        assert stored.token_hash == RefreshToken.hash_token(refresh_token)
+    
+    def test_refresh_rotates(self, client, test_user):
+        """Test refreshing returns a new pair and the new access token works"""
+        first = self._login(client)
+        response = self._refresh(client, first)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['refresh_token'] != first
+        
+        response = client.get('/api/auth/me', headers={'Authorization': f"Bearer {data['access_token']}"})
+        assert response.status_code == 200
+        
+        assert self._refresh(client, data['refresh_token']).status_code == 200
+    
+    def test_reuse_revokes_family(self, client, test_user):
+        """Test presenting a rotated token again revokes its successors"""
+        first = self._login(client)
+        second = json.loads(self._refresh(client, first).data)['refresh_token']
+        
+        response = self._refresh(client, first)
+        assert response.status_code == 401
+        assert self._refresh(client, second).status_code == 401
+    
+    def test_expired_and_invalid(self, client, test_user):
+        """Test expired and unknown refresh tokens are rejected"""
+        refresh_token = self._login(client)
+        RefreshToken.query.update({'expires_at': datetime.utcnow() - timedelta(minutes=1)})
+        db.session.commit()
+        assert self._refresh(client, refresh_token).status_code == 401
+        assert self._refresh(client, 'not-a-token').status_code == 401
+        assert client.post('/api/auth/refresh', json={}).status_code == 400
+    
+    def test_logout_and_password_change_revoke(self, client, auth_headers, test_user):
+        """Test logout and password changes end refresh sessions"""
+        refresh_token = self._login(client)
+        assert client.post('/api/auth/logout', json={'refresh_token': refresh_token}).status_code == 200
+        assert self._refresh(client, refresh_token).status_code == 401
+        
+        refresh_token = self._login(client)
+        client.post('/api/auth/change-password', headers=auth_headers, json={
+            'current_password': 'testpass123',
+            'new_password': 'newpass456'
+        })
+        assert self._refresh(client, refresh_token).status_code == 401
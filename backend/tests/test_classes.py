@@ -1,8 +1,10 @@
 import pytest
 import json
+from datetime import datetime
 from models import db
-from models.classes import Class, ClassMembership, ClassJoinRequest
+from models.classes import Class, ClassMembership, ClassJoinRequest, AssignedWorkout, StudentWorkoutLog, ClassEvent
 from models.user import User
+import class_events
 
 class TestCreateClass:
     """Test creating classes"""
@@ -122,7 +124,7 @@ class TestJoinClass:
             headers=auth_headers,
             json=join_data
         )
-        assert response.status_code == 200
+        assert response.status_code == 201
         data = json.loads(response.data)
         assert 'message' in data
     
@@ -170,3 +172,587 @@ class TestGetClassMembers:
         response = client.get(f'/api/classes/{sample_class.id}/members')
         assert response.status_code == 401
 
+
+
+class TestAssignedWorkoutCompletion:
+    """Test assignment logs and derived pending state"""
+    
+    @pytest.fixture
+    def class_member(self, client, test_user, sample_class):
+        """Add the test user to the sample class"""
+        with client.application.app_context():
+            membership = ClassMembership(
+                class_id=sample_class.id,
+                student_id=test_user.id
+            )
+            db.session.add(membership)
+            db.session.commit()
+        return test_user
+    
+    def _assign(self, client, instructor_headers, class_id):
+        response = client.post(f'/api/classes/{class_id}/assign-workout',
+            headers=instructor_headers,
+            json={'name': 'Leg Day', 'exercises': []}
+        )
+        assert response.status_code == 201
+        return json.loads(response.data)['assigned_workout']
+    
+    def test_assign_creates_no_placeholder_logs(self, client, instructor_headers, sample_class, class_member):
+        """Test assigning a workout only derives pending state"""
+        assigned = self._assign(client, instructor_headers, sample_class.id)
+        
+        with client.application.app_context():
+            assert StudentWorkoutLog.query.count() == 0
+        
+        stats = assigned['completion_stats']
+        assert stats['total_students'] == 1
+        assert stats['completed_count'] == 0
+        assert stats['pending_count'] == 1
+    
+    def test_my_log_pending(self, client, auth_headers, instructor_headers, sample_class, class_member):
+        """Test a pending assignment returns a synthesized incomplete log"""
+        assigned = self._assign(client, instructor_headers, sample_class.id)
+        url = f'/api/classes/{sample_class.id}/assigned-workouts'
+        
+        response = client.get(f'{url}/{assigned["id"]}/my-log', headers=auth_headers)
+        assert response.status_code == 200
+        log = json.loads(response.data)['log']
+        assert log['id'] is None
+        assert log['completed'] is False
+        assert log['student']['username'] == 'testuser'
+        
+        response = client.get(f'{url}/99999/my-log', headers=auth_headers)
+        assert response.status_code == 404
+    
+    def test_assign_with_placeholder_logs_option(self, client, instructor_headers, sample_class, class_member):
+        """Test legacy placeholder logs can still be enabled"""
+        client.application.config['ASSIGNMENT_PLACEHOLDER_LOGS'] = True
+        try:
+            self._assign(client, instructor_headers, sample_class.id)
+        finally:
+            client.application.config['ASSIGNMENT_PLACEHOLDER_LOGS'] = False
+        
+        with client.application.app_context():
+            logs = StudentWorkoutLog.query.all()
+            assert len(logs) == 1
+            assert logs[0].completed is False
+    
+    def test_complete_creates_log(self, client, auth_headers, instructor_headers, sample_class, class_member):
+        """Test completing a workout creates the log and updates stats"""
+        assigned = self._assign(client, instructor_headers, sample_class.id)
+        
+        response = client.post(
+            f'/api/classes/{sample_class.id}/assigned-workouts/{assigned["id"]}/complete',
+            headers=auth_headers,
+            json={'duration': 30, 'total_volume': 1200}
+        )
+        assert response.status_code == 200
+        
+        response = client.get(
+            f'/api/classes/{sample_class.id}/assigned-workouts/{assigned["id"]}',
+            headers=instructor_headers
+        )
+        data = json.loads(response.data)['assigned_workout']
+        assert data['completion_stats']['completed_count'] == 1
+        assert data['completion_stats']['pending_count'] == 0
+        assert len(data['student_logs']) == 1
+        assert data['pending_student_ids'] == []
+        
+        response = client.get(f'/api/classes/{sample_class.id}/stats', headers=instructor_headers)
+        stats = json.loads(response.data)['stats']
+        assert stats['total_completions'] == 1
+        assert stats['total_pending'] == 0
+
+    
+    def test_detail_expand(self, client, auth_headers, instructor_headers, sample_class, class_member):
+        """Test nested log relations are only included when expanded"""
+        assigned = self._assign(client, instructor_headers, sample_class.id)
+        client.post(
+            f'/api/classes/{sample_class.id}/assigned-workouts/{assigned["id"]}/complete',
+            headers=auth_headers,
+            json={'duration': 30, 'workout_data': {'duration': 30, 'exercises': []}}
+        )
+        url = f'/api/classes/{sample_class.id}/assigned-workouts/{assigned["id"]}'
+        
+        data = json.loads(client.get(url, headers=instructor_headers).data)['assigned_workout']
+        log = data['student_logs'][0]
+        assert log['duration'] == 30
+        assert 'student' not in log
+        assert 'workout' not in log
+        
+        data = json.loads(client.get(f'{url}?expand=student,workout', headers=instructor_headers).data)['assigned_workout']
+        log = data['student_logs'][0]
+        assert log['student']['username'] == 'testuser'
+        assert log['workout']['name'] == 'Leg Day'
+        assert data['pending_students'] == []
+        
+        response = client.get(f'{url}?expand=instructor', headers=instructor_headers)
+        assert response.status_code == 400
+
+class TestClassStats:
+    """Test class statistics"""
+    
+    def test_class_stats_aggregates(self, client, instructor_headers, sample_class):
+        """Test per-assignment rates and most active student"""
+        with client.application.app_context():
+            students = []
+            for i in range(3):
+                student = User(email=f'student{i}@example.com', username=f'student{i}', role='student')
+                student.set_password('testpass123')
+                db.session.add(student)
+                db.session.flush()
+                db.session.add(ClassMembership(class_id=sample_class.id, student_id=student.id))
+                students.append(student.id)
+            
+            first = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name='First')
+            second = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name='Second')
+            db.session.add_all([first, second])
+            db.session.flush()
+            
+            db.session.add_all([
+                StudentWorkoutLog(assigned_workout_id=first.id, student_id=students[0], completed=True, total_volume=1000, duration=40),
+                StudentWorkoutLog(assigned_workout_id=first.id, student_id=students[1], completed=True, total_volume=2000, duration=60),
+                StudentWorkoutLog(assigned_workout_id=second.id, student_id=students[1], completed=True, total_volume=500, duration=30)
+            ])
+            db.session.commit()
+        
+        response = client.get(f'/api/classes/{sample_class.id}/stats', headers=instructor_headers)
+        assert response.status_code == 200
+        stats = json.loads(response.data)['stats']
+        
+        assert stats['total_members'] == 3
+        assert stats['total_assigned_workouts'] == 2
+        assert stats['total_completions'] == 3
+        assert stats['average_completion_rate'] == 50.0
+        assert stats['most_active_student']['username'] == 'student1'
+        assert stats['most_active_student_completions'] == 2
+        
+        by_name = {a['name']: a for a in stats['assignments']}
+        assert by_name['First']['completed_count'] == 2
+        assert by_name['First']['completion_rate'] == 66.7
+        assert by_name['First']['average_volume'] == 1500.0
+        assert by_name['First']['average_duration'] == 50.0
+        assert isinstance(by_name['First']['average_duration'], float)
+        assert by_name['Second']['completed_count'] == 1
+    
+    def test_class_stats_empty_class(self, client, instructor_headers, sample_class):
+        """Test stats for a class with no members or assignments"""
+        response = client.get(f'/api/classes/{sample_class.id}/stats', headers=instructor_headers)
+        assert response.status_code == 200
+        stats = json.loads(response.data)['stats']
+        assert stats['most_active_student'] is None
+        assert stats['most_active_student_completions'] == 0
+        assert stats['assignments'] == []
+    
+    def test_class_stats_student_forbidden(self, client, auth_headers, sample_class):
+        """Test students cannot view class stats"""
+        response = client.get(f'/api/classes/{sample_class.id}/stats', headers=auth_headers)
+        assert response.status_code == 403
+
+
+class TestInstructorDashboard:
+    """Test the instructor dashboard"""
+    
+    def test_dashboard_success(self, client, instructor_headers, test_user, sample_class):
+        """Test dashboard returns counts, rates and recent completions"""
+        with client.application.app_context():
+            db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+            other = User(email='pending@example.com', username='pending', role='student')
+            other.set_password('testpass123')
+            db.session.add(other)
+            db.session.flush()
+            db.session.add(ClassJoinRequest(class_id=sample_class.id, student_id=other.id, status='pending'))
+            
+            assigned = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name='Cardio')
+            db.session.add(assigned)
+            db.session.flush()
+            db.session.add(StudentWorkoutLog(
+                assigned_workout_id=assigned.id,
+                student_id=test_user.id,
+                completed=True,
+                completed_at=datetime.utcnow(),
+                duration=25
+            ))
+            db.session.commit()
+        
+        response = client.get('/api/classes/dashboard', headers=instructor_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        
+        assert len(data['classes']) == 1
+        class_data = data['classes'][0]
+        assert class_data['member_count'] == 1
+        assert class_data['pending_request_count'] == 1
+        assert class_data['assigned_workout_count'] == 1
+        assert class_data['completion_rate'] == 100.0
+        
+        assert len(data['recent_completions']) == 1
+        assert data['recent_completions'][0]['student']['username'] == 'testuser'
+        assert data['recent_completions'][0]['assigned_workout_name'] == 'Cardio'
+    
+    def test_dashboard_recent_limit_clamped(self, client, instructor_headers, test_user, sample_class):
+        """Test recent_limit below 1 returns one completion rather than all"""
+        db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+        for name in ('Cardio', 'Strength'):
+            assigned = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name=name)
+            db.session.add(assigned)
+            db.session.flush()
+            db.session.add(StudentWorkoutLog(assigned_workout_id=assigned.id, student_id=test_user.id,
+                                             completed=True, completed_at=datetime.utcnow()))
+        db.session.commit()
+        
+        for recent_limit in (-1, 0):
+            response = client.get(f'/api/classes/dashboard?recent_limit={recent_limit}', headers=instructor_headers)
+            assert response.status_code == 200
+            assert len(json.loads(response.data)['recent_completions']) == 1
+    
+    def test_dashboard_no_classes(self, client, instructor_headers):
+        """Test dashboard for an instructor without classes"""
+        response = client.get('/api/classes/dashboard', headers=instructor_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['classes'] == []
+        assert data['recent_completions'] == []
+    
+    def test_dashboard_as_student(self, client, auth_headers):
+        """Test students cannot view the instructor dashboard"""
+        response = client.get('/api/classes/dashboard', headers=auth_headers)
+        assert response.status_code == 403
+
+
+class TestBulkJoinRequests:
+    """Test bulk accepting and rejecting join requests"""
+    
+    @pytest.fixture
+    def pending_requests(self, client, sample_class):
+        """Create three students with pending join requests"""
+        with client.application.app_context():
+            request_ids = []
+            for i in range(3):
+                student = User(email=f'joiner{i}@example.com', username=f'joiner{i}', role='student')
+                student.set_password('testpass123')
+                db.session.add(student)
+                db.session.flush()
+                join_request = ClassJoinRequest(class_id=sample_class.id, student_id=student.id, status='pending')
+                db.session.add(join_request)
+                db.session.flush()
+                request_ids.append(join_request.id)
+            db.session.commit()
+            return request_ids
+    
+    def test_bulk_accept(self, client, instructor_headers, sample_class, pending_requests):
+        """Test accepting several requests creates memberships"""
+        response = client.post(f'/api/classes/{sample_class.id}/join-requests/bulk',
+            headers=instructor_headers,
+            json={'action': 'accept', 'request_ids': pending_requests + [99999]}
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['processed_ids'] == pending_requests
+        assert data['skipped'] == [{'id': 99999, 'reason': 'Join request not found'}]
+        
+        with client.application.app_context():
+            assert ClassMembership.query.filter_by(class_id=sample_class.id).count() == 3
+            statuses = {r.status for r in ClassJoinRequest.query.filter(ClassJoinRequest.id.in_(pending_requests))}
+            assert statuses == {'accepted'}
+    
+    def test_bulk_reject_skips_processed(self, client, instructor_headers, sample_class, pending_requests):
+        """Test rejecting skips requests that were already handled"""
+        client.post(f'/api/classes/{sample_class.id}/join-requests/{pending_requests[0]}/accept',
+            headers=instructor_headers
+        )
+        response = client.post(f'/api/classes/{sample_class.id}/join-requests/bulk',
+            headers=instructor_headers,
+            json={'action': 'reject', 'request_ids': pending_requests}
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['processed_ids'] == pending_requests[1:]
+        assert [s['id'] for s in data['skipped']] == [pending_requests[0]]
+        
+        with client.application.app_context():
+            assert ClassMembership.query.filter_by(class_id=sample_class.id).count() == 1
+    
+    def test_bulk_invalid_action(self, client, instructor_headers, sample_class, pending_requests):
+        """Test an unknown action is rejected"""
+        response = client.post(f'/api/classes/{sample_class.id}/join-requests/bulk',
+            headers=instructor_headers,
+            json={'action': 'ignore', 'request_ids': pending_requests}
+        )
+        assert response.status_code == 400
+    
+    def test_bulk_as_student(self, client, auth_headers, sample_class, pending_requests):
+        """Test students cannot respond to join requests"""
+        response = client.post(f'/api/classes/{sample_class.id}/join-requests/bulk',
+            headers=auth_headers,
+            json={'action': 'accept', 'request_ids': pending_requests}
+        )
+        assert response.status_code == 403
+
+
+class TestClassEvents:
+    """Test live class events"""
+    
+    def test_completion_publishes_events(self, client, auth_headers, instructor_headers, test_user, sample_class):
+        """Test completing a workout pushes completion and leaderboard events"""
+        with client.application.app_context():
+            db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+            assigned = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name='Sprints')
+            db.session.add(assigned)
+            db.session.commit()
+            assigned_id = assigned.id
+        
+        subscription = class_events.open_stream(sample_class.id)
+        try:
+            response = client.post(
+                f'/api/classes/{sample_class.id}/assigned-workouts/{assigned_id}/complete',
+                headers=auth_headers,
+                json={'duration': 20}
+            )
+            assert response.status_code == 200
+            
+            # The relay thread is off in tests; poll as it would
+            assert class_events.relay().poll() == 2
+            completion = subscription.get(timeout=1)
+            leaderboard = subscription.get(timeout=1)
+        finally:
+            class_events.close_stream(subscription, class_events.relay())
+        
+        assert completion.startswith('event: completion\n')
+        assert leaderboard.startswith('event: leaderboard\n')
+        payload = json.loads(leaderboard.split('data: ', 1)[1])
+        assert payload['student']['id'] == test_user.id
+        assert payload['stats']['total_workouts'] == 1
+        assert payload['stats']['completion_rate'] == 100.0
+    
+    def test_event_stream_opens(self, client, instructor_headers, sample_class):
+        """Test the SSE endpoint streams to the instructor"""
+        response = client.get(f'/api/classes/{sample_class.id}/events', headers=instructor_headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert next(response.response) == b'retry: 5000\n\n'
+        assert class_events.broker.has_subscribers(sample_class.id)
+        response.close()
+        assert not class_events.broker.has_subscribers(sample_class.id)
+    
+    def test_event_stream_access_denied(self, client, auth_headers, sample_class):
+        """Test non-members cannot subscribe"""
+        response = client.get(f'/api/classes/{sample_class.id}/events', headers=auth_headers)
+        assert response.status_code == 403
+    
+    def test_events_from_other_workers_delivered(self, client, instructor_headers, sample_class):
+        """Test rows written by another process reach this process's streams"""
+        response = client.get(f'/api/classes/{sample_class.id}/events', headers=instructor_headers)
+        next(response.response)
+        try:
+            # As if another worker handled the completion
+            class_events.send_event(sample_class.id, 'completion', {'student': {'id': 1}})
+            class_events.send_event(sample_class.id + 1, 'completion', {'student': {'id': 2}})
+            db.session.commit()
+            assert class_events.relay().poll() == 2
+            assert next(response.response).decode().startswith('event: completion\ndata: {"student": {"id": 1}}')
+        finally:
+            response.close()
+    
+    def test_stream_cap(self, client, instructor_headers, sample_class, monkeypatch):
+        """Test streams beyond the per-process cap get 503"""
+        monkeypatch.setattr(class_events.broker, 'max_subscriptions', 1)
+        url = f'/api/classes/{sample_class.id}/events'
+        first = client.get(url, headers=instructor_headers)
+        assert first.status_code == 200
+        
+        response = client.get(url, headers=instructor_headers)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+        
+        first.close()
+        second = client.get(url, headers=instructor_headers)
+        assert second.status_code == 200
+        second.close()
+    
+    def test_events_disabled(self, client, instructor_headers, sample_class, monkeypatch):
+        """Test the endpoint answers 501 where streaming is unavailable (Lambda)"""
+        monkeypatch.setitem(client.application.config, 'CLASS_EVENTS_ENABLED', False)
+        response = client.get(f'/api/classes/{sample_class.id}/events', headers=instructor_headers)
+        assert response.status_code == 501
+    
+    def test_completion_writes_no_events_when_disabled(self, client, auth_headers, test_user, sample_class, monkeypatch):
+        """Test completions add no event rows nobody can read"""
+        monkeypatch.setitem(client.application.config, 'CLASS_EVENTS_ENABLED', False)
+        db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+        assigned = AssignedWorkout(class_id=sample_class.id, instructor_id=sample_class.instructor_id, name='Sprints')
+        db.session.add(assigned)
+        db.session.commit()
+        
+        response = client.post(
+            f'/api/classes/{sample_class.id}/assigned-workouts/{assigned.id}/complete',
+            headers=auth_headers,
+            json={'duration': 20}
+        )
+        assert response.status_code == 200
+        assert ClassEvent.query.count() == 0
+
+
+class TestClassMemberPagination:
+    """Test paginated member listing"""
+    
+    @pytest.fixture
+    def many_members(self, client, sample_class):
+        """Add five students to the sample class"""
+        with client.application.app_context():
+            for name in ['alice', 'albert', 'bob', 'carol', 'al_x']:
+                student = User(email=f'{name}@example.com', username=name, role='student', password_hash='x')
+                db.session.add(student)
+                db.session.flush()
+                db.session.add(ClassMembership(class_id=sample_class.id, student_id=student.id))
+            db.session.commit()
+    
+    def test_members_cursor_pagination(self, client, instructor_headers, sample_class, many_members):
+        """Test walking all pages with the cursor"""
+        usernames = []
+        cursor = None
+        while True:
+            url = f'/api/classes/{sample_class.id}/members?limit=2'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = client.get(url, headers=instructor_headers)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            assert data['total_count'] == 5
+            assert len(data['members']) <= 2
+            usernames.extend(m['student']['username'] for m in data['members'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert usernames == ['alice', 'albert', 'bob', 'carol', 'al_x']
+    
+    def test_members_name_prefix(self, client, instructor_headers, sample_class, many_members):
+        """Test filtering members by name prefix"""
+        response = client.get(f'/api/classes/{sample_class.id}/members?q=al', headers=instructor_headers)
+        data = json.loads(response.data)
+        assert sorted(m['student']['username'] for m in data['members']) == ['al_x', 'albert', 'alice']
+        
+        response = client.get(f'/api/classes/{sample_class.id}/members?q=al_', headers=instructor_headers)
+        data = json.loads(response.data)
+        assert [m['student']['username'] for m in data['members']] == ['al_x']
+    
+    def test_members_invalid_cursor(self, client, instructor_headers, sample_class):
+        """Test a malformed cursor is rejected"""
+        response = client.get(f'/api/classes/{sample_class.id}/members?cursor=garbage', headers=instructor_headers)
+        assert response.status_code == 400
+
+
+class TestMyAssignments:
+    """Test the cross-class assignment feed"""
+    
+    @pytest.fixture
+    def assignments(self, client, test_user, instructor_user, sample_class):
+        """Enroll the test user in two classes with assignments"""
+        with client.application.app_context():
+            other_class = Class(instructor_id=instructor_user.id, name='Other Class', join_code='OTHER123')
+            db.session.add(other_class)
+            db.session.flush()
+            
+            db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+            db.session.add(ClassMembership(class_id=other_class.id, student_id=test_user.id))
+            
+            specs = [
+                (sample_class.id, 'No Due Date', None),
+                (other_class.id, 'Later', datetime(2030, 1, 10)),
+                (sample_class.id, 'Sooner', datetime(2030, 1, 5)),
+                (other_class.id, 'Same Day', datetime(2030, 1, 10))
+            ]
+            created = {}
+            for class_id, name, due_date in specs:
+                aw = AssignedWorkout(class_id=class_id, instructor_id=instructor_user.id, name=name, due_date=due_date)
+                db.session.add(aw)
+                db.session.flush()
+                created[name] = aw.id
+            
+            db.session.add(StudentWorkoutLog(
+                assigned_workout_id=created['Later'],
+                student_id=test_user.id,
+                completed=True,
+                completed_at=datetime.utcnow()
+            ))
+            db.session.commit()
+            return created
+    
+    def test_my_assignments_ordered_and_paginated(self, client, auth_headers, assignments):
+        """Test the feed is ordered by due date with no-due-date last"""
+        names = []
+        cursor = None
+        while True:
+            url = '/api/classes/my-assignments?limit=3'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = client.get(url, headers=auth_headers)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            names.extend(a['name'] for a in data['assignments'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert names == ['Sooner', 'Later', 'Same Day', 'No Due Date']
+    
+    def test_my_assignments_completion_state(self, client, auth_headers, assignments):
+        """Test the caller's completion state and status filter"""
+        response = client.get('/api/classes/my-assignments?status=completed', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [a['name'] for a in data['assignments']] == ['Later']
+        assert data['assignments'][0]['completed'] is True
+        assert data['assignments'][0]['class_name'] == 'Other Class'
+        
+        response = client.get('/api/classes/my-assignments?status=pending', headers=auth_headers)
+        data = json.loads(response.data)
+        assert len(data['assignments']) == 3
+        assert all(a['my_log'] is None for a in data['assignments'])
+    
+    def test_my_assignments_unauthorized(self, client):
+        """Test the feed requires authentication"""
+        response = client.get('/api/classes/my-assignments')
+        assert response.status_code == 401
+
+
+class TestSideloadedUsers:
+    """Test the side-loaded users response mode"""
+    
+    def test_assigned_workouts_sideload(self, client, auth_headers, test_user, instructor_user, sample_class):
+        """Test rows reference users by id and users are listed once"""
+        with client.application.app_context():
+            db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+            for name in ['One', 'Two']:
+                db.session.add(AssignedWorkout(class_id=sample_class.id, instructor_id=instructor_user.id, name=name))
+            db.session.commit()
+        
+        response = client.get(
+            f'/api/classes/{sample_class.id}/assigned-workouts?users=sideload',
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['assigned_workouts']) == 2
+        for aw in data['assigned_workouts']:
+            assert 'instructor' not in aw
+            assert aw['instructor_id'] == instructor_user.id
+        assert list(data['users']) == [str(instructor_user.id)]
+        assert data['users'][str(instructor_user.id)]['username'] == 'instructor'
+    
+    def test_leaderboard_sideload(self, client, instructor_headers, test_user, sample_class):
+        """Test leaderboard entries carry student_id with a users map"""
+        with client.application.app_context():
+            db.session.add(ClassMembership(class_id=sample_class.id, student_id=test_user.id))
+            db.session.commit()
+        
+        response = client.get(f'/api/classes/{sample_class.id}/leaderboard?users=sideload', headers=instructor_headers)
+        data = json.loads(response.data)
+        entry = data['leaderboard'][0]
+        assert 'student' not in entry
+        assert data['users'][str(entry['student_id'])]['username'] == 'testuser'
+    
+    def test_default_mode_embeds_users(self, client, instructor_headers, sample_class):
+        """Test the default response still embeds user objects"""
+        response = client.get('/api/classes', headers=instructor_headers)
+        data = json.loads(response.data)
+        assert data['classes'][0]['instructor']['username'] == 'instructor'
+        assert 'users' not in data
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import types
+import pytest
+from flask import Flask, Blueprint
+from blueprints import LazyBlueprints
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK = os.path.join(BACKEND_DIR, 'benchmarks', 'cold_start.py')
+
+# Wall-clock budgets fail on loaded machines, so the budget test only runs when
+# one is given, e.g. COLD_START_BUDGET_MS=1500 (~600 ms measured locally)
+COLD_START_BUDGET_MS = os.getenv('COLD_START_BUDGET_MS')
+
+def run_benchmark(*args):
+    return subprocess.run(
+        [sys.executable, BENCHMARK, '--json', *args],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+class TestLazyBlueprints:
+    """Test route modules registered on first use"""
+
+    def test_registers_on_first_matching_request(self, monkeypatch):
+        """Test a blueprint loads on its first request, even after others were served"""
+        module = types.ModuleType('lazy_test_routes')
+        module.bp = Blueprint('lazy_test', 'lazy_test_routes', url_prefix='/api/lazy')
+        module.bp.add_url_rule('/ping', 'ping', lambda: {'pong': True})
+        monkeypatch.setitem(sys.modules, 'lazy_test_routes', module)
+
+        app = Flask('lazy_test_app')
+        loader = LazyBlueprints(app, {'/api/lazy': 'lazy_test_routes'})
+        client = app.test_client()
+
+        assert client.get('/api/other').status_code == 404
+        assert 'lazy_test' not in app.blueprints
+
+        response = client.get('/api/lazy/ping')
+        assert response.status_code == 200
+        assert response.get_json() == {'pong': True}
+        assert loader.pending == {}
+
+    def test_prefix_must_match_whole_segment(self, monkeypatch):
+        """Test /api/lazyish does not load the /api/lazy blueprint"""
+        app = Flask('lazy_test_app')
+        loader = LazyBlueprints(app, {'/api/lazy': 'lazy_test_routes_missing'})
+        assert app.test_client().get('/api/lazyish').status_code == 404
+        assert loader.pending == {'/api/lazy': 'lazy_test_routes_missing'}
+
+    def test_flask_first_request_flag(self):
+        """Test the private Flask flag that load() lifts still gates setup calls"""
+        app = Flask('lazy_test_app')
+        assert app._got_first_request is False
+        app.test_client().get('/')
+        assert app._got_first_request is True
+        with pytest.raises(AssertionError):
+            app.register_blueprint(Blueprint('late', 'late'))
+
+
+class TestColdStart:
+    """Test the Lambda cold-start import graph and budget"""
+
+    def test_cold_start_defers_unused_modules(self):
+        """Test a cold request loads only its own route module and no deferred modules"""
+        result = run_benchmark('--runs', '1', '--path', '/api/exercises')
+        assert result.returncode == 0, result.stderr
+        summary = json.loads(result.stdout)
+        assert summary['status'] == 401
+        assert summary['routes'] == ['routes.exercises']
+        assert summary['deferred'] == []
+
+    @pytest.mark.slow
+    @pytest.mark.skipif(not COLD_START_BUDGET_MS, reason='COLD_START_BUDGET_MS not set')
+    def test_cold_start_within_budget(self):
+        """Test import plus first request stays within COLD_START_BUDGET_MS"""
+        result = run_benchmark('--runs', '3', '--budget-ms', COLD_START_BUDGET_MS)
+        assert result.returncode == 0, result.stderr
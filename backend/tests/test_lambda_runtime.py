@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+from lambda_runtime import IdlePing, is_warmup_event, warm_up
+from models import db
+from app import app
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Same pool shape as the Lambda profile: one connection, no overflow
+    engine = create_engine(f'sqlite:///{tmp_path / "lambda.db"}', poolclass=QueuePool,
+                           pool_size=1, max_overflow=0)
+    yield engine
+    engine.dispose()
+
+def query(engine):
+    with engine.connect() as conn:
+        return conn.execute(text('SELECT 1')).scalar()
+
+
+class TestIdlePing:
+    """Test the Lambda connection freshness window"""
+
+    def test_no_ping_within_window(self, engine):
+        """Test back-to-back checkouts reuse the connection without pinging"""
+        clock = FakeClock()
+        ping = IdlePing(idle_seconds=60, clock=clock).install(engine)
+        for _ in range(3):
+            assert query(engine) == 1
+            clock.now += 30
+        assert ping.pings == 0
+
+    def test_ping_after_idle(self, engine):
+        """Test a checkout after the idle threshold pings once and keeps the connection"""
+        clock = FakeClock()
+        ping = IdlePing(idle_seconds=60, clock=clock).install(engine)
+        query(engine)
+        clock.now += 61
+        query(engine)
+        query(engine)
+        assert ping.pings == 1
+        assert ping.reconnects == 0
+
+    def test_reconnects_when_ping_fails(self, engine):
+        """Test a dead idle connection is replaced before the caller sees it"""
+        clock = FakeClock()
+        ping = IdlePing(idle_seconds=60, clock=clock).install(engine)
+        with engine.connect() as conn:
+            dead = conn.connection.dbapi_connection
+        dead.close()
+        clock.now += 61
+
+        assert query(engine) == 1
+        assert ping.reconnects == 1
+        with engine.connect() as conn:
+            assert conn.connection.dbapi_connection is not dead
+
+
+class TestWarmUp:
+    """Test scheduled warm-up invocations"""
+
+    def test_warmup_events(self):
+        """Test scheduled events are recognised and HTTP events are not"""
+        assert is_warmup_event({'warmup': True})
+        assert is_warmup_event({'source': 'aws.events', 'detail-type': 'Scheduled Event'})
+        assert not is_warmup_event({'rawPath': '/api/auth/login', 'requestContext': {}})
+        assert not is_warmup_event(None)
+
+    def test_warm_up_checks_connection(self, client):
+        """Test a warm-up loads routes and touches the database"""
+        statements = []
+        
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            result = warm_up(app)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert result['warm'] is True
+        assert 'SELECT 1' in statements
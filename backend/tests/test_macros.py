@@ -0,0 +1,394 @@
+import pytest
+import json
+from datetime import date, datetime
+from models import db
+from models.macros import DailyIntake, Meal, MacroGoal, Food, FoodTerm, normalize_food_name
+from sqlalchemy.exc import IntegrityError
+from load_foods import load_foods
+from routes.macros import dashboard_cache
+
+class TestMealIntake:
+    """Test DailyIntake maintenance on meal writes"""
+    
+    def _intake(self, target_date):
+        return DailyIntake.query.filter_by(date=target_date).first()
+    
+    def test_create_update_delete_meal(self, client, auth_headers):
+        """Test intake totals follow meal creates, updates and deletes"""
+        response = client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-03-01', 'meal_type': 'lunch', 'name': 'Rice',
+            'calories': 300, 'protein': 6, 'carbs': 65, 'fats': 1
+        })
+        assert response.status_code == 201
+        rice_id = json.loads(response.data)['meal']['id']
+        
+        client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-03-01', 'meal_type': 'lunch', 'name': 'Chicken',
+            'calories': 250, 'protein': 45, 'carbs': 0, 'fats': 6
+        })
+        
+        intake = self._intake(date(2030, 3, 1))
+        assert intake.total_calories == 550
+        assert intake.total_protein == 51
+        
+        response = client.put(f'/api/macros/meals/{rice_id}', headers=auth_headers, json={'calories': 400})
+        assert response.status_code == 200
+        db.session.refresh(intake)
+        assert intake.total_calories == 650
+        
+        response = client.delete(f'/api/macros/meals/{rice_id}', headers=auth_headers)
+        assert response.status_code == 200
+        db.session.refresh(intake)
+        assert intake.total_calories == 250
+        assert intake.total_carbs == 0
+    
+    def test_meal_unauthorized(self, client):
+        """Test creating a meal without authentication"""
+        response = client.post('/api/macros/meals', json={'name': 'Rice'})
+        assert response.status_code == 401
+    
+    def test_repair_drifted_days(self, client, test_user):
+        """Test the repair script rebuilds only days whose totals drifted"""
+        from repair_daily_intake import repair
+        for day in (1, 2, 3):
+            db.session.add(Meal(user_id=test_user.id, date=date(2030, 4, day), meal_type='lunch',
+                                name='Oats', calories=150, protein=5, carbs=27, fats=3))
+        db.session.add(DailyIntake(user_id=test_user.id, date=date(2030, 4, 1), total_calories=150,
+                                   total_protein=5, total_carbs=27, total_fats=3))
+        db.session.add(DailyIntake(user_id=test_user.id, date=date(2030, 4, 2), total_calories=999,
+                                   total_protein=5, total_carbs=27, total_fats=3))
+        db.session.add(DailyIntake(user_id=test_user.id, date=date(2030, 4, 4), total_calories=80))
+        db.session.commit()
+        
+        expected = [(test_user.id, date(2030, 4, day)) for day in (2, 3, 4)]
+        assert repair(dry_run=True) == expected
+        assert repair() == expected
+        assert repair() == []
+        assert self._intake(date(2030, 4, 2)).total_calories == 150
+        assert self._intake(date(2030, 4, 3)).total_carbs == 27
+        assert self._intake(date(2030, 4, 4)).total_calories == 0
+
+
+
+class TestMealBatch:
+    """Test batch meal logging and copying days"""
+    
+    def test_batch_create(self, client, auth_headers):
+        """Test a batch inserts every meal and updates each date's intake once"""
+        response = client.post('/api/macros/meals/batch', headers=auth_headers, json={'meals': [
+            {'date': '2030-04-01', 'meal_type': 'breakfast', 'name': 'Oats', 'calories': 300, 'protein': 10},
+            {'date': '2030-04-01', 'meal_type': 'lunch', 'name': 'Chicken', 'calories': 250, 'protein': 45},
+            {'date': '2030-04-02', 'meal_type': 'dinner', 'name': 'Salmon', 'calories': 400, 'protein': 40}
+        ]})
+        assert response.status_code == 201
+        meals = json.loads(response.data)['meals']
+        assert [m['name'] for m in meals] == ['Oats', 'Chicken', 'Salmon']
+        assert all(m['id'] for m in meals)
+        
+        first = DailyIntake.query.filter_by(date=date(2030, 4, 1)).one()
+        assert first.total_calories == 550
+        assert first.total_protein == 55
+        assert DailyIntake.query.filter_by(date=date(2030, 4, 2)).one().total_calories == 400
+    
+    def test_batch_is_all_or_nothing(self, client, auth_headers):
+        """Test one invalid meal rejects the whole batch"""
+        response = client.post('/api/macros/meals/batch', headers=auth_headers, json={'meals': [
+            {'date': '2030-04-01', 'name': 'Oats', 'calories': 300},
+            {'date': '2030-04-01', 'food_id': 99999, 'quantity_g': 100}
+        ]})
+        assert response.status_code == 400
+        assert 'meals[1]' in json.loads(response.data)['error']
+        assert Meal.query.count() == 0
+        
+        response = client.post('/api/macros/meals/batch', headers=auth_headers, json={'meals': []})
+        assert response.status_code == 400
+    
+    def test_copy_day(self, client, auth_headers):
+        """Test copying a day's meals adds to the target day's intake"""
+        client.post('/api/macros/meals/batch', headers=auth_headers, json={'meals': [
+            {'date': '2030-04-01', 'meal_type': 'breakfast', 'name': 'Oats', 'calories': 300},
+            {'date': '2030-04-01', 'meal_type': 'lunch', 'name': 'Chicken', 'calories': 250},
+            {'date': '2030-04-03', 'meal_type': 'snack', 'name': 'Apple', 'calories': 95}
+        ]})
+        
+        response = client.post('/api/macros/meals/copy', headers=auth_headers, json={
+            'from_date': '2030-04-01', 'to_date': '2030-04-03'
+        })
+        assert response.status_code == 201
+        assert len(json.loads(response.data)['meals']) == 2
+        assert DailyIntake.query.filter_by(date=date(2030, 4, 3)).one().total_calories == 645
+        
+        response = client.post('/api/macros/meals/copy', headers=auth_headers, json={
+            'from_date': '2030-04-01', 'to_date': '2030-04-04', 'meal_types': ['lunch']
+        })
+        assert [m['name'] for m in json.loads(response.data)['meals']] == ['Chicken']
+    
+    def test_copy_day_errors(self, client, auth_headers):
+        """Test copying an empty day or invalid dates"""
+        response = client.post('/api/macros/meals/copy', headers=auth_headers, json={
+            'from_date': '2030-05-01', 'to_date': '2030-05-02'
+        })
+        assert response.status_code == 404
+        response = client.post('/api/macros/meals/copy', headers=auth_headers, json={'from_date': 'yesterday'})
+        assert response.status_code == 400
+        for meal_types in ('lunch', [1], {'lunch': True}):
+            response = client.post('/api/macros/meals/copy', headers=auth_headers, json={
+                'from_date': '2030-05-01', 'to_date': '2030-05-02', 'meal_types': meal_types
+            })
+            assert response.status_code == 400
+
+
+class TestGoals:
+    """Test macro goals"""
+    
+    def test_get_goals_does_not_write(self, client, auth_headers):
+        """Test reading goals without saved goals serves the default plan"""
+        response = client.get('/api/macros/goals', headers=auth_headers)
+        assert response.status_code == 200
+        goal = json.loads(response.data)['goal']
+        assert goal['is_default'] is True
+        assert goal['calories'] == 2450
+        
+        client.get('/api/macros/dashboard?date=2030-03-02', headers=auth_headers)
+        assert MacroGoal.query.count() == 0
+    
+    def test_put_goals_persists_one_active_goal(self, client, auth_headers):
+        """Test saving goals creates the active goal once and then updates it"""
+        response = client.put('/api/macros/goals', headers=auth_headers, json={'calories': 2000})
+        goal = json.loads(response.data)['goal']
+        assert goal['is_default'] is False
+        assert goal['calories'] == 2000
+        assert goal['protein'] == 245
+        
+        client.put('/api/macros/goals', headers=auth_headers, json={'protein': 180})
+        goals = MacroGoal.query.all()
+        assert len(goals) == 1
+        assert (goals[0].calories, goals[0].protein) == (2000, 180)
+    
+    def test_single_active_goal_enforced(self, client, test_user):
+        """Test the database rejects a second active goal for a user"""
+        db.session.add(MacroGoal(user_id=test_user.id, is_active=True))
+        db.session.add(MacroGoal(user_id=test_user.id, is_active=False))
+        db.session.commit()
+        
+        db.session.add(MacroGoal(user_id=test_user.id, is_active=True))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+class TestDashboard:
+    """Test the macro dashboard"""
+    
+    def test_dashboard_does_not_write_intake(self, client, auth_headers):
+        """Test viewing an empty day does not create a DailyIntake row"""
+        response = client.get('/api/macros/dashboard?date=2030-03-02', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['daily_intake']['total_calories'] == 0
+        assert len(data['trends']) == 7
+        assert DailyIntake.query.count() == 0
+    
+    def test_dashboard_reads_intake(self, client, auth_headers):
+        """Test the dashboard reports intake maintained by meal writes"""
+        client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-03-03', 'meal_type': 'dinner', 'name': 'Steak',
+            'calories': 700, 'protein': 60, 'carbs': 0, 'fats': 50
+        })
+        response = client.get('/api/macros/dashboard?date=2030-03-03', headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['daily_intake']['total_calories'] == 700
+        assert len(data['meals']) == 1
+
+
+class TestDashboardCache:
+    """Test the per-user, per-date dashboard cache"""
+    
+    def test_dashboard_cached_and_invalidated(self, client, auth_headers):
+        """Test meal writes invalidate the day and the following trend window"""
+        client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        client.get('/api/macros/dashboard?date=2030-04-07', headers=auth_headers)
+        client.get('/api/macros/dashboard?date=2030-04-08', headers=auth_headers)
+        assert len(dashboard_cache) == 3
+        
+        client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-04-01', 'meal_type': 'snack', 'name': 'Apple',
+            'calories': 95, 'protein': 0, 'carbs': 25, 'fats': 0
+        })
+        # 04-01 and 04-07 show the new meal or trend; 04-08 does not
+        assert len(dashboard_cache) == 1
+        
+        response = client.get('/api/macros/dashboard?date=2030-04-07', headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['trends'][0]['date'] == '2030-04-01'
+        assert data['trends'][0]['status'] == 'under'
+    
+    def test_goal_update_invalidates(self, client, auth_headers):
+        """Test updating goals evicts the user's cached dashboards"""
+        client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        client.put('/api/macros/goals', headers=auth_headers, json={'calories': 1800})
+        assert len(dashboard_cache) == 0
+        
+        response = client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        assert json.loads(response.data)['goal']['calories'] == 1800
+    
+    def test_stale_entry_not_served(self, client, auth_headers):
+        """Test an entry is re-rendered when data changed without local invalidation"""
+        client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-04-01', 'meal_type': 'snack', 'name': 'Pear',
+            'calories': 100, 'protein': 0, 'carbs': 27, 'fats': 0
+        })
+        client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        
+        # Simulate a write handled by another worker
+        intake = DailyIntake.query.filter_by(date=date(2030, 4, 1)).first()
+        intake.total_calories = 250
+        intake.updated_at = datetime.utcnow()
+        db.session.commit()
+        
+        response = client.get('/api/macros/dashboard?date=2030-04-01', headers=auth_headers)
+        assert json.loads(response.data)['daily_intake']['total_calories'] == 250
+
+
+class TestHistory:
+    """Test long-range macro history"""
+    
+    @pytest.fixture
+    def logged_days(self, client, auth_headers):
+        """Log meals on three days across two weeks and two months"""
+        days = [
+            ('2030-01-30', {'calories': 2400, 'protein': 240, 'carbs': 210, 'fats': 70}),  # met
+            ('2030-01-31', {'calories': 3000, 'protein': 100, 'carbs': 100, 'fats': 30}),  # over
+            ('2030-02-04', {'calories': 1000, 'protein': 50, 'carbs': 50, 'fats': 20})     # under
+        ]
+        for day, macros in days:
+            response = client.post('/api/macros/meals', headers=auth_headers, json={
+                'date': day, 'meal_type': 'lunch', 'name': 'Meal', **macros
+            })
+            assert response.status_code == 201
+    
+    def test_history_by_day(self, client, auth_headers, logged_days):
+        """Test daily buckets carry adherence per day"""
+        response = client.get('/api/macros/history?from=2030-01-01&to=2030-02-28', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [b['start'] for b in data['buckets']] == ['2030-01-30', '2030-01-31', '2030-02-04']
+        assert [(b['days_met'], b['days_over'], b['days_under']) for b in data['buckets']] == [
+            (1, 0, 0), (0, 1, 0), (0, 0, 1)
+        ]
+        assert data['summary']['days_logged'] == 3
+        assert data['summary']['adherence_rate'] == 33.3
+    
+    def test_history_by_week_and_month(self, client, auth_headers, logged_days):
+        """Test weekly buckets start on Monday and monthly on the 1st"""
+        response = client.get('/api/macros/history?from=2030-01-01&to=2030-02-28&bucket=week', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [(b['start'], b['days_logged']) for b in data['buckets']] == [('2030-01-28', 2), ('2030-02-04', 1)]
+        assert data['buckets'][0]['total_calories'] == 5400
+        assert data['buckets'][0]['average_calories'] == 2700
+        
+        response = client.get('/api/macros/history?from=2030-01-01&to=2030-02-28&bucket=month', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [(b['start'], b['days_logged']) for b in data['buckets']] == [('2030-01-01', 2), ('2030-02-01', 1)]
+    
+    def test_history_invalid_params(self, client, auth_headers):
+        """Test invalid buckets and ranges are rejected"""
+        assert client.get('/api/macros/history?bucket=year', headers=auth_headers).status_code == 400
+        assert client.get('/api/macros/history?from=2030-02-01&to=2030-01-01', headers=auth_headers).status_code == 400
+        assert client.get('/api/macros/history?from=bad', headers=auth_headers).status_code == 400
+
+
+@pytest.fixture
+def food_catalog(client):
+    """Load the bundled food dataset"""
+    load_foods()
+
+
+class TestFoodCatalog:
+    """Test food search and catalog-backed meals"""
+    
+    def _search(self, client, auth_headers, q, **params):
+        response = client.get('/api/macros/foods/search', headers=auth_headers,
+                              query_string={'q': q, **params})
+        return response, json.loads(response.data)
+    
+    def test_search_ranks_prefix_matches(self, client, auth_headers, food_catalog):
+        """Test names starting with the query rank before other word matches"""
+        response, data = self._search(client, auth_headers, 'white')
+        assert response.status_code == 200
+        names = [f['name'] for f in data['foods']]
+        assert names == ['White Bread', 'White Rice (cooked)', 'Egg White']
+        
+        response, data = self._search(client, auth_headers, 'Chick')
+        assert len(data['foods']) == 3
+    
+    def test_search_matches_every_word(self, client, auth_headers, food_catalog):
+        """Test multi-word queries require each word to match"""
+        response, data = self._search(client, auth_headers, 'rice brown')
+        assert [f['name'] for f in data['foods']] == ['Brown Rice (cooked)']
+        
+        response, data = self._search(client, auth_headers, 'rice', limit=1)
+        assert len(data['foods']) == 1
+    
+    def test_search_limit_with_repeated_matches(self, client, auth_headers):
+        """Test foods matching the query in several words do not crowd out others"""
+        names = ['Oat Chia Chips Chunks', 'Rye Chili Chard Chives', 'Plain Rice Bowl Cheddarcheese']
+        for name in names:
+            food = Food(name=name, search_name=normalize_food_name(name))
+            db.session.add(food)
+            db.session.flush()
+            db.session.execute(db.insert(FoodTerm), FoodTerm.rows_for(food))
+        db.session.commit()
+        
+        response, data = self._search(client, auth_headers, 'ch', limit=3)
+        assert [f['name'] for f in data['foods']] == names
+    
+    def test_search_matches_grouped_scan(self, client, auth_headers, food_catalog, monkeypatch):
+        """Test per-word merged results equal ranking every matching row"""
+        import routes.macros
+        queries = ['ch', 'chick', 'ri', 'rice br', 'white', 'eg wh', 'zz', 'ch zz']
+        for limit in (1, 3, 20):
+            merged = [self._search(client, auth_headers, q, limit=limit)[1] for q in queries]
+            monkeypatch.setattr(routes.macros, 'FOOD_SEARCH_MAX_TERMS', 0)
+            grouped = [self._search(client, auth_headers, q, limit=limit)[1] for q in queries]
+            monkeypatch.undo()
+            assert merged == grouped
+    
+    def test_search_requires_min_length(self, client, auth_headers, food_catalog):
+        """Test one-character queries are rejected"""
+        response, data = self._search(client, auth_headers, 'a')
+        assert response.status_code == 400
+    
+    def test_loader_skips_existing(self, client, food_catalog):
+        """Test re-running the loader does not duplicate foods"""
+        assert load_foods() == 0
+    
+    def test_meal_from_food(self, client, auth_headers, food_catalog):
+        """Test macros are computed from the food and quantity"""
+        _, data = self._search(client, auth_headers, 'white rice')
+        rice = data['foods'][0]
+        
+        response = client.post('/api/macros/meals', headers=auth_headers, json={
+            'date': '2030-03-05', 'meal_type': 'lunch',
+            'food_id': rice['id'], 'quantity_g': 200, 'calories': 1
+        })
+        assert response.status_code == 201
+        meal = json.loads(response.data)['meal']
+        assert meal['name'] == 'White Rice (cooked)'
+        assert meal['calories'] == 260
+        assert meal['carbs'] == 56.4
+        
+        response = client.put(f"/api/macros/meals/{meal['id']}", headers=auth_headers,
+                               json={'quantity_g': 100})
+        assert json.loads(response.data)['meal']['calories'] == 130
+        intake = DailyIntake.query.filter_by(date=date(2030, 3, 5)).first()
+        assert intake.total_calories == 130
+    
+    def test_meal_from_food_invalid(self, client, auth_headers, food_catalog):
+        """Test unknown foods and missing quantities are rejected"""
+        response = client.post('/api/macros/meals', headers=auth_headers,
+                               json={'food_id': 99999, 'quantity_g': 100})
+        assert response.status_code == 400
+        response = client.post('/api/macros/meals', headers=auth_headers, json={'food_id': 1})
+        assert response.status_code == 400
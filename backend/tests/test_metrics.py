@@ -0,0 +1,175 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from metrics import Metrics, metrics
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def parse(text):
+    """Prometheus text -> {sample with labels: value}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+class TestMetricsRecorder:
+    """Test per-thread accumulation and rendering"""
+
+    def test_histogram_is_cumulative(self):
+        """Test latencies land in cumulative le buckets with sum and count"""
+        recorder = Metrics(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 5.0):
+            recorder.observe('auth.login', 'POST', seconds)
+        samples = parse(recorder.render())
+
+        labels = 'endpoint="auth.login",method="POST"'
+        assert samples[f'fittrack_request_duration_seconds_bucket{{{labels},le="0.1"}}'] == 1
+        assert samples[f'fittrack_request_duration_seconds_bucket{{{labels},le="1.0"}}'] == 2
+        assert samples[f'fittrack_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 3
+        assert samples[f'fittrack_request_duration_seconds_count{{{labels}}}'] == 3
+        assert samples[f'fittrack_request_duration_seconds_sum{{{labels}}}'] == 5.55
+
+    def test_statements_attributed_to_request(self):
+        """Test statement count and DB time accumulate between start and end"""
+        clock = FakeClock()
+        recorder = Metrics(clock=clock)
+        recorder.before_statement()
+        recorder.after_statement()  # outside a request: ignored
+
+        recorder.start_request()
+        for _ in range(3):
+            recorder.before_statement()
+            clock.now += 0.25
+            recorder.after_statement()
+        recorder.end_request('workouts.get_workouts', 'GET')
+
+        series = recorder.snapshot()[('workouts.get_workouts', 'GET')]
+        assert series[recorder._statements] == 3
+        assert series[recorder._db_seconds] == 0.75
+        assert series[recorder._sum] == 0.75
+
+    def test_threads_summed(self):
+        """Test each thread records into its own shard and snapshots add them up"""
+        recorder = Metrics()
+
+        def work():
+            for _ in range(1000):
+                recorder.observe('health', 'GET', 0.001, statements=2)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        series = recorder.snapshot()[('health', 'GET')]
+        assert sum(series[:len(recorder.buckets) + 1]) == 4000
+        assert series[recorder._statements] == 8000
+        assert len(recorder._shards) == 4
+
+    def test_greenlets_share_thread_shard(self):
+        """Test greenlets under gevent's monkey patching do not each add a shard"""
+        pytest.importorskip('gevent')
+        script = (
+            "from gevent import monkey; monkey.patch_all()\n"
+            "import gevent\n"
+            "from metrics import Metrics\n"
+            "recorder = Metrics()\n"
+            "def request():\n"
+            "    recorder.start_request()\n"
+            "    gevent.sleep(0)\n"
+            "    recorder.end_request('health', 'GET')\n"
+            "gevent.joinall([gevent.spawn(request) for _ in range(1000)])\n"
+            "series = recorder.snapshot()[('health', 'GET')]\n"
+            "print(len(recorder._shards), sum(series[:len(recorder.buckets) + 1]))\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ['1', '1000']
+
+
+class TestSharedMetrics:
+    """Test totals shared between worker processes through METRICS_DIR"""
+
+    def test_scrape_sums_every_worker(self, tmp_path):
+        """Test a scrape answered by either worker reports both workers' counts"""
+        first = Metrics(directory=str(tmp_path))
+        second = Metrics(directory=str(tmp_path))
+        first.observe('health', 'GET', 0.001, statements=1)
+        second.observe('health', 'GET', 0.001, statements=2)
+        second.observe('auth.login', 'POST', 0.3)
+        second.flush()
+
+        for recorder in (first, second):
+            samples = parse(recorder.render())
+            assert samples['fittrack_request_duration_seconds_count{endpoint="health",method="GET"}'] == 2
+            assert samples['fittrack_db_statements_total{endpoint="health",method="GET"}'] == 3
+            assert samples['fittrack_request_duration_seconds_count{endpoint="auth.login",method="POST"}'] == 1
+
+    def test_exited_worker_totals_kept(self, tmp_path):
+        """Test counts of a worker that exited still add to the totals"""
+        exited = Metrics(directory=str(tmp_path))
+        exited.observe('health', 'GET', 0.001)
+        exited.flush()
+        del exited
+
+        current = Metrics(directory=str(tmp_path))
+        current.observe('health', 'GET', 0.001)
+        samples = parse(current.render())
+        assert samples['fittrack_request_duration_seconds_count{endpoint="health",method="GET"}'] == 2
+        assert len(list(tmp_path.glob('*.json'))) == 2
+
+
+SCRAPE_HEADERS = {'Authorization': 'Bearer scrape-secret'}
+
+
+class TestMetricsEndpoint:
+    """Test request recording and GET /metrics"""
+
+    @pytest.fixture(autouse=True)
+    def token(self, monkeypatch):
+        monkeypatch.setattr(metrics, 'token', 'scrape-secret')
+
+    def test_records_endpoint_and_queries(self, client, auth_headers, sample_workout):
+        """Test a request is recorded under its endpoint with its SQL statements"""
+        response = client.get('/api/workouts', headers=auth_headers)
+        assert response.status_code == 200
+
+        response = client.get('/metrics', headers=SCRAPE_HEADERS)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        samples = parse(response.data.decode())
+        labels = 'endpoint="workouts.get_workouts",method="GET"'
+        assert samples[f'fittrack_request_duration_seconds_count{{{labels}}}'] == 1
+        assert samples[f'fittrack_db_statements_total{{{labels}}}'] >= 1
+        assert samples[f'fittrack_db_duration_seconds_total{{{labels}}}'] > 0
+
+    def test_unmatched_paths_share_series(self, client):
+        """Test unknown URLs are grouped instead of labelled by path"""
+        client.get('/no/such/path')
+        client.get('/another/missing/path')
+        samples = parse(client.get('/metrics', headers=SCRAPE_HEADERS).data.decode())
+        assert samples['fittrack_request_duration_seconds_count{endpoint="<unmatched>",method="GET"}'] == 2
+
+    def test_token_required(self, client):
+        """Test METRICS_TOKEN protects the endpoint"""
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get('/metrics', headers=SCRAPE_HEADERS).status_code == 200
+
+    def test_hidden_without_token(self, client, monkeypatch):
+        """Test the endpoint is not served when no token is configured"""
+        monkeypatch.setattr(metrics, 'token', None)
+        assert client.get('/metrics').status_code == 404
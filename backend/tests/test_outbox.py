@@ -0,0 +1,184 @@
+import pytest
+import json
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from app import app
+from models import db
+from models.outbox import OutboxEmail
+from outbox import SMTPSender, OutboxWorker, enqueue_email, process_outbox, claim_batch
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: enough for smtplib without TLS or auth"""
+    
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+    
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stand-in ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 stand-in')
+            elif command.startswith('MAIL'):
+                if self.server.fail_next:
+                    self.server.fail_next -= 1
+                    self.reply('451 try again later')
+                else:
+                    self.reply('250 OK')
+            elif command.startswith(('RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b''):
+                        break
+                    lines.append(data)
+                self.server.messages.append(b''.join(lines).decode('utf-8', 'replace'))
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0
+
+
+@pytest.fixture
+def smtp_server():
+    """Run a local SMTP stand-in for the test"""
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sender(smtp_server):
+    sender = SMTPSender(host='127.0.0.1', port=smtp_server.server_address[1],
+                        from_address='noreply@fittrack.app', starttls=False)
+    yield sender
+    sender.close()
+
+
+def queue(count):
+    for i in range(count):
+        enqueue_email(f'user{i}@example.com', 'Hello', f'Body {i}', f'<p>Body {i}</p>')
+    db.session.commit()
+
+
+class TestOutboxQueue:
+    """Test queueing emails from requests"""
+    
+    def test_forgot_password_queues_email(self, client, test_user):
+        """Test the request only inserts an outbox row"""
+        response = client.post('/api/auth/forgot-password', json={'email': 'test@example.com'})
+        assert response.status_code == 200
+        
+        email = OutboxEmail.query.one()
+        assert email.status == 'pending'
+        assert email.to_address == 'test@example.com'
+        assert '/reset-password?token=' in email.text_body
+
+
+class TestOutboxSender:
+    """Test delivering the outbox against a local SMTP server"""
+    
+    def test_batch_reuses_connection(self, client, smtp_server, sender):
+        """Test a batch is sent over one SMTP connection and bodies are cleared"""
+        queue(3)
+        assert process_outbox(sender, batch_size=10) == 3
+        
+        assert len(smtp_server.messages) == 3
+        assert smtp_server.connections == 1
+        assert 'Body 0' in smtp_server.messages[0]
+        emails = OutboxEmail.query.all()
+        assert {e.status for e in emails} == {'sent'}
+        assert all(e.text_body == '' and e.sent_at for e in emails)
+    
+    def test_failed_send_retries_with_backoff(self, client, smtp_server, sender):
+        """Test a refused send is rescheduled and later delivered"""
+        queue(2)
+        smtp_server.fail_next = 1
+        assert process_outbox(sender) == 1
+        
+        failed = OutboxEmail.query.filter_by(status='pending').one()
+        assert failed.attempts == 1
+        assert failed.last_error
+        assert failed.next_attempt_at > datetime.utcnow()
+        assert process_outbox(sender) == 0
+        
+        failed.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert process_outbox(sender) == 1
+        assert OutboxEmail.query.filter_by(status='sent').count() == 2
+    
+    def test_gives_up_after_max_attempts(self, client, smtp_server, sender):
+        """Test an email is marked failed after the last attempt"""
+        queue(1)
+        smtp_server.fail_next = 1
+        process_outbox(sender, max_attempts=1)
+        assert OutboxEmail.query.one().status == 'failed'
+    
+    def test_claimed_rows_not_claimed_twice(self, client):
+        """Test a second sender cannot claim rows under an active lease"""
+        queue(2)
+        assert len(claim_batch(10)) == 2
+        assert claim_batch(10) == []
+    
+    def test_worker_thread_delivers(self, client, smtp_server, sender):
+        """Test the background worker sends after notify()"""
+        worker = OutboxWorker(app, sender=sender, poll_interval=0.1)
+        try:
+            queue(1)
+            worker.notify()
+            deadline = time.monotonic() + 5
+            while not smtp_server.messages and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            worker.stop()
+        assert len(smtp_server.messages) == 1
+    
+    def test_worker_starts_on_first_request(self, client, smtp_server, sender, monkeypatch):
+        """Test a restarted worker sends queued retries before any new email"""
+        worker = OutboxWorker(app, sender=sender, poll_interval=0.1)
+        monkeypatch.setitem(app.extensions, 'outbox', worker)
+        monkeypatch.setitem(app.config, 'EMAIL_OUTBOX_WORKER', True)
+        try:
+            queue(1)
+            client.get('/health')
+            assert worker.running()
+            deadline = time.monotonic() + 5
+            while not smtp_server.messages and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            worker.stop()
+        assert len(smtp_server.messages) == 1
+    
+    def test_lambda_handler_drains_queue(self, client, smtp_server, sender, monkeypatch):
+        """Test the scheduled Lambda function sends every due email"""
+        import send_outbox
+        monkeypatch.setattr(send_outbox.SMTPSender, 'from_env', classmethod(lambda cls: sender))
+        queue(3)
+        assert send_outbox.handler({}, None) == {'sent': 3}
+        assert len(smtp_server.messages) == 3
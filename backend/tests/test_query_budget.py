@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+from models import db
+from models.user import User
+from models.workout import Workout, WorkoutExercise, ExerciseSet, Exercise, Routine
+from models.classes import ClassMembership, AssignedWorkout, StudentWorkoutLog
+
+# Each list endpoint must run the same number of statements for 1 row as for 100
+SCALES = (1, 100)
+
+def assert_constant(query_counter, budget, path, headers, seed):
+    """Seed up to each scale and check the request stays within a flat budget"""
+    counts = []
+    for n in SCALES:
+        seed(n)
+        response, count = query_counter.assert_budget(budget, 'GET', path, headers=headers)
+        assert response.status_code == 200
+        counts.append(count)
+    assert counts[0] == counts[-1], f'{path} ran {counts} statements at {SCALES} rows'
+    return response
+
+def add_workout(user_id, exercise_id):
+    workout = Workout(user_id=user_id, name='Workout', duration=45, total_volume=500.0,
+                      date=datetime.utcnow().date())
+    db.session.add(workout)
+    db.session.flush()
+    for order, (catalog_id, custom_name) in enumerate(((exercise_id, None), (None, 'Custom'))):
+        workout_exercise = WorkoutExercise(workout_id=workout.id, exercise_id=catalog_id,
+                                           custom_exercise_name=custom_name, order=order)
+        db.session.add(workout_exercise)
+        db.session.flush()
+        for set_number in (1, 2):
+            db.session.add(ExerciseSet(workout_exercise_id=workout_exercise.id, set_number=set_number,
+                                       weight=50.0, reps=10, completed=True))
+    return workout
+
+def add_exercise(name):
+    exercise = Exercise(name=name, category='strength')
+    db.session.add(exercise)
+    db.session.flush()
+    return exercise.id
+
+
+class TestWorkoutQueryBudget:
+    """Test workout and routine listings do not query per row"""
+
+    def test_workouts_list(self, client, auth_headers, test_user, query_counter):
+        """Test GET /api/workouts loads exercises and sets in bulk"""
+        user_id = test_user.id
+        exercise_id = add_exercise('Bench Press')
+        db.session.commit()
+        seeded = [0]
+
+        def seed(n):
+            for _ in range(n - seeded[0]):
+                add_workout(user_id, exercise_id)
+            db.session.commit()
+            seeded[0] = n
+
+        response = assert_constant(query_counter, 5, '/api/workouts', auth_headers, seed)
+        workouts = response.get_json()['workouts']
+        assert len(workouts) == 100
+        assert workouts[0]['exercises'][0]['exercise']['name'] == 'Bench Press'
+        assert len(workouts[0]['exercises'][1]['sets']) == 2
+
+    def test_routines_list(self, client, auth_headers, test_user, query_counter):
+        """Test GET /api/workouts/routines loads every routine's exercises in one query"""
+        user_id = test_user.id
+        exercise_ids = [add_exercise(name) for name in ('Squat', 'Deadlift')]
+        db.session.commit()
+        seeded = [0]
+
+        def seed(n):
+            for i in range(seeded[0], n):
+                db.session.add(Routine(user_id=user_id, name=f'Routine {i}', exercise_count=2,
+                                       exercise_ids=','.join(map(str, reversed(exercise_ids)))))
+            db.session.commit()
+            seeded[0] = n
+
+        response = assert_constant(query_counter, 3, '/api/workouts/routines', auth_headers, seed)
+        routines = response.get_json()['routines']
+        assert len(routines) == 100
+        assert [ex['name'] for ex in routines[0]['exercises']] == ['Deadlift', 'Squat']
+
+
+class TestClassQueryBudget:
+    """Test class listings do not query per assignment or member"""
+
+    def seed_assignments(self, class_id, instructor_id, student_id):
+        """Seed n assignments, each completed by the student with a logged workout"""
+        exercise_id = add_exercise('Row')
+        db.session.commit()
+        seeded = [0]
+
+        def seed(n):
+            for i in range(seeded[0], n):
+                assignment = AssignedWorkout(class_id=class_id, instructor_id=instructor_id,
+                                             name=f'Assignment {i}',
+                                             assigned_date=datetime.utcnow() - timedelta(minutes=i))
+                db.session.add(assignment)
+                db.session.flush()
+                workout = add_workout(student_id, exercise_id)
+                db.session.add(StudentWorkoutLog(assigned_workout_id=assignment.id, student_id=student_id,
+                                                 workout_id=workout.id, completed=True,
+                                                 completed_at=datetime.utcnow(), duration=30))
+            db.session.commit()
+            seeded[0] = n
+        return seed
+
+    def test_assigned_workouts_student(self, client, auth_headers, test_user, sample_class, query_counter):
+        """Test a student's listing bulk-loads stats, their logs and logged workouts"""
+        class_id, instructor_id, student_id = sample_class.id, sample_class.instructor_id, test_user.id
+        db.session.add(ClassMembership(class_id=class_id, student_id=student_id))
+        db.session.commit()
+        seed = self.seed_assignments(class_id, instructor_id, student_id)
+
+        response = assert_constant(query_counter, 13, f'/api/classes/{class_id}/assigned-workouts',
+                                   auth_headers, seed)
+        assignments = response.get_json()['assigned_workouts']
+        assert len(assignments) == 100
+        assert assignments[0]['completion_stats']['completed_count'] == 1
+        assert assignments[0]['my_log']['workout']['exercises'][0]['exercise']['name'] == 'Row'
+
+    def test_assigned_workouts_instructor(self, client, instructor_headers, test_user, sample_class,
+                                          query_counter):
+        """Test the instructor's listing computes completion stats in bulk"""
+        class_id, instructor_id, student_id = sample_class.id, sample_class.instructor_id, test_user.id
+        db.session.add(ClassMembership(class_id=class_id, student_id=student_id))
+        db.session.commit()
+        seed = self.seed_assignments(class_id, instructor_id, student_id)
+
+        response = assert_constant(query_counter, 7, f'/api/classes/{class_id}/assigned-workouts',
+                                   instructor_headers, seed)
+        assignments = response.get_json()['assigned_workouts']
+        assert all(a['completion_stats']['completion_rate'] == 100 for a in assignments)
+
+    def test_leaderboard(self, client, instructor_headers, sample_class, query_counter):
+        """Test the leaderboard aggregates every member's logs in one query"""
+        class_id, instructor_id = sample_class.id, sample_class.instructor_id
+        assignment = AssignedWorkout(class_id=class_id, instructor_id=instructor_id, name='Assignment')
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.id
+        seeded = [0]
+
+        def seed(n):
+            for i in range(seeded[0], n):
+                # Hashing 100 passwords would dominate the test; logins are not needed
+                student = User(email=f'student{i}@example.com', username=f'student{i}',
+                               password_hash='unused', role='student')
+                db.session.add(student)
+                db.session.flush()
+                db.session.add(ClassMembership(class_id=class_id, student_id=student.id))
+                if i % 2 == 0:
+                    db.session.add(StudentWorkoutLog(assigned_workout_id=assignment_id, student_id=student.id,
+                                                     completed=True, duration=30, total_volume=100.0))
+            db.session.commit()
+            seeded[0] = n
+
+        response = assert_constant(query_counter, 7, f'/api/classes/{class_id}/leaderboard',
+                                   instructor_headers, seed)
+        leaderboard = response.get_json()['leaderboard']
+        assert len(leaderboard) == 100
+        assert leaderboard[0]['stats']['total_workouts'] == 1
+        assert leaderboard[0]['stats']['total_duration'] == 30
+        assert leaderboard[-1]['stats']['total_workouts'] == 0
+        assert leaderboard[0]['student']['username'].startswith('student')
+
+        response, _ = query_counter.assert_budget(7, 'GET', f'/api/classes/{class_id}/leaderboard?users=sideload',
+                                                  headers=instructor_headers)
+        assert len(response.get_json()['users']) == 100
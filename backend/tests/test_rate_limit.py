@@ -0,0 +1,122 @@
+import pytest
+import json
+from app import app
+from rate_limit import RateLimiter, MemoryStorage, SQLiteStorage, limiter, by_ip
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test token bucket storage backends"""
+    
+    @pytest.fixture(params=['memory', 'sqlite'])
+    def storage(self, request, tmp_path):
+        if request.param == 'memory':
+            return MemoryStorage()
+        return SQLiteStorage(str(tmp_path / 'limits.db'))
+    
+    def test_bucket_empties_and_refills(self, storage):
+        """Test a bucket allows its capacity, then refills over the period"""
+        clock = FakeClock()
+        rate_limiter = RateLimiter(storage, clock=clock)
+        
+        assert [rate_limiter.hit('k', '3/minute') for _ in range(3)] == [0, 0, 0]
+        assert rate_limiter.hit('k', '3/minute') == pytest.approx(20)
+        assert rate_limiter.hit('other', '3/minute') == 0
+        
+        clock.now += 20
+        assert rate_limiter.hit('k', '3/minute') == 0
+    
+    def test_sqlite_shared_between_limiters(self, tmp_path):
+        """Test two processes' limiters on one SQLite file share buckets"""
+        path = str(tmp_path / 'limits.db')
+        clock = FakeClock()
+        first = RateLimiter(SQLiteStorage(path), clock=clock)
+        second = RateLimiter(SQLiteStorage(path), clock=clock)
+        
+        assert first.hit('k', '2/hour') == 0
+        assert second.hit('k', '2/hour') == 0
+        assert first.hit('k', '2/hour') > 0
+    
+    def test_memory_storage_is_bounded(self):
+        """Test the in-process map evicts least recently used buckets"""
+        storage = MemoryStorage(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            storage.consume(key, 5, 1, 0)
+        assert list(storage._buckets) == ['b', 'c']
+
+
+class TestRateLimitedRoutes:
+    """Test limits applied to routes"""
+    
+    def _login(self, client, email, password='wrong'):
+        return client.post('/api/auth/login', json={'email': email, 'password': password})
+    
+    def test_login_limited_per_account(self, client, test_user, monkeypatch):
+        """Test repeated logins for one account are throttled with 429"""
+        # Stop the bucket refilling while the slow bcrypt checks run
+        monkeypatch.setattr(limiter, 'clock', FakeClock())
+        for _ in range(10):
+            assert self._login(client, 'test@example.com').status_code == 401
+        
+        response = self._login(client, 'TEST@example.com')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 0
+        
+        # Other accounts from the same IP are still allowed
+        assert self._login(client, 'other@example.com').status_code == 401
+    
+    def test_forgot_password_limited(self, client, test_user):
+        """Test reset emails for one account are throttled"""
+        for _ in range(3):
+            response = client.post('/api/auth/forgot-password', json={'email': 'test@example.com'})
+            assert response.status_code == 200
+        response = client.post('/api/auth/forgot-password', json={'email': 'test@example.com'})
+        assert response.status_code == 429
+    
+    def test_leaderboard_limited_per_user(self, client, auth_headers):
+        """Test analytics routes are throttled per user"""
+        for _ in range(30):
+            client.get('/api/classes/1/leaderboard', headers=auth_headers)
+        response = client.get('/api/classes/1/leaderboard', headers=auth_headers)
+        assert response.status_code == 429
+    
+    def test_disabled(self, client, test_user, monkeypatch):
+        """Test RATE_LIMIT_ENABLED=false turns limits off"""
+        monkeypatch.setattr(limiter, 'enabled', False)
+        for _ in range(12):
+            assert self._login(client, 'test@example.com').status_code == 401
+
+
+class TestClientIP:
+    """Test the client IP used for per-IP limits"""
+    
+    def _by_ip(self, headers):
+        with app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            return by_ip()
+    
+    def test_peer_address_by_default(self):
+        """Test forwarding headers are ignored unless configured"""
+        headers = {'X-Forwarded-For': '1.2.3.4', 'Fly-Client-IP': '5.6.7.8'}
+        assert self._by_ip(headers) == '10.0.0.1'
+    
+    def test_ip_header(self, monkeypatch):
+        """Test the proxy's client IP header is used when present"""
+        monkeypatch.setattr(limiter, 'ip_header', 'Fly-Client-IP')
+        headers = {'X-Forwarded-For': '1.2.3.4', 'Fly-Client-IP': '5.6.7.8'}
+        assert self._by_ip(headers) == '5.6.7.8'
+        assert self._by_ip({}) == '10.0.0.1'
+    
+    def test_proxy_hops_ignore_spoofed_entries(self, monkeypatch):
+        """Test only entries appended by trusted proxies are used"""
+        monkeypatch.setattr(limiter, 'proxy_hops', 1)
+        assert self._by_ip({'X-Forwarded-For': '6.6.6.6, 1.2.3.4'}) == '1.2.3.4'
+        
+        monkeypatch.setattr(limiter, 'proxy_hops', 2)
+        assert self._by_ip({'X-Forwarded-For': '6.6.6.6, 1.2.3.4, 10.0.0.2'}) == '1.2.3.4'
+        assert self._by_ip({'X-Forwarded-For': '1.2.3.4'}) == '10.0.0.1'
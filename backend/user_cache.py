@@ -0,0 +1,80 @@
+"""
+Current-user resolution for JWT-protected requests
+
+Handlers behind @jwt_required() that need the caller's role or username read
+current_user from this module. It is resolved on first use, at most once per
+request, so routes that only need the id (get_jwt_identity()) run no user
+lookup at all. The result is a CachedUser snapshot (id, role, username), kept
+in a per-worker TTL cache, so most lookups run no query either. A token whose
+user no longer exists raises UserNotFound, which app.py answers with 404.
+
+Profile and password updates call invalidate_user. Other gunicorn workers can
+serve a stale username until USER_CACHE_TTL expires. Handlers that need the
+full row (e.g. to modify it or return to_dict()) should still load the User.
+"""
+import os
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+from werkzeug.local import LocalProxy
+
+from cache import TTLCache
+from models import db
+from models.user import User
+
+
+class UserNotFound(Exception):
+    """Raised when the JWT's user no longer exists"""
+
+
+class CachedUser:
+    """Snapshot of the user fields handlers need for authorization"""
+
+    __slots__ = ('id', 'role', 'username')
+
+    def __init__(self, id, role, username):
+        self.id = id
+        self.role = role
+        self.username = username
+
+    @property
+    def is_instructor(self):
+        return self.role == 'instructor'
+
+
+user_cache = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '4096')),
+    ttl=int(os.getenv('USER_CACHE_TTL', '60'))
+)
+
+
+def load_user(user_id):
+    """Return the CachedUser for an id, or None if the user does not exist"""
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.query(User.id, User.role, User.username).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = CachedUser(*row)
+        user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id):
+    """Drop a user's cached snapshot after their row changes"""
+    user_cache.delete(user_id)
+
+
+def _load_current_user():
+    # Kept in the WSGI environ: it belongs to this request, while g can
+    # outlive it when an app context is already pushed (e.g. in tests)
+    user = request.environ.get('fittrack.current_user')
+    if user is None:
+        user = load_user(int(get_jwt_identity()))
+        if user is None:
+            raise UserNotFound()
+        request.environ['fittrack.current_user'] = user
+    return user
+
+
+current_user = LocalProxy(_load_current_user)